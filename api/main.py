@@ -22,6 +22,7 @@ from api.auth import get_current_active_user
 from core.engine import QuantEngine
 from api.config import get_settings
 from api.logger import api_logger, log_exception
+from api.storage import create_async_storage
 
 
 settings = get_settings()
@@ -80,6 +81,11 @@ async def lifespan(app: FastAPI):
     engine = QuantEngine(config_path)
     logger.info("引擎启动完成")
     app.state.engine = engine
+    try:
+        app.state.async_storage = create_async_storage(engine.storage)
+    except Exception as e:
+        logger.warning(f"异步存储不可用，路由将在线程池中访问同步存储: {e}")
+        app.state.async_storage = None
     yield
     logger.info("正在关闭服务...")
     # 关闭数据库连接
@@ -169,10 +175,23 @@ async def health_check():
 
 
 @app.get("/cache/stats", dependencies=auth_required)
-async def get_cache_stats():
+async def get_cache_stats(request: Request):
     """获取缓存统计信息"""
     from api.cache import get_cache_stats
-    return get_cache_stats()
+    from skills.skill_data.storage_cache import CachedStorage
+
+    stats = get_cache_stats()
+    storage = getattr(getattr(request.app.state, "engine", None), "storage", None)
+    if isinstance(storage, CachedStorage):
+        stats["storage"] = storage.cache_stats()
+    return stats
+
+
+@app.get("/db/pool-stats", dependencies=auth_required)
+async def get_db_pool_stats():
+    """获取 MongoDB 连接池参数与等待耗时指标"""
+    from skills.skill_data.mongo_client import get_pool_stats
+    return get_pool_stats()
 
 
 @app.post("/cache/clear", dependencies=auth_required)
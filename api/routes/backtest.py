@@ -7,6 +7,8 @@ from typing import Any
 from fastapi import APIRouter, HTTPException, Query, Request, status
 from pydantic import BaseModel
 
+from api.storage import has_storage_method, storage_call
+
 
 router = APIRouter()
 
@@ -62,8 +64,8 @@ async def get_backtest_history(
 ):
     engine = request.app.state.engine
 
-    if hasattr(engine.storage, "load_backtest_results"):
-        history_data = engine.storage.load_backtest_results()
+    if has_storage_method(request, "load_backtest_results"):
+        history_data = await storage_call(request, "load_backtest_results", default=[])
     elif hasattr(engine, "_get_backtest_history"):
         history_data = engine._get_backtest_history()
     else:
@@ -102,8 +104,8 @@ async def get_backtest_detail(request: Request, backtest_id: str):
             raise HTTPException(status_code=404, detail="Backtest not found") from exc
         return {"code": 200, "data": _serialize_doc(detail)}
 
-    if hasattr(engine.storage, "backtest_results"):
-        doc = engine.storage.backtest_results.find_one({"id": backtest_id})
+    if has_storage_method(request, "load_backtest_result"):
+        doc = await storage_call(request, "load_backtest_result", backtest_id)
         if doc:
             return {"code": 200, "data": _serialize_doc(doc)}
 
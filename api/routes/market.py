@@ -32,7 +32,7 @@ def _empty_collection(message: str, **extra: Any) -> dict:
 
 
 def _stock_pool_summary(engine) -> dict | None:
-    stock_list = engine._get_stock_list()
+    stock_list = engine._get_stock_list(resolve_indices=False)
     if not stock_list:
         return None
 
@@ -286,7 +286,7 @@ async def get_sector_detail(request: Request, code: str, days: int = Query(30, g
 async def get_turnover_rank(request: Request, limit: int = Query(10, ge=1, le=50)):
     engine = request.app.state.engine
 
-    stock_list = engine._get_stock_list()
+    stock_list = engine._get_stock_list(resolve_indices=False)
     price_data = engine.fetcher.fetch_price_data(stock_list)
 
     ranks = []
@@ -8,6 +8,8 @@ from typing import Any
 from fastapi import APIRouter, HTTPException, Request, status
 from pydantic import BaseModel
 
+from api.storage import has_storage_method, storage_call
+
 
 router = APIRouter()
 
@@ -21,10 +23,6 @@ class PortfolioUpdate(BaseModel):
     stocks: dict[str, float]
 
 
-def _storage(request: Request):
-    return request.app.state.engine.storage
-
-
 def _portfolio_id(portfolio: dict[str, Any]) -> str | None:
     raw_id = portfolio.get("id") or portfolio.get("_id") or portfolio.get("name")
     return str(raw_id) if raw_id is not None else None
@@ -40,17 +38,13 @@ def _serialize_portfolio(portfolio: dict[str, Any]) -> dict[str, Any]:
     return item
 
 
-def _load_portfolios(request: Request) -> list[dict[str, Any]]:
-    storage = _storage(request)
-    if not hasattr(storage, "load_portfolios"):
-        return []
-
-    portfolios = storage.load_portfolios()
+async def _load_portfolios(request: Request) -> list[dict[str, Any]]:
+    portfolios = await storage_call(request, "load_portfolios", default=[])
     return [_serialize_portfolio(item) for item in portfolios]
 
 
-def _find_portfolio(request: Request, portfolio_id: str) -> dict[str, Any] | None:
-    for portfolio in _load_portfolios(request):
+async def _find_portfolio(request: Request, portfolio_id: str) -> dict[str, Any] | None:
+    for portfolio in await _load_portfolios(request):
         if portfolio.get("id") == portfolio_id or portfolio.get("name") == portfolio_id:
             return portfolio
     return None
@@ -58,7 +52,7 @@ def _find_portfolio(request: Request, portfolio_id: str) -> dict[str, Any] | Non
 
 @router.get("/list")
 async def get_portfolio_list(request: Request):
-    portfolios = _load_portfolios(request)
+    portfolios = await _load_portfolios(request)
     return {
         "code": 200,
         "data": {
@@ -70,7 +64,7 @@ async def get_portfolio_list(request: Request):
 
 @router.get("/{portfolio_id}")
 async def get_portfolio_detail(request: Request, portfolio_id: str):
-    portfolio = _find_portfolio(request, portfolio_id)
+    portfolio = await _find_portfolio(request, portfolio_id)
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
 
@@ -107,8 +101,7 @@ async def get_portfolio_detail(request: Request, portfolio_id: str):
 
 @router.post("/")
 async def create_portfolio(request: Request, portfolio: PortfolioCreate):
-    storage = _storage(request)
-    if not hasattr(storage, "save_portfolio"):
+    if not has_storage_method(request, "save_portfolio"):
         raise HTTPException(
             status_code=status.HTTP_501_NOT_IMPLEMENTED,
             detail="Portfolio storage is not configured",
@@ -121,7 +114,7 @@ async def create_portfolio(request: Request, portfolio: PortfolioCreate):
         "created_at": datetime.now(),
         "updated_at": datetime.now(),
     }
-    storage.save_portfolio(payload)
+    await storage_call(request, "save_portfolio", payload)
 
     return {
         "code": 200,
@@ -132,11 +125,10 @@ async def create_portfolio(request: Request, portfolio: PortfolioCreate):
 
 @router.put("/{portfolio_id}")
 async def update_portfolio(request: Request, portfolio_id: str, portfolio: PortfolioUpdate):
-    storage = _storage(request)
-    existing = _find_portfolio(request, portfolio_id)
+    existing = await _find_portfolio(request, portfolio_id)
     if not existing:
         raise HTTPException(status_code=404, detail="Portfolio not found")
-    if not hasattr(storage, "save_portfolio"):
+    if not has_storage_method(request, "save_portfolio"):
         raise HTTPException(
             status_code=status.HTTP_501_NOT_IMPLEMENTED,
             detail="Portfolio storage is not configured",
@@ -147,7 +139,7 @@ async def update_portfolio(request: Request, portfolio_id: str, portfolio: Portf
         "stocks": portfolio.stocks,
         "updated_at": datetime.now(),
     }
-    storage.save_portfolio(payload)
+    await storage_call(request, "save_portfolio", payload)
 
     return {
         "code": 200,
@@ -158,15 +150,14 @@ async def update_portfolio(request: Request, portfolio_id: str, portfolio: Portf
 
 @router.delete("/{portfolio_id}")
 async def delete_portfolio(request: Request, portfolio_id: str):
-    storage = _storage(request)
-    if not hasattr(storage, "portfolios"):
+    if not has_storage_method(request, "delete_portfolio"):
         raise HTTPException(
             status_code=status.HTTP_501_NOT_IMPLEMENTED,
             detail="Portfolio storage is not configured",
         )
 
-    result = storage.portfolios.delete_one({"$or": [{"id": portfolio_id}, {"name": portfolio_id}]})
-    if result.deleted_count == 0:
+    deleted_count = await storage_call(request, "delete_portfolio", portfolio_id)
+    if deleted_count == 0:
         raise HTTPException(status_code=404, detail="Portfolio not found")
 
     return {"code": 200, "message": "Portfolio deleted"}
@@ -174,7 +165,7 @@ async def delete_portfolio(request: Request, portfolio_id: str):
 
 @router.get("/{portfolio_id}/performance")
 async def get_portfolio_performance(request: Request, portfolio_id: str, days: int = 30):
-    portfolio = _find_portfolio(request, portfolio_id)
+    portfolio = await _find_portfolio(request, portfolio_id)
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
 
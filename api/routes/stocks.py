@@ -6,6 +6,7 @@ from typing import List, Optional
 from datetime import datetime, timedelta
 
 from fastapi import APIRouter, HTTPException, Request, Query
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from loguru import logger
 
@@ -17,14 +18,16 @@ from api.validators import (
     validate_pagination
 )
 from api.cache import cached, clear_cache
+from api.storage import storage_call
 from skills.skill_data.text_utils import repair_mojibake_text
+from skills.skill_ai.scorer import public_score
 
 
 router = APIRouter()
 
 
 def _serialize_score(score: dict) -> dict:
-    item = dict(score)
+    item = public_score(score)
     for key, value in list(item.items()):
         if hasattr(value, "item"):
             item[key] = value.item()
@@ -34,7 +37,7 @@ def _serialize_score(score: dict) -> dict:
 
 
 def _generate_real_scores(engine, limit: int = 50) -> list[dict]:
-    stock_list = engine._get_stock_list()
+    stock_list = engine._get_stock_list(resolve_indices=False)
     if not stock_list:
         return []
 
@@ -58,11 +61,10 @@ def _generate_real_scores(engine, limit: int = 50) -> list[dict]:
 
     scores = [_serialize_score(row) for row in scores_df.head(limit).to_dict("records")]
 
-    for score in scores:
-        try:
-            engine.storage.save_stock_score(score)
-        except Exception as exc:
-            logger.error(f"Failed to save stock score {score.get('code')}: {exc}")
+    try:
+        engine.storage.save_scores_batch(scores)
+    except Exception as exc:
+        logger.error(f"Failed to save stock scores: {exc}")
 
     return scores
 
@@ -116,7 +118,7 @@ async def get_stock_list(
     page, page_size = validate_pagination(page, page_size)
     
     engine = request.app.state.engine
-    stock_list = engine._get_stock_list()
+    stock_list = engine._get_stock_list(resolve_indices=False)
     
     stocks = []
     for code in stock_list:
@@ -155,10 +157,10 @@ async def get_stock_scores(
 
     try:
         # 先尝试从存储中读取已有的评分数据
-        scores = engine.storage.load_latest_scores(limit=50)
+        scores = await storage_call(request, "load_latest_scores", limit=50, default=[])
 
         if not scores:
-            scores = _generate_real_scores(engine, limit=50)
+            scores = await run_in_threadpool(_generate_real_scores, engine, 50)
             if not scores:
                 return {
                     "code": 200,
@@ -169,6 +171,8 @@ async def get_stock_scores(
                     }
                 }
 
+        scores = [public_score(score) for score in scores]
+
         # 添加股票名称
         for score in scores:
             score["name"] = await _get_stock_name(request, score["code"])
@@ -190,6 +194,43 @@ async def get_stock_scores(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/screen")
+async def screen_stocks(
+    request: Request,
+    filters: List[str] = Query([], description="筛选条件，如 roe>15、momentum_pct>=0.9"),
+    momentum_window: int = Query(20, ge=1, le=250),
+    as_of: Optional[str] = None,
+    order_by: str = Query("momentum"),
+    limit: int = Query(50, ge=1, le=500)
+):
+    if as_of:
+        as_of = validate_date_format(as_of)
+    
+    try:
+        df = await storage_call(
+            request, "screen", filters,
+            momentum_window=momentum_window, as_of=as_of, order_by=order_by, limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if df is None:
+        raise HTTPException(status_code=501, detail="当前存储不支持筛选查询")
+    
+    items = df.astype(object).where(df.notna(), None).to_dict("records")
+    for item in items:
+        if hasattr(item.get("date"), "strftime"):
+            item["date"] = item["date"].strftime("%Y-%m-%d")
+    
+    return {
+        "code": 200,
+        "data": {
+            "items": items,
+            "total": len(items)
+        }
+    }
+
+
 @router.get("/{code}")
 async def get_stock_detail(
     request: Request,
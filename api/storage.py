@@ -0,0 +1,45 @@
+"""
+路由访问存储的统一入口
+配置了异步存储（Motor）时直接 await，否则把同步存储调用放到线程池，避免阻塞事件循环
+"""
+
+from typing import Any
+
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+
+
+def create_async_storage(storage) -> Any:
+    """引擎使用 MongoDB 存储时，基于共享的 Motor 客户端创建对应的异步存储"""
+    from skills.skill_data.mongo_storage import MongoDBStorage
+
+    mongo_storage = getattr(storage, "storage", storage)
+    if not isinstance(mongo_storage, MongoDBStorage):
+        return None
+
+    from skills.skill_data.async_mongo_storage import AsyncMongoDBStorage
+    from skills.skill_data.mongo_client import get_async_mongo_client
+
+    client = get_async_mongo_client(
+        mongo_storage.connection_string, mongo_storage.config.get("pool")
+    )
+    return AsyncMongoDBStorage(client[mongo_storage.database_name], mongo_storage.config)
+
+
+def has_storage_method(request: Request, name: str) -> bool:
+    async_storage = getattr(request.app.state, "async_storage", None)
+    if async_storage is not None and hasattr(async_storage, name):
+        return True
+    return hasattr(request.app.state.engine.storage, name)
+
+
+async def storage_call(request: Request, name: str, *args, default: Any = None, **kwargs) -> Any:
+    """调用存储方法；两种存储都没有该方法时返回 default"""
+    async_storage = getattr(request.app.state, "async_storage", None)
+    if async_storage is not None and hasattr(async_storage, name):
+        return await getattr(async_storage, name)(*args, **kwargs)
+
+    storage = request.app.state.engine.storage
+    if not hasattr(storage, name):
+        return default
+    return await run_in_threadpool(getattr(storage, name), *args, **kwargs)
@@ -1,9 +1,13 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import MongoClient
 from typing import Optional
-import os
 
 from api.config import get_settings
+from skills.skill_data.mongo_client import (
+    get_mongo_client,
+    get_async_mongo_client,
+    close_mongo_clients,
+)
 
 
 settings = get_settings()
@@ -22,13 +26,7 @@ def get_database_url() -> str:
 
 
 def init_mongodb():
-    timeout_ms = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "2000"))
-    db.client = MongoClient(
-        get_database_url(),
-        serverSelectionTimeoutMS=timeout_ms,
-        connectTimeoutMS=timeout_ms,
-        socketTimeoutMS=timeout_ms,
-    )
+    db.client = get_mongo_client(get_database_url())
     return db.client
 
 
@@ -39,7 +37,7 @@ def get_db():
 
 
 async def init_async_mongodb():
-    db.async_client = AsyncIOMotorClient(get_database_url())
+    db.async_client = get_async_mongo_client(get_database_url())
     return db.async_client
 
 
@@ -50,7 +48,6 @@ async def get_async_db():
 
 
 def close_mongodb():
-    if db.client:
-        db.client.close()
-    if db.async_client:
-        db.async_client.close()
+    close_mongo_clients()
+    db.client = None
+    db.async_client = None
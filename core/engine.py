@@ -1,14 +1,21 @@
 import yaml
-from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Optional
 import time
+import numpy as np
+import pandas as pd
 
 from skills.skill_data import StockDataFetcher, DataStorage, NewsFetcher
-from skills.skill_ai import StockScorer, StrategyAnalyzer, FactorModel
+from skills.skill_data.adjust import apply_adjustment
+from skills.skill_data.trading_calendar import TradingCalendar
+from skills.skill_data.universe import IndexUniverse, IndustryClassification
+from skills.skill_ai import StockScorer, StrategyAnalyzer, FactorModel, MLScorer
+from skills.skill_ai.factors import latest_bar_date
+from skills.skill_ai.scorer import public_scores
 from skills.skill_risk import BacktestEngine, RiskMetrics
 from skills.skill_report import ReportGenerator, ChartGenerator
 from skills.skill_ops import TaskScheduler, AppLogger
+from core.pipeline import StreamingDailyPipeline
 
 
 class QuantEngine:
@@ -46,19 +53,62 @@ class QuantEngine:
         mongo_conn = self.config.get('database', {}).get('mongodb_connection')
         if mongo_conn:
             from skills.skill_data.mongo_storage import MongoDBStorage
-            self.storage = MongoDBStorage(connection_string=mongo_conn).connect()
+            self.storage = MongoDBStorage(
+                connection_string=mongo_conn,
+                config=self.config.get('database', {})
+            ).connect()
             self.logger.info("使用 MongoDB 作为主存储")
+        elif self.config.get('storage', {}).get('backend') == 'analytical':
+            from skills.skill_data.analytics import AnalyticalStorage
+            self.storage = AnalyticalStorage(
+                self.config.get('data_dir', 'data'),
+                self.config.get('storage', {})
+            )
+            self.logger.info(f"使用分析型存储（{self.storage.engine}）作为主存储")
         else:
-            self.storage = DataStorage(self.config.get('data_dir', 'data'))
+            self.storage = DataStorage(
+                self.config.get('data_dir', 'data'),
+                self.config.get('storage', {})
+            )
             self.logger.info("使用文件系统作为主存储")
+        
+        cache_max_mb = self.config.get('storage', {}).get('cache_max_mb', 0)
+        if cache_max_mb:
+            from skills.skill_data.storage_cache import CachedStorage
+            self.storage = CachedStorage(self.storage, max_bytes=int(cache_max_mb * 1024 * 1024))
+            self.logger.info(f"存储读缓存已启用，上限 {cache_max_mb} MB")
             
         self.news_fetcher = NewsFetcher()
         
-        self.scorer = StockScorer(self.config.get('ai_model', {}))
-        self.analyzer = StrategyAnalyzer()
-        self.factor_model = FactorModel()
+        self.ml_model = MLScorer(
+            self.config.get('ai_model', {}).get('ml', {}),
+            self.config.get('data_dir', 'data')
+        )
+        self.scorer = StockScorer(self.config.get('ai_model', {}), ml_model=self.ml_model)
+        self.analyzer = StrategyAnalyzer(self.config.get('ai_model', {}))
+        self.factor_model = FactorModel(
+            self.config.get('factor_model', {}),
+            self.config.get('data_dir', 'data')
+        )
+        
+        self.calendar = TradingCalendar(
+            self.config.get('data_dir', 'data'),
+            self.config.get('calendar', {})
+        )
         
-        self.backtest = BacktestEngine(self.config.get('risk', {}))
+        self.universe = IndexUniverse(
+            self.config.get('data_dir', 'data'),
+            fetcher=self.fetcher,
+            config=self.config.get('stock_pool', {}),
+            calendar=self.calendar
+        )
+        self.industries = IndustryClassification(
+            self.config.get('data_dir', 'data'),
+            fetcher=self.fetcher,
+            config=self.config.get('stock_pool', {})
+        )
+        
+        self.backtest = BacktestEngine(self.config.get('risk', {}), calendar=self.calendar)
         self.risk_metrics = RiskMetrics()
         
         self.report_gen = ReportGenerator(self.config.get('report', {}))
@@ -77,52 +127,17 @@ class QuantEngine:
             'data': {}
         }
         
+        if self._skip_non_trading_day():
+            self.logger.info("今日非交易日，跳过每日分析")
+            result['status'] = 'skipped'
+            result['reason'] = 'non_trading_day'
+            return result
+        
         try:
-            stock_list = self._get_stock_list()
-            
-            self.logger.info(f"分析股票列表: {stock_list}")
-            
-            self.logger.info("步骤1: 抓取行情数据")
-            price_data = self.fetcher.fetch_price_data(stock_list)
-            
-            for code, df in price_data.items():
-                df = self.fetcher.calculate_technical_indicators(df)
-                self.storage.save_price_data(code, df)
-            
-            self.logger.info("步骤2: 抓取财务数据")
-            financial_data = self.fetcher.fetch_financial_data(stock_list)
-            
-            for code, data in financial_data.items():
-                self.storage.save_financial_data(code, data)
-            
-            self.logger.info("步骤3: 抓取新闻数据")
-            news_data = self.news_fetcher.fetch_news(stock_list)
-            
-            for code, news in news_data.items():
-                self.storage.save_news(code, news)
-            
-            self.logger.info("步骤4: 股票评分")
-            scores = self.scorer.score_stocks(price_data, financial_data, news_data)
-            result['data']['stock_scores'] = scores.to_dict('records') if not scores.empty else []
-
-            # 保存评分到存储
-            if not scores.empty:
-                for _, score in scores.iterrows():
-                    self.storage.save_stock_score(score.to_dict())
-                self.logger.info(f"已保存 {len(scores)} 条评分数据到存储")
-
-            self.logger.info("步骤5: 策略分析")
-            try:
-                strategy = self.analyzer.analyze_strategy(price_data, stock_list)
-                result['data']['strategy_analysis'] = strategy
-            except Exception as e:
-                self.logger.error(f"策略分析失败: {e}")
-                result['data']['strategy_analysis'] = {
-                    'total_stocks': len(stock_list),
-                    'analysis_date': datetime.now().strftime("%Y-%m-%d"),
-                    'stocks': [],
-                    'summary': {}
-                }
+            if self.config.get('pipeline', {}).get('mode') == 'streaming':
+                price_data, scores, strategy = self._run_streaming_steps(result)
+            else:
+                price_data, scores, strategy = self._run_batch_steps(result)
 
             self.logger.info("步骤6: 风控分析")
             top_stocks = self.scorer.get_top_stocks(scores, 5)
@@ -154,7 +169,7 @@ class QuantEngine:
                     "down_count": market_summary.get("down_count", 0),
                     "volume": f"{market_summary.get('total_amount', 0) / 1e8:.2f}亿"
                 },
-                "top_stocks": scores.head(10).to_dict('records') if not scores.empty else [],
+                "top_stocks": public_scores(scores.head(10)).to_dict('records') if not scores.empty else [],
                 "risk_metrics": result['data'].get('risk_metrics', {})
             }
             result['data']['report_payload'] = report_payload
@@ -183,6 +198,262 @@ class QuantEngine:
         
         return result
     
+    def _run_batch_steps(self, result: Dict):
+        """步骤1-5：整个股票池一次性抓取、评分和策略分析"""
+        stock_list = self._apply_prescreen(self._get_stock_list())
+        
+        self.logger.info(f"分析股票列表: {stock_list}")
+        
+        self.logger.info("步骤1: 抓取行情数据")
+        price_data = self._sync_prices(stock_list)
+        
+        self.logger.info("步骤2: 抓取财务数据")
+        financial_data = self.fetcher.fetch_financial_data(stock_list)
+        
+        self.storage.save_financial_batch(financial_data)
+        
+        self.logger.info("步骤3: 抓取新闻数据")
+        news_data = self.news_fetcher.fetch_news(stock_list)
+        
+        self.storage.save_news_batch(news_data)
+        
+        self.logger.info("步骤4: 股票评分")
+        self._refresh_ml_model()
+        scores = self.scorer.score_stocks(
+            price_data, financial_data, news_data,
+            previous_scores=self._load_previous_scores(stock_list)
+        )
+        exposures = self._update_factor_exposures(price_data, financial_data)
+        scores = self._attach_factor_model_scores(scores, exposures)
+        self._save_daily_scores(result, scores)
+        self._save_features(scores, latest_bar_date(price_data))
+
+        self.logger.info("步骤5: 策略分析")
+        try:
+            strategy = self.analyzer.analyze_strategy(price_data, stock_list)
+        except Exception as e:
+            self.logger.error(f"策略分析失败: {e}")
+            strategy = {
+                'total_stocks': len(stock_list),
+                'analysis_date': datetime.now().strftime("%Y-%m-%d"),
+                'stocks': [],
+                'summary': {}
+            }
+        result['data']['strategy_analysis'] = strategy
+        
+        return price_data, scores, strategy
+    
+    def _run_streaming_steps(self, result: Dict):
+        """步骤1-5 的流式版本：按块处理全市场，内存中只保留评分和单只股票分析结果"""
+        pipeline = StreamingDailyPipeline(self, self.config.get('pipeline', {}))
+        stock_list = self._apply_prescreen(pipeline.universe())
+        
+        self.logger.info(f"步骤1-5: 流式分析 {len(stock_list)} 只股票，每块 {pipeline.chunk_size} 只")
+        self._refresh_ml_model()
+        streamed = pipeline.run(stock_list)
+        result['data']['pipeline'] = streamed['stats']
+        
+        scores = self._attach_factor_model_scores(streamed['scores'], streamed['exposures'])
+        self._save_daily_scores(result, scores)
+        if self.factor_model.config['persist'] and streamed['as_of'] is not None and not streamed['exposures'].empty:
+            self.factor_model.save_exposures(streamed['exposures'], streamed['as_of'])
+        self._save_features(scores, streamed['as_of'])
+        
+        strategy = {
+            'total_stocks': len(stock_list),
+            'analysis_date': datetime.now().strftime("%Y-%m-%d"),
+            'stocks': streamed['stocks'],
+            'summary': self.analyzer.summarize(streamed['stocks']) if streamed['stocks'] else {}
+        }
+        result['data']['strategy_analysis'] = strategy
+        
+        # 回测和图表只需要排名靠前股票的行情，从存储中读回
+        price_data = self._load_stored_prices(self.scorer.get_top_stocks(scores, 10))
+        return price_data, scores, strategy
+    
+    def _save_daily_scores(self, result: Dict, scores: pd.DataFrame):
+        result['data']['stock_scores'] = public_scores(scores).to_dict('records') if not scores.empty else []
+
+        # 保存评分（含指纹，供下次增量评分比对）到存储
+        if not scores.empty:
+            self.storage.save_scores_batch(scores)
+            self.logger.info(f"已保存 {len(scores)} 条评分数据到存储")
+    
+    def _update_factor_exposures(self, price_data: Dict, financial_data: Dict) -> Optional[pd.DataFrame]:
+        """计算并保存当日原始因子暴露，失败不影响每日分析（返回 None）"""
+        try:
+            return self.factor_model.update_exposures(price_data, financial_data)
+        except Exception as e:
+            self.logger.error(f"因子暴露计算失败: {e}")
+            return None
+    
+    def _attach_factor_model_scores(self, scores: pd.DataFrame, exposures: Optional[pd.DataFrame]) -> pd.DataFrame:
+        """在全市场原始暴露上计算多因子综合得分（开启 neutralize 时做行业 + 市值中性化），
+        写入 multi_factor_score 列；只作参考，不改变 total_score 与排名，失败不影响每日分析"""
+        if scores.empty or exposures is None or exposures.empty:
+            return scores
+        try:
+            industries = None
+            if self.factor_model.config['neutralize']:
+                industries = self.industries.industries(exposures['code'].tolist())
+                if not industries:
+                    self.logger.warning("没有行业分类，多因子得分未中性化")
+            factor_scores = self.factor_model.calculate_composite_score(
+                self.factor_model.neutral_scores(exposures, industries))
+        except Exception as e:
+            self.logger.error(f"多因子得分计算失败: {e}")
+            return scores
+        composite = factor_scores.set_index('code')['composite_score']
+        scores = scores.copy()
+        scores['multi_factor_score'] = scores['code'].map(composite).astype(np.float64).round(2)
+        return scores
+    
+    def _save_features(self, scores: pd.DataFrame, day):
+        """评分结果写入 ML 特征库（ai_model.ml.feature_store），失败不影响每日分析"""
+        if not self.ml_model.config['feature_store'] or scores.empty or day is None:
+            return
+        try:
+            from skills.skill_ai.ml_model import feature_frame
+            self.ml_model.store.save(feature_frame(scores), day)
+        except Exception as e:
+            self.logger.error(f"保存特征快照失败: {e}")
+    
+    def _refresh_ml_model(self):
+        """ai / hybrid 评分前，模型缺失或超过 retrain_days 时用已有特征快照重新训练"""
+        if self.scorer.scoring_method in ('ai', 'hybrid') and self.ml_model.is_stale():
+            self.train_ml_model(backfill=False)
+    
+    def _sync_prices(self, stock_list: List[str]) -> Dict:
+        """已是最新的行情直接读取，其余抓取、计算指标并保存，返回分析用行情"""
+        price_data = self._load_fresh_prices(stock_list)
+        stale_codes = [code for code in stock_list if code not in price_data]
+        if price_data:
+            self.logger.info(f"{len(price_data)} 只股票行情已是最新，跳过抓取")
+        
+        if stale_codes and self.fetcher.store_raw_prices:
+            price_data.update(self._sync_raw_prices(stale_codes))
+        elif stale_codes:
+            fetched = {
+                code: self.fetcher.calculate_technical_indicators(df)
+                for code, df in self.fetcher.fetch_price_data(stale_codes).items()
+            }
+            self.storage.save_price_batch(fetched)
+            price_data.update(fetched)
+        return price_data
+    
+    def _load_stored_prices(self, stock_list: List[str]) -> Dict:
+        """从存储读取历史行情（raw 模式换算为前复权并计算技术指标）"""
+        price_data = {}
+        for code in stock_list:
+            if self.fetcher.store_raw_prices:
+                df = self._adjusted_prices(code, self.storage.load_all_price_data(code))
+            else:
+                df = self.storage.load_all_price_data(code)
+            if df is not None and not df.empty:
+                price_data[code] = df
+        return price_data
+    
+    def _skip_non_trading_day(self) -> bool:
+        if not self.config.get('calendar', {}).get('skip_non_trading_days', True):
+            return False
+        try:
+            return not self.calendar.is_trading_day()
+        except Exception as e:
+            self.logger.warning(f"交易日历不可用，按交易日执行: {e}")
+            return False
+    
+    def _load_fresh_prices(self, stock_list: List[str]) -> Dict:
+        """已存行情的最后一根 K 线即最近交易日时直接读取，不再重复抓取"""
+        fresh = {}
+        try:
+            session = self.calendar.latest_session()
+        except Exception as e:
+            self.logger.warning(f"交易日历不可用，全部重新抓取: {e}")
+            return fresh
+        if session is None:
+            return fresh
+        
+        for code in stock_list:
+            try:
+                if self.fetcher.store_raw_prices:
+                    df = self._adjusted_prices(code, self.storage.load_all_price_data(code))
+                else:
+                    df = self.storage.load_price_data(code)
+            except Exception as e:
+                self.logger.warning(f"读取 {code} 已存行情失败: {e}")
+                continue
+            if df is None or df.empty or 'date' not in df.columns:
+                continue
+            if self.calendar.trading_days_between(df['date'].max(), session) == 0:
+                fresh[code] = df
+        return fresh
+    
+    def _load_previous_scores(self, stock_list: List[str]) -> Optional[Dict]:
+        """增量评分所需的已保存评分，未开启或存储不支持时返回 None（全量评分）"""
+        if not self.config.get('ai_model', {}).get('incremental', True) or not hasattr(self.storage, 'load_scores'):
+            return None
+        try:
+            return self.storage.load_scores(stock_list)
+        except Exception as e:
+            self.logger.warning(f"读取已保存评分失败，全量评分: {e}")
+            return {}
+    
+    def _sync_raw_prices(self, stock_list: List[str]) -> Dict:
+        """抓取并保存不复权行情和复权因子，返回前复权行情用于分析
+
+        不复权的历史 K 线不会因除权变化，已存过的股票只从最后一根已存 K 线（可能是盘中不完整的）
+        起抓取缺失的尾部，与已存历史合并后保存；复权因子整体更新。
+        技术指标依赖复权基准，raw 模式不写入快照，由 _adjusted_prices 在换算后计算
+        """
+        stored, by_start = {}, {}
+        for code in stock_list:
+            df = self.storage.load_all_price_data(code)
+            start = None
+            if df is not None and not df.empty and 'date' in df.columns:
+                stored[code] = df
+                start = pd.Timestamp(df['date'].max()).strftime('%Y%m%d')
+            by_start.setdefault(start, []).append(code)
+        
+        fetched = {}
+        for start, codes in by_start.items():
+            fetched.update(self.fetcher.fetch_price_data(codes, start_date=start, adjust=""))
+        factors = self.fetcher.fetch_adjust_factors(list(fetched))
+        
+        raw_data = {}
+        for code, tail in fetched.items():
+            if code not in stored:
+                raw_data[code] = tail
+                continue
+            merged = pd.concat([stored[code], tail], ignore_index=True)
+            merged['date'] = pd.to_datetime(merged['date'])
+            raw_data[code] = merged.sort_values('date', kind='mergesort').drop_duplicates(
+                subset=['date'], keep='last'
+            ).reset_index(drop=True)
+        self.storage.save_price_batch(raw_data)
+        self.storage.save_adjust_factors(factors)
+        
+        price_data = {}
+        for code in stock_list:
+            df = self._adjusted_prices(code, raw_data.get(code, stored.get(code)), factors.get(code))
+            if df is not None:
+                price_data[code] = df
+        return price_data
+    
+    def _adjusted_prices(self, code: str, raw: Optional[pd.DataFrame],
+                         factors: Optional[pd.DataFrame] = None) -> Optional[pd.DataFrame]:
+        """raw 模式：不复权行情按复权因子换算为前复权，再计算技术指标（与 adjusted 模式保存的列一致）
+
+        没有复权因子的股票无法区分除权缺口和真实下跌，记录警告并跳过
+        """
+        if raw is None or raw.empty:
+            return None
+        if factors is None or factors.empty:
+            factors = self.storage.load_adjust_factors(code)
+        if factors is None or factors.empty:
+            self.logger.warning(f"{code} 没有复权因子，除权缺口会被当作下跌，跳过该股票")
+            return None
+        return self.fetcher.calculate_technical_indicators(apply_adjustment(raw, factors, 'qfq'))
+    
     def run_weekly_report(self) -> Dict:
         """运行周报"""
         start_time = time.time()
@@ -196,11 +467,7 @@ class QuantEngine:
         try:
             stock_list = self._get_stock_list()
             
-            price_data = {}
-            for code in stock_list:
-                df = self.storage.load_all_price_data(code)
-                if not df.empty:
-                    price_data[code] = df
+            price_data = self._load_stored_prices(stock_list)
             
             financial_data = {}
             for code in stock_list:
@@ -234,6 +501,144 @@ class QuantEngine:
         
         return result
     
+    def run_maintenance(self, dry_run: bool = False) -> Dict:
+        """存储维护：合并行情快照、执行保留策略并回收空间"""
+        from skills.skill_ops.maintenance import StorageMaintenance
+        
+        start_time = time.time()
+        self.logger.info("开始存储维护")
+        
+        result = {'status': 'success', 'timestamp': datetime.now().isoformat()}
+        try:
+            maintenance = StorageMaintenance(
+                self.storage,
+                data_dir=self.config.get('data_dir', 'data'),
+                report_dir=self.config.get('report', {}).get('output_dir', 'reports'),
+                config=self.config.get('maintenance', {})
+            )
+            result['data'] = maintenance.run(dry_run=dry_run)
+            result['summary'] = maintenance.format_summary(result['data'])
+            result['duration'] = round(time.time() - start_time, 2)
+            self.logger.info(f"存储维护完成，耗时: {result['duration']:.2f}秒")
+        except Exception as e:
+            self.logger.error(f"存储维护失败: {e}")
+            result['status'] = 'error'
+            result['error'] = str(e)
+        
+        return result
+    
+    def evaluate_factors(self, start_date: str = None, end_date: str = None) -> Dict:
+        """在已保存的每日因子暴露和存储的行情上评估因子（Rank IC、IC 衰减、IR、分位数收益）"""
+        from skills.skill_ai.evaluation import ExposureHistory, FactorEvaluator, close_matrix
+        
+        start_time = time.time()
+        self.logger.info("开始因子评估")
+        
+        result = {'status': 'success', 'timestamp': datetime.now().isoformat()}
+        try:
+            history = ExposureHistory.from_model(self.factor_model, start_date, end_date)
+            if not len(history):
+                raise ValueError("没有已保存的因子暴露，请先运行每日分析")
+            
+            evaluator = FactorEvaluator(self.config.get('factor_model', {}).get('evaluation', {}))
+            if evaluator.config['neutralize']:
+                industries = self.industries.industries(history.codes)
+                if industries:
+                    history = history.neutralized(industries)
+                else:
+                    self.logger.warning("没有行业分类，评估未中性化的暴露")
+            
+            close = close_matrix(self._load_stored_prices(history.codes), history.codes)
+            result['data'] = evaluator.evaluate(history, close)
+            result['duration'] = round(time.time() - start_time, 2)
+            self.logger.info(f"因子评估完成: {len(history)} 个交易日，{len(history.codes)} 只股票，"
+                             f"耗时 {result['duration']:.2f}秒")
+        except Exception as e:
+            self.logger.error(f"因子评估失败: {e}")
+            result['status'] = 'error'
+            result['error'] = str(e)
+        
+        return result
+    
+    def calibrate_weights(self, start_date: str = None, end_date: str = None) -> Dict:
+        """在存储的历史行情上批量回测多组评分权重，返回收益 / 回撤 / 换手的 Pareto 集与推荐权重"""
+        from skills.skill_ai.calibration import ScoreHistory, WeightCalibrator
+        from skills.skill_ai.evaluation import close_matrix
+        
+        start_time = time.time()
+        self.logger.info("开始权重校准")
+        
+        result = {'status': 'success', 'timestamp': datetime.now().isoformat()}
+        try:
+            stock_list = self._get_stock_list()
+            price_data = self._load_stored_prices(stock_list)
+            if not price_data:
+                raise ValueError("没有已存储的行情，请先运行每日分析")
+            
+            financial_data = {}
+            for code in price_data:
+                data = self.storage.load_financial_data(code)
+                if data:
+                    financial_data[code] = data
+            
+            calibrator = WeightCalibrator(self.config.get('ai_model', {}).get('calibration', {}),
+                                          self.scorer.factor_weights)
+            dates = calibrator.rebalance_dates(close_matrix(price_data, list(price_data)).index,
+                                               start_date, end_date)
+            history = ScoreHistory.from_prices(self.scorer, price_data, financial_data, dates)
+            if not len(history):
+                raise ValueError("回测区间内调仓日不足")
+            
+            result['data'] = calibrator.calibrate(history)
+            result['duration'] = round(time.time() - start_time, 2)
+            self.logger.info(f"权重校准完成: {len(history)} 个调仓期，{len(history.codes)} 只股票，"
+                             f"耗时 {result['duration']:.2f}秒")
+        except Exception as e:
+            self.logger.error(f"权重校准失败: {e}")
+            result['status'] = 'error'
+            result['error'] = str(e)
+        
+        return result
+    
+    def train_ml_model(self, backfill: bool = True) -> Dict:
+        """（可选回补历史特征快照）增量标注训练集并训练 ML 评分模型"""
+        from skills.skill_ai.evaluation import close_matrix
+        
+        start_time = time.time()
+        store = self.ml_model.store
+        result = {'status': 'success', 'timestamp': datetime.now().isoformat()}
+        try:
+            if backfill:
+                stock_list = self._get_stock_list()
+                price_data = self._load_stored_prices(stock_list)
+                financial_data = {}
+                for code in price_data:
+                    data = self.storage.load_financial_data(code)
+                    if data:
+                        financial_data[code] = data
+                days = close_matrix(price_data, list(price_data)).index
+                days = days[-int(self.ml_model.config['backfill_days']):][::-int(self.ml_model.config['backfill_step'])]
+                store.backfill(self.scorer, price_data, financial_data, days)
+            
+            # 只读取未标注快照中的股票行情
+            labeled = set(pd.to_datetime(store.training_set()['date']))
+            codes = sorted({code for day in store.dates() if day not in labeled
+                            for code in store.load(day)['code']})
+            close = close_matrix(self._load_stored_prices(codes), codes)
+            added = store.update_training_set(close, int(self.ml_model.config['horizon']))
+            
+            meta = self.ml_model.train()
+            if meta is None:
+                raise ValueError("训练样本不足")
+            result['data'] = {'samples_added': added, **meta}
+            result['duration'] = round(time.time() - start_time, 2)
+        except Exception as e:
+            self.logger.error(f"ML 模型训练失败: {e}")
+            result['status'] = 'error'
+            result['error'] = str(e)
+        
+        return result
+    
     def backtest_portfolio(self, portfolio: Dict[str, float],
                           start_date: str = None,
                           end_date: str = None) -> Dict:
@@ -261,15 +666,50 @@ class QuantEngine:
         
         return result
     
-    def _get_stock_list(self) -> List[str]:
-        """获取股票列表"""
+    def _get_stock_list(self, resolve_indices: bool = None) -> List[str]:
+        """获取股票列表
+
+        resolve_indices: 是否并入指数成分股，默认取 stock_pool.resolve_indices；
+            同步请求路径（API）传 False，只用配置的个股列表
+        """
         
         pool = self.config.get('stock_pool', {})
         
         stock_list = pool.get('stocks', [])
         
+        if resolve_indices is None:
+            resolve_indices = pool.get('resolve_indices', False)
+        if resolve_indices and pool.get('indices'):
+            members = self.universe.resolve(pool['indices'])
+            stock_list = list(dict.fromkeys([*stock_list, *members]))
+        
         return stock_list
     
+    def screen_stocks(self, filters: List = None, **kwargs):
+        """横截面筛选（需要分析型存储），条件示例: ['roe>15', 'momentum_pct>=0.9']"""
+        if not hasattr(self.storage, 'screen'):
+            raise RuntimeError("当前存储不支持筛选查询，请将 storage.backend 设为 analytical")
+        return self.storage.screen(filters, **kwargs)
+    
+    def _apply_prescreen(self, stock_list: List[str]) -> List[str]:
+        """按 stock_pool.screen 在已存历史上预筛选股票池，筛选不可用或无结果时沿用原股票池"""
+        filters = self.config.get('stock_pool', {}).get('screen')
+        if not filters or not hasattr(self.storage, 'screen'):
+            return stock_list
+        
+        try:
+            passed = set(self.storage.screen(filters)['code'])
+        except Exception as e:
+            self.logger.warning(f"股票池预筛选失败，沿用原股票池: {e}")
+            return stock_list
+        
+        screened = [code for code in stock_list if code in passed]
+        if not screened:
+            self.logger.warning("股票池预筛选无结果，沿用原股票池")
+            return stock_list
+        self.logger.info(f"股票池预筛选: {len(stock_list)} -> {len(screened)}")
+        return screened
+    
     def setup_scheduler(self):
         """设置调度任务"""
         
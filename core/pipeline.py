@@ -0,0 +1,159 @@
+"""全市场流式每日分析：股票按块依次 抓取 → 指标 → 持久化 → 评分，块间只保留最终排名需要的评分记录"""
+import gc
+import os
+from typing import Dict, List, Optional
+
+import pandas as pd
+import loguru
+
+from skills.skill_ai.factors import latest_bar_date
+
+
+DEFAULT_PIPELINE = {
+    'mode': 'batch',
+    'universe': 'pool',
+    'chunk_size': 200,
+    'min_chunk_size': 20,
+    'memory_limit_mb': 2048,
+}
+
+
+def current_rss_mb() -> Optional[float]:
+    """当前进程常驻内存（MB），平台不支持时返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except Exception:
+        return None
+
+
+def frames_mb(price_data: Dict[str, pd.DataFrame]) -> float:
+    """一块行情数据占用的内存（MB，不含 object 列的字符串内容）"""
+    return sum(df.memory_usage(index=True).sum() for df in price_data.values() if df is not None) / 1024 / 1024
+
+
+class StreamingDailyPipeline:
+    """分块每日分析
+
+    config（config.yaml pipeline 段）:
+        universe: pool 为股票池配置 / market 为全市场（get_stock_info_map）
+        chunk_size: 每块股票数
+        memory_limit_mb: 单块内存上限（MB）。每块取"相对上一块结束时常驻内存的增量"与
+            "本块行情数据大小"中的较大者（常驻内存在 gc 后通常不会回落，不能直接与上限比较），
+            超过时块大小减半；已是 min_chunk_size 时记录警告并继续
+    """
+
+    def __init__(self, engine, config: dict = None):
+        self.engine = engine
+        self.config = {**DEFAULT_PIPELINE, **(config or {})}
+        self.logger = loguru.logger
+
+        self.chunk_size = max(int(self.config['chunk_size']), 1)
+        self.min_chunk_size = max(min(int(self.config['min_chunk_size']), self.chunk_size), 1)
+        self.memory_limit_mb = self.config['memory_limit_mb']
+
+    def universe(self) -> List[str]:
+        if self.config['universe'] == 'market':
+            codes = sorted(self.engine.fetcher.get_stock_info_map())
+            if codes:
+                return codes
+            self.logger.warning("全市场股票列表获取失败，改用股票池配置")
+        return self.engine._get_stock_list()
+
+    def run(self, stock_list: List[str]) -> Dict:
+        """返回全局排名后的评分、各股策略分析、原始因子暴露（as_of 为最新 K 线日期）和分块统计"""
+        score_chunks, analyses, exposure_chunks = [], [], []
+        as_of = None
+        stats = {'stocks': len(stock_list), 'chunks': 0, 'peak_rss_mb': None, 'peak_chunk_mb': None}
+
+        gc.collect()
+        baseline = current_rss_mb()
+        position = 0
+        while position < len(stock_list):
+            codes = stock_list[position:position + self.chunk_size]
+            position += len(codes)
+            stats['chunks'] += 1
+            self.logger.info(f"分块 {stats['chunks']}: {len(codes)} 只股票（{position}/{len(stock_list)}）")
+
+            scores, chunk_analyses, exposures, chunk_as_of, price_mb = self._process_chunk(codes)
+            if not scores.empty:
+                score_chunks.append(scores.drop(columns=['rank']))
+            analyses.extend(chunk_analyses)
+            if exposures is not None and not exposures.empty:
+                exposure_chunks.append(exposures)
+            if chunk_as_of is not None:
+                as_of = max(as_of, chunk_as_of) if as_of is not None else chunk_as_of
+            del scores, chunk_analyses, exposures
+
+            gc.collect()
+            rss = current_rss_mb()
+            chunk_mb = price_mb
+            if rss is not None:
+                stats['peak_rss_mb'] = round(max(stats['peak_rss_mb'] or 0, rss), 1)
+                if baseline is not None:
+                    chunk_mb = max(chunk_mb, rss - baseline)
+                baseline = rss
+            stats['peak_chunk_mb'] = round(max(stats['peak_chunk_mb'] or 0, chunk_mb), 3)
+            self._enforce_memory_limit(chunk_mb)
+
+        stats['chunk_size'] = self.chunk_size
+        exposures = pd.concat(exposure_chunks, ignore_index=True) if exposure_chunks else pd.DataFrame()
+        return {'scores': self._rank(score_chunks), 'stocks': analyses,
+                'exposures': exposures, 'as_of': as_of, 'stats': stats}
+
+    def _process_chunk(self, codes: List[str]):
+        engine = self.engine
+        price_data = engine._sync_prices(codes)
+
+        financial_data = engine.fetcher.fetch_financial_data(codes)
+        engine.storage.save_financial_batch(financial_data)
+
+        news_data = engine.news_fetcher.fetch_news(codes)
+        engine.storage.save_news_batch(news_data)
+
+        scores = engine.scorer.score_stocks(
+            price_data, financial_data, news_data,
+            previous_scores=engine._load_previous_scores(codes)
+        )
+
+        try:
+            analyses = engine.analyzer.analyze_strategy(price_data, codes)['stocks']
+        except Exception as e:
+            self.logger.error(f"策略分析失败: {e}")
+            analyses = []
+
+        # 原始暴露逐股计算，分块结果拼接即为全市场暴露，截面标准化留给使用方
+        try:
+            exposures = engine.factor_model.calculate_exposures(price_data, financial_data)
+        except Exception as e:
+            self.logger.error(f"因子暴露计算失败: {e}")
+            exposures = None
+        return scores, analyses, exposures, latest_bar_date(price_data), frames_mb(price_data)
+
+    @staticmethod
+    def _rank(score_chunks: List[pd.DataFrame]) -> pd.DataFrame:
+        """各块评分合并后全局排名（稳定排序，与一次性评分的排名一致）"""
+        if not score_chunks:
+            return pd.DataFrame()
+        scores = pd.concat(score_chunks, ignore_index=True)
+        scores = scores.sort_values('total_score', ascending=False, kind='mergesort')
+        scores['rank'] = range(1, len(scores) + 1)
+        return scores
+
+    def _enforce_memory_limit(self, chunk_mb: float):
+        """本块内存超过上限时把块大小减半，已是最小块时只记录警告，不中止每日分析"""
+        if not self.memory_limit_mb or chunk_mb <= self.memory_limit_mb:
+            return
+        if self.chunk_size <= self.min_chunk_size:
+            self.logger.warning(
+                f"单块内存 {chunk_mb:.1f} MB 超过上限 {self.memory_limit_mb} MB，块大小已是最小值 {self.chunk_size}，继续执行"
+            )
+            return
+        self.chunk_size = max(self.chunk_size // 2, self.min_chunk_size)
+        self.logger.warning(f"单块内存 {chunk_mb:.1f} MB 超过上限 {self.memory_limit_mb} MB，块大小降为 {self.chunk_size}")
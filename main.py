@@ -20,7 +20,7 @@ def main():
     
     parser.add_argument(
         '--mode',
-        choices=['daily', 'weekly', 'backtest', 'serve'],
+        choices=['daily', 'weekly', 'backtest', 'serve', 'maintain', 'factors', 'calibrate', 'train'],
         default='daily',
         help='运行模式'
     )
@@ -43,6 +43,12 @@ def main():
         help='投资组合 (JSON格式，如: {"600519.SH": 0.3, "000858.SH": 0.7})'
     )
     
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='维护模式下只统计将被清理的内容，不修改文件'
+    )
+    
     args = parser.parse_args()
     
     print("=" * 50)
@@ -100,6 +106,75 @@ def main():
         print(f"  波动率: {result.get('volatility', 0):.2f}%")
         print(f"  胜率: {result.get('win_rate', 0):.2f}%")
     
+    elif args.mode == 'maintain':
+        print("\n执行存储维护..." + (" (dry run)" if args.dry_run else ""))
+        result = engine.run_maintenance(dry_run=args.dry_run)
+        
+        if result['status'] == 'success':
+            actions = result['data']['actions']
+            compact = actions.get('compact_prices', {})
+            print(f"\n✓ 存储维护完成")
+            print(f"  合并快照: {compact.get('codes', 0)} 只股票，删除 {compact.get('files_removed', 0)} 个文件")
+            print(f"  重复K线: {compact.get('rows_removed', 0)} 条")
+            if 'prices_migrated' in actions:
+                print(f"  行情布局迁移: {actions['prices_migrated'].get('codes', 0)} 只股票")
+            print(f"  过期报告: {actions.get('reports_removed', 0)} 个，过期图表: {actions.get('charts_removed', 0)} 个")
+            print(f"  过期新闻: {actions.get('news_removed', 0)} 条")
+            print("  存储占用:")
+            print(result['summary'])
+        else:
+            print(f"\n✗ 存储维护失败: {result.get('error')}")
+            sys.exit(1)
+    
+    elif args.mode == 'factors':
+        print("\n执行因子评估...")
+        result = engine.evaluate_factors()
+        
+        if result['status'] == 'success':
+            import pandas as pd
+            
+            with pd.option_context('display.width', 120, 'display.max_columns', None):
+                print("\nRank IC / IR / 分位数多空收益:")
+                print(result['data']['summary'].round(4))
+                print("\nIC 衰减（区间收益上的平均 IC）:")
+                print(result['data']['decay'].round(4))
+            print(f"\n✓ 因子评估完成，耗时: {result.get('duration', 0)}秒")
+        else:
+            print(f"\n✗ 因子评估失败: {result.get('error')}")
+            sys.exit(1)
+    
+    elif args.mode == 'calibrate':
+        print("\n执行评分权重校准...")
+        result = engine.calibrate_weights()
+        
+        if result['status'] == 'success':
+            import pandas as pd
+            
+            data = result['data']
+            with pd.option_context('display.width', 160, 'display.max_columns', None):
+                print("\n收益 / 回撤 / 换手 Pareto 集（按 objective 排序）:")
+                print(data['pareto'].drop(columns='pareto').head(20).round(4))
+            print("\n推荐权重（写入 config.yaml ai_model.factors）:")
+            for factor, weight in data['best']['weights'].items():
+                print(f"  {factor}: {weight}")
+            print(f"\n✓ 权重校准完成，耗时: {result.get('duration', 0)}秒")
+        else:
+            print(f"\n✗ 权重校准失败: {result.get('error')}")
+            sys.exit(1)
+    
+    elif args.mode == 'train':
+        print("\n回补特征快照并训练 ML 评分模型...")
+        result = engine.train_ml_model(backfill=True)
+        
+        if result['status'] == 'success':
+            data = result['data']
+            print(f"  新增样本: {data['samples_added']} 条")
+            print(f"  训练样本: {data['samples']} 条（{data['start']} ~ {data['end']}）")
+            print(f"\n✓ 训练完成，耗时: {result.get('duration', 0)}秒")
+        else:
+            print(f"\n✗ 训练失败: {result.get('error')}")
+            sys.exit(1)
+    
     elif args.mode == 'serve':
         print("\n启动服务模式...")
         engine.start()
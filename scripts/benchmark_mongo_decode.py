@@ -0,0 +1,87 @@
+"""Mongo K 线读取基准：对比逐文档 pd.DataFrame(list(cursor)) 与 pymongoarrow find_arrow_all 的耗时，并校验结果一致
+
+在 MONGO_CONNECTION 指向的库中写入一个临时集合，结束后删除。
+用法: python scripts/benchmark_mongo_decode.py [--bars 200000] [--repeat 3]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pymongo import MongoClient
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from skills.skill_data.mongo_storage import MongoDBStorage  # noqa: E402
+
+
+def synthetic_bars(bars: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end='2024-12-31', periods=bars)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+    volume = rng.integers(1e5, 3e8, bars)
+    return [
+        {'stock_code': 'BENCH', 'date': day.to_pydatetime(), 'open': float(c), 'high': float(c * 1.01),
+         'low': float(c * 0.99), 'close': float(c), 'volume': int(v)}
+        for day, c, v in zip(dates, close, volume)
+    ]
+
+
+def best_of(repeat: int, func):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mongo K 线读取基准")
+    parser.add_argument('--bars', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    uri = os.getenv("MONGO_CONNECTION", "mongodb://localhost:27017/aiqrh")
+    client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+    db = client.get_default_database("aiqrh")
+    collection = db["bench_stock_prices"]
+    collection.drop()
+    collection.insert_many(synthetic_bars(args.bars))
+    collection.create_index([('stock_code', 1), ('date', 1)])
+
+    query = {'stock_code': 'BENCH'}
+    projection = MongoDBStorage._price_projection()
+
+    def dict_path():
+        return pd.DataFrame(list(collection.find(query, projection).sort('date', 1)))
+
+    try:
+        dict_time, expected = best_of(args.repeat, dict_path)
+        print(f"K 线数: {args.bars}")
+        print(f"逐文档 pd.DataFrame(list(cursor)): {dict_time:.2f} 秒")
+
+        try:
+            from pymongoarrow.api import find_arrow_all
+        except ImportError:
+            print("未安装 pymongoarrow，只测逐文档路径")
+            return
+
+        arrow_time, actual = best_of(args.repeat, lambda: find_arrow_all(
+            collection, query, projection=projection, sort=[('date', 1)]).to_pandas())
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+        assert actual['volume'].dtype == np.int64
+        print(f"pymongoarrow find_arrow_all: {arrow_time:.2f} 秒")
+        print(f"加速比: {dict_time / arrow_time:.1f}x（结果一致，volume 保持 int64）")
+    finally:
+        collection.drop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""StockScorer 向量化评分基准：合成股票池上对比逐只评分与面板评分的耗时，并校验结果一致
+
+用法: python scripts/benchmark_scorer.py [--stocks 5000] [--days 250] [--seed 0] [--workers 8]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from skills.skill_ai.scorer import StockScorer  # noqa: E402
+
+
+def synthetic_universe(stocks: int, days: int, seed: int = 0):
+    """随机游走行情 + 随机财务/新闻，长度、停牌和缺失字段都有覆盖"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end='2024-12-31', periods=days)
+    price_data, financial_data, news_data = {}, {}, {}
+
+    for i in range(stocks):
+        code = f"{600000 + i:06d}.SH"
+        length = days if rng.random() > 0.1 else int(rng.integers(1, days))
+        vol = rng.uniform(0.005, 0.04)
+        close = 10 * np.exp(np.cumsum(rng.normal(0, vol, length)))
+        if length > 20 and rng.random() < 0.02:
+            close[-20:] = close[-20]  # 长期停牌，价格不变
+        spread = close * rng.uniform(0, 0.03, length)
+        price_data[code] = pd.DataFrame({
+            'date': dates[-length:],
+            'open': close,
+            'high': close + spread,
+            'low': close - spread,
+            'close': close,
+            'volume': rng.integers(1e5, 3e8, length).astype(np.int64),
+        })
+
+        financial = {
+            'pe': rng.choice([None, -5.0, float(rng.uniform(1, 80))]),
+            'pb': float(rng.uniform(0.3, 8)),
+            'roe': float(rng.uniform(-10, 35)),
+            'revenue_growth': rng.choice([None, float(rng.uniform(-30, 60))]),
+            'market_cap': float(rng.uniform(1e9, 1e12)),
+        }
+        if rng.random() < 0.1:
+            financial.pop('pe')
+        financial_data[code] = financial
+
+        if rng.random() < 0.3:
+            news_data[code] = [{'sentiment_score': float(rng.uniform(-1, 1))}
+                               for _ in range(int(rng.integers(1, 5)))]
+
+    return price_data, financial_data, news_data
+
+
+def run(scorer: StockScorer, data, repeat: int) -> tuple:
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = scorer.score_stocks(*data)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="StockScorer 向量化评分基准")
+    parser.add_argument('--stocks', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=250)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', default=0, help="额外测试多进程评分的进程数（auto 为 CPU 核数）")
+    args = parser.parse_args()
+
+    data = synthetic_universe(args.stocks, args.days, args.seed)
+
+    loop_time, expected = run(StockScorer({'vectorized': False}), data, 1)
+    panel_time, actual = run(StockScorer({'vectorized': True}), data, args.repeat)
+
+    columns = [c for c in expected.columns if c != 'timestamp']
+    pd.testing.assert_frame_equal(expected[columns], actual[columns])
+
+    print(f"股票数: {args.stocks}，K 线数: {args.days}")
+    print(f"逐只评分: {loop_time:.2f} 秒")
+    print(f"面板评分: {panel_time:.2f} 秒")
+    print(f"加速比: {loop_time / panel_time:.1f}x（结果一致）")
+
+    if args.workers:
+        parallel = {'workers': args.workers, 'min_stocks': 2}
+        pool_time, pooled = run(StockScorer({'vectorized': True, 'parallel': parallel}), data, args.repeat)
+        pd.testing.assert_frame_equal(expected[columns], pooled[columns])
+        print(f"多进程面板评分（{args.workers} 进程）: {pool_time:.2f} 秒，加速比 {loop_time / pool_time:.1f}x（结果一致）")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 from .scorer import StockScorer
 from .analyzer import StrategyAnalyzer
 from .factors import FactorModel
+from .ml_model import MLScorer
 
-__all__ = ['StockScorer', 'StrategyAnalyzer', 'FactorModel']
+__all__ = ['StockScorer', 'StrategyAnalyzer', 'FactorModel', 'MLScorer']
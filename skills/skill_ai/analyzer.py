@@ -4,6 +4,19 @@ from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 import loguru
 
+from .panel import PricePanel
+from .parallel import SharedArrays, map_shards, parallel_options, use_pool
+
+
+def _analyze_shard(arrays: Dict[str, np.ndarray], start: int, stop: int, codes: List[str]) -> List[dict]:
+    """进程池 worker：由共享内存中的收盘价重建单只股票行情并分析"""
+    analyzer = StrategyAnalyzer()
+    results = []
+    for row in range(start, stop):
+        close = arrays['price_close'][row, -arrays['lengths'][row]:]
+        results.append(analyzer._analyze_single_stock(pd.DataFrame({'code': codes[row], 'close': close})))
+    return results
+
 
 class StrategyAnalyzer:
     """策略分析器"""
@@ -11,6 +24,9 @@ class StrategyAnalyzer:
     def __init__(self, config: dict = None):
         self.config = config or {}
         self.logger = loguru.logger
+        
+        # 与 StockScorer 共用 ai_model.parallel 配置
+        self.parallel = parallel_options(self.config)
     
     def analyze_strategy(self, price_data: Dict[str, pd.DataFrame],
                         stock_list: List[str]) -> Dict:
@@ -22,26 +38,55 @@ class StrategyAnalyzer:
             'stocks': []
         }
         
-        for code in stock_list:
-            if code in price_data:
-                df = price_data[code]
-                analysis = self._analyze_single_stock(df)
-                results['stocks'].append(analysis)
+        analyses = self._analyze_stocks(price_data, [code for code in stock_list if code in price_data])
+        results['stocks'].extend(analyses)
         
         if results['stocks']:
-            df_analysis = pd.DataFrame(results['stocks'])
-            
-            results['summary'] = {
-                'avg_return_5d': df_analysis['return_5d'].mean(),
-                'avg_return_20d': df_analysis['return_20d'].mean(),
-                'avg_volatility': df_analysis['volatility'].mean(),
-                'avg_score': df_analysis['signal_score'].mean(),
-                'best_performer': df_analysis.loc[df_analysis['return_20d'].idxmax(), 'code'],
-                'worst_performer': df_analysis.loc[df_analysis['return_20d'].idxmin(), 'code']
-            }
+            results['summary'] = self.summarize(results['stocks'])
         
         return results
     
+    def summarize(self, stocks: List[dict]) -> Dict:
+        """汇总单只股票分析结果（分块分析时各块结果合并后再汇总）"""
+        df_analysis = pd.DataFrame(stocks)
+        
+        return {
+            'avg_return_5d': df_analysis['return_5d'].mean(),
+            'avg_return_20d': df_analysis['return_20d'].mean(),
+            'avg_volatility': df_analysis['volatility'].mean(),
+            'avg_score': df_analysis['signal_score'].mean(),
+            'best_performer': df_analysis.loc[df_analysis['return_20d'].idxmax(), 'code'],
+            'worst_performer': df_analysis.loc[df_analysis['return_20d'].idxmin(), 'code']
+        }
+    
+    def _analyze_stocks(self, price_data: Dict[str, pd.DataFrame], codes: List[str]) -> List[dict]:
+        """逐只分析；股票数较多时只把收盘价放入共享内存，按股票分片到进程池，结果按 codes 顺序返回"""
+        unique_codes = list(dict.fromkeys(codes))
+        if not use_pool(self.parallel, len(unique_codes)):
+            return [self._analyze_single_stock(price_data[code]) for code in codes]
+        
+        # 行情不足或缺少 code 列的股票按原逻辑在本进程处理
+        frames = {
+            code: price_data[code] for code in unique_codes
+            if price_data[code] is not None and len(price_data[code]) >= 30 and 'code' in price_data[code].columns
+        }
+        panel, rejected = PricePanel.from_frames(frames, fields=('close',))
+        frame_codes = [frames[code]['code'].iloc[0] for code in panel.codes]
+        
+        workers = self.parallel['workers']
+        self.logger.info(f"多进程策略分析: {len(panel)} 只股票，{workers} 个进程")
+        with SharedArrays(panel.arrays()) as shared:
+            shards = map_shards(
+                _analyze_shard, shared.spec, len(panel), workers,
+                args=(frame_codes,), start_method=self.parallel['start_method']
+            )
+        
+        analyses = dict(zip(panel.codes, (analysis for shard in shards for analysis in shard)))
+        for code in unique_codes:
+            if code not in analyses:
+                analyses[code] = self._analyze_single_stock(price_data[code])
+        return [analyses[code] for code in codes]
+    
     def _analyze_single_stock(self, df: pd.DataFrame) -> dict:
         """分析单只股票"""
 
@@ -0,0 +1,315 @@
+"""因子评估：在已保存的每日因子暴露和前瞻收益上计算 Rank IC、IC 衰减、IR 与分位数收益
+
+所有计算都在 (日期, 股票) 矩阵上按行向量化：每个因子的暴露只排序一次，
+之后任意有效子集（暴露与收益同时存在的股票）上的平均名次由排序结果的累计计数得到，
+与逐日 scipy.stats.spearmanr 结果一致。
+"""
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+import loguru
+
+from .factors import industry_groups, neutralize_exposures
+from .parallel import SharedArrays, map_shards, parallel_options, use_pool
+
+
+DEFAULT_EVALUATION = {
+    'horizons': [1, 5, 10, 20],  # 前瞻收益的交易日数
+    'quantiles': 5,
+    'neutralize': False,  # 评估行业 + 市值中性化后的暴露
+    'min_stocks': 20,  # 截面有效股票数不足时该日不计 IC
+    'parallel': {'min_stocks': 250},  # 进程池按日期分片，min_stocks 此处指日期数
+}
+
+
+class ExposureHistory:
+    """按日期堆叠的因子暴露：values 为 (因子数, 日期数, 股票数) 的 float64 数组"""
+
+    def __init__(self, dates: pd.DatetimeIndex, codes: List[str], factors: List[str], values: np.ndarray):
+        self.dates = dates
+        self.codes = codes
+        self.factors = factors
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @classmethod
+    def from_frames(cls, frames: Dict[pd.Timestamp, pd.DataFrame],
+                    factors: Sequence[str] = None) -> 'ExposureHistory':
+        """由 {日期: 暴露表（code + 因子列）} 构建，股票取各日并集"""
+        days = sorted(frames)
+        if factors is None:
+            factors = [c for c in frames[days[0]].columns if c != 'code'] if days else []
+        codes = sorted(set().union(*(frames[day]['code'] for day in days))) if days else []
+        column = {code: i for i, code in enumerate(codes)}
+
+        values = np.full((len(factors), len(days), len(codes)), np.nan)
+        for row, day in enumerate(days):
+            frame = frames[day]
+            cols = frame['code'].map(column).to_numpy()
+            for f, factor in enumerate(factors):
+                if factor in frame.columns:
+                    values[f, row, cols] = frame[factor].to_numpy(dtype=np.float64)
+        return cls(pd.DatetimeIndex(days), codes, list(factors), values)
+
+    @classmethod
+    def from_model(cls, model, start=None, end=None) -> 'ExposureHistory':
+        """读取 FactorModel 保存的 [start, end] 区间内的每日暴露"""
+        days = [day for day in model.exposure_dates()
+                if (start is None or day >= pd.Timestamp(start)) and (end is None or day <= pd.Timestamp(end))]
+        return cls.from_frames({day: model.load_exposures(day) for day in days}, model.factors)
+
+    def neutralized(self, industries: Dict[str, str]) -> 'ExposureHistory':
+        """逐日对行业 + 市值中性化后的暴露（一次批量回归覆盖全部因子和日期）"""
+        values = neutralize_exposures(self.values, self.factors, industry_groups(self.codes, industries))
+        return ExposureHistory(self.dates, self.codes, self.factors, values)
+
+
+def close_matrix(price_data: Dict[str, pd.DataFrame], codes: Sequence[str]) -> pd.DataFrame:
+    """收盘价矩阵（行为全部 K 线日期的并集，列为 codes，缺失为 NaN）"""
+    series = {}
+    for code in codes:
+        df = price_data.get(code)
+        if df is not None and not df.empty and 'date' in df.columns:
+            series[code] = pd.Series(df['close'].to_numpy(dtype=np.float64),
+                                     index=pd.to_datetime(df['date']).dt.normalize())
+    if not series:
+        return pd.DataFrame(columns=list(codes), dtype=np.float64)
+    close = pd.concat(series, axis=1).sort_index()
+    return close.reindex(columns=list(codes))
+
+
+class SortedRows:
+    """逐行排序一次，之后可在任意子集上取平均名次（并列取平均，与 scipy rankdata 一致）
+
+    排序结果保存为展平后的下标，子集名次只需几次一维 take/cumsum
+    """
+
+    def __init__(self, values: np.ndarray):
+        rows, n = values.shape
+        self.shape = values.shape
+        offsets = np.arange(rows, dtype=np.int64)[:, None] * n
+        missing = np.isnan(values)
+        # NaN 换成 inf 再排序（含 NaN 时 argsort 慢数倍），缺失值不会进入任何子集
+        order = np.argsort(np.where(missing, np.inf, values), axis=1)
+        ordered = np.take_along_axis(values, order, axis=1)
+        self.order = (order + offsets).ravel()
+
+        starts = np.ones((rows, n), dtype=bool)
+        starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]  # NaN 与任何值都不相等，各自成组
+        self.has_ties = not starts.all()
+        if self.has_ties:
+            # 每个位置所在并列组的首、尾位置（展平下标）
+            position = np.broadcast_to(np.arange(n, dtype=np.int64), (rows, n))
+            ends = np.ones((rows, n), dtype=bool)
+            ends[:, :-1] = starts[:, 1:]
+            group_start = np.maximum.accumulate(np.where(starts, position, 0), axis=1)
+            group_end = np.minimum.accumulate(np.where(ends, position, n - 1)[:, ::-1], axis=1)[:, ::-1]
+            self.group_start = (group_start + offsets).ravel()
+            self.group_end = (group_end + offsets).ravel()
+
+    def ranks(self, mask: np.ndarray, center: np.ndarray = None) -> np.ndarray:
+        """mask 内元素在本行 mask 子集中的平均名次（从 1 开始），mask 外为 NaN
+
+        给定每行的 center 时返回减去 center 后的名次，mask 外为 0（便于直接求相关）
+        """
+        included = mask.ravel()[self.order]
+        cumulative = np.cumsum(included.reshape(self.shape), axis=1, dtype=np.int32).ravel()
+        if self.has_ties:
+            before = cumulative[self.group_start] - included[self.group_start]
+            through = cumulative[self.group_end]
+            average = (before + 1 + through) / 2
+        else:
+            average = cumulative.astype(np.float64)
+        if center is None:
+            ordered = np.where(included, average, np.nan)
+        else:
+            ordered = np.where(included, average - np.repeat(center, self.shape[1]), 0.)
+
+        ranks = np.empty(ordered.size)
+        ranks[self.order] = ordered
+        return ranks.reshape(self.shape)
+
+
+def row_rank_corr(dx: np.ndarray, dy: np.ndarray) -> np.ndarray:
+    """逐行 Pearson 相关，输入为已中心化、子集外为 0 的名次（即 Spearman 相关）"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.einsum('ij,ij->i', dx, dy) / np.sqrt(np.einsum('ij,ij->i', dx, dx) * np.einsum('ij,ij->i', dy, dy))
+
+
+def quantile_returns(ranks: np.ndarray, mask: np.ndarray, returns: np.ndarray,
+                     count: np.ndarray, quantiles: int) -> np.ndarray:
+    """按暴露名次（已中心化）分组后各组的逐日平均收益，(日期数, 分位组数)"""
+    days = len(ranks)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bucket = np.ceil((ranks + (count[:, None] + 1) / 2.) / count[:, None] * quantiles)
+    bucket = np.clip(np.nan_to_num(bucket), 1, quantiles).astype(np.int64) - 1
+    slot = (np.arange(days)[:, None] * quantiles + bucket)[mask]
+
+    totals = np.bincount(slot, weights=returns[mask], minlength=days * quantiles)
+    counts = np.bincount(slot, minlength=days * quantiles)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (totals / counts).reshape(days, quantiles)
+
+
+def cross_section_stats(exposures: np.ndarray, returns: Dict[tuple, np.ndarray], spans: List[tuple],
+                        quantiles: int, min_stocks: int):
+    """exposures 为 (因子数, 日期数, 股票数)，returns 为 {(起点, 终点): (日期数, 股票数)}
+
+    返回 ({(因子序号, 起点, 终点): 逐日 IC}, {(因子序号, horizon): 逐日分位组收益})，
+    起点为 0 的区间才计算分位组收益
+    """
+    sorted_exposures = [SortedRows(values) for values in exposures]  # 每个因子只排序一次
+    observed = ~np.isnan(exposures)
+    ics, buckets = {}, {}
+
+    for a, b in spans:
+        ret = returns[(a, b)]
+        sorted_returns = SortedRows(ret)
+        for f in range(len(exposures)):
+            mask = observed[f] & ~np.isnan(ret)
+            count = mask.sum(axis=1)
+            center = (count + 1) / 2.  # 平均名次的均值恒为 (n + 1) / 2
+            x_ranks = sorted_exposures[f].ranks(mask, center)
+            ic = row_rank_corr(x_ranks, sorted_returns.ranks(mask, center))
+            ic[count < max(min_stocks, 2)] = np.nan
+            ics[(f, a, b)] = ic
+            if a == 0:
+                grouped = quantile_returns(x_ranks, mask, ret, count, quantiles)
+                grouped[count < max(min_stocks, quantiles)] = np.nan
+                buckets[(f, b)] = grouped
+    return ics, buckets
+
+
+def _evaluate_shard(arrays: Dict[str, np.ndarray], start: int, stop: int, spans: List[tuple],
+                    quantiles: int, min_stocks: int):
+    """进程池 worker：计算 [start, stop) 日期的截面统计"""
+    returns = {(a, b): arrays[f'returns_{a}_{b}'][start:stop] for a, b in spans}
+    return cross_section_stats(arrays['exposures'][:, start:stop], returns, spans, quantiles, min_stocks)
+
+
+class FactorEvaluator:
+    """因子评估
+
+    config（config.yaml factor_model.evaluation 段）:
+        horizons: 前瞻收益的交易日数列表
+        quantiles: 分位组数
+        min_stocks: 截面最少有效股票数
+        neutralize: 评估行业 + 市值中性化残差（由引擎按行业分类转换 ExposureHistory）
+        parallel: 同 ai_model.parallel，按日期分片（min_stocks 为启用进程池的日期数）
+
+    IC 以原始暴露计算（符号即因子方向），IR 为 IC 均值 / IC 标准差（未年化）。
+    horizon 大于 1 时相邻日期的前瞻收益重叠，t 值偏高，仅供比较。
+    """
+
+    def __init__(self, config: dict = None):
+        self.config = {**DEFAULT_EVALUATION, **(config or {})}
+        self.logger = loguru.logger
+        self.horizons = sorted(int(h) for h in self.config['horizons'])
+        self.quantiles = int(self.config['quantiles'])
+        self.min_stocks = int(self.config['min_stocks'])
+        self.parallel = parallel_options({'parallel': {**DEFAULT_EVALUATION['parallel'],
+                                                       **(self.config.get('parallel') or {})}})
+
+    def forward_returns(self, history: ExposureHistory, close: pd.DataFrame) -> Dict[tuple, np.ndarray]:
+        """{(起点, 终点): (日期数, 股票数) 收益矩阵}，区间为暴露日之后第 起点~终点 个交易日
+
+        包含 (0, h) 的前瞻收益和相邻 horizon 间 (h_prev, h) 的区间收益（用于 IC 衰减）
+        """
+        prices = close.reindex(columns=history.codes).to_numpy(dtype=np.float64)
+        positions = close.index.get_indexer(history.dates)
+        missing = positions < 0
+        if missing.any():
+            self.logger.warning(f"{int(missing.sum())} 个暴露日期没有行情，忽略")
+
+        def price_at(offset: int) -> np.ndarray:
+            index = positions + offset
+            valid = (positions >= 0) & (index < len(prices))
+            values = np.full((len(positions), prices.shape[1]), np.nan)
+            values[valid] = prices[index[valid]]
+            return values
+
+        at = {0: price_at(0)}
+        for h in self.horizons:
+            at[h] = price_at(h)
+
+        spans = [(0, h) for h in self.horizons]
+        spans += [(a, b) for a, b in zip(self.horizons[:-1], self.horizons[1:])]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return {(a, b): at[b] / at[a] - 1 for a, b in spans}
+
+    def evaluate(self, history: ExposureHistory, close: pd.DataFrame) -> Dict:
+        """返回
+            ic: 逐日 Rank IC（列为 (因子, horizon)）
+            summary: 每个因子 × horizon 的 ic_mean / ic_std / ir / t_stat / ic_positive / spread / n_dates
+            decay: 每个因子在 (h_prev, h] 区间收益上的平均 IC
+            quantiles: 每个因子 × horizon 各分位组的平均前瞻收益
+        """
+        returns = self.forward_returns(history, close)
+        ics, buckets = self._cross_sections(history.values, returns)
+
+        ic_columns, summary, quantile_rows = {}, [], {}
+        decay = {factor: {} for factor in history.factors}
+        for f, factor in enumerate(history.factors):
+            for a, b in returns:
+                ic = ics[(f, a, b)]
+                decay[factor][f'{a}-{b}'] = float(np.nanmean(ic)) if np.isfinite(ic).any() else np.nan
+                if a > 0:
+                    continue
+                ic_columns[(factor, b)] = ic
+                quantile_rows[(factor, b)] = _nanmean_columns(buckets[(f, b)])
+                summary.append(self._summarize(factor, b, ic, buckets[(f, b)][:, -1] - buckets[(f, b)][:, 0]))
+
+        index_names = ['factor', 'horizon']
+        quantiles = pd.DataFrame(list(quantile_rows.values()),
+                                 index=pd.MultiIndex.from_tuples(list(quantile_rows), names=index_names),
+                                 columns=[f'q{q}' for q in range(1, self.quantiles + 1)])
+        return {
+            'ic': pd.DataFrame(ic_columns, index=history.dates).sort_index(axis=1),
+            'summary': pd.DataFrame(summary).set_index(index_names).sort_index() if summary else pd.DataFrame(),
+            'decay': pd.DataFrame(decay).T,
+            'quantiles': quantiles.sort_index(),
+        }
+
+    def _cross_sections(self, exposures: np.ndarray, returns: Dict[tuple, np.ndarray]):
+        """逐日 IC 与分位组收益；日期数达到 parallel.min_stocks 且 workers > 1 时按日期分片到进程池"""
+        args = (list(returns), self.quantiles, self.min_stocks)
+        if not use_pool(self.parallel, exposures.shape[1]):
+            return cross_section_stats(exposures, returns, *args)
+
+        arrays = {'exposures': exposures, **{f'returns_{a}_{b}': ret for (a, b), ret in returns.items()}}
+        with SharedArrays(arrays) as shared:
+            shards = map_shards(_evaluate_shard, shared.spec, exposures.shape[1], self.parallel['workers'],
+                                args=args, start_method=self.parallel['start_method'])
+        ics = {key: np.concatenate([shard[0][key] for shard in shards]) for key in shards[0][0]}
+        buckets = {key: np.concatenate([shard[1][key] for shard in shards]) for key in shards[0][1]}
+        return ics, buckets
+
+    @staticmethod
+    def _summarize(factor: str, horizon: int, ic: np.ndarray, spread: np.ndarray) -> dict:
+        ic = ic[np.isfinite(ic)]
+        spread = spread[np.isfinite(spread)]
+        n = len(ic)
+        mean = float(ic.mean()) if n else np.nan
+        std = float(ic.std(ddof=1)) if n > 1 else np.nan
+        ir = mean / std if std and np.isfinite(std) else np.nan
+        return {
+            'factor': factor,
+            'horizon': horizon,
+            'ic_mean': mean,
+            'ic_std': std,
+            'ir': ir,
+            't_stat': ir * np.sqrt(n) if n else np.nan,
+            'ic_positive': float((ic > 0).mean()) if n else np.nan,
+            'spread': float(spread.mean()) if len(spread) else np.nan,
+            'n_dates': n,
+        }
+
+
+def _nanmean_columns(values: np.ndarray) -> List[float]:
+    observed = ~np.isnan(values)
+    counts = observed.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return list(np.where(counts > 0, np.nansum(values, axis=0) / counts, np.nan))
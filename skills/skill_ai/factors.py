@@ -1,212 +1,388 @@
+"""多因子模型：在整个股票池的行情/财务面板上一次性计算原始因子暴露，截面标准化后合成得分
+
+原始暴露保持自然量纲（波动率、对数市值等），缺失为 NaN；标准化时按 FACTOR_DIRECTIONS
+统一为 "越大越好"，缺失视为截面中性。每日原始暴露存于 data/factors/exposures_YYYYMMDD.parquet。
+开启 neutralize 时先对行业哑变量和对数市值做截面回归，用残差打分。
+"""
+from pathlib import Path
+from typing import Dict, List, Optional
+
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional
 import loguru
+from scipy.stats import rankdata
+
+from .panel import PricePanel, FinancialPanel
+
+
+# 标准化前乘以方向，使 "越大越好"（低波动更好）
+FACTOR_DIRECTIONS = {
+    'value': 1,
+    'quality': 1,
+    'momentum': 1,
+    'volatility': -1,
+    'size': 1,
+    'liquidity': 1,
+}
+
+FINANCIAL_FIELDS = {field: None for field in ('pe', 'pb', 'roe', 'profit', 'revenue', 'market_cap')}
+
+DEFAULT_FACTOR_MODEL = {
+    'normalization': 'zscore',  # zscore: 缩尾 z-score / rank: 截面百分位
+    'winsorize': 0.025,  # 缩尾分位（两侧各截掉的比例）
+    'persist': True,
+    'neutralize': True,  # 对行业哑变量 + 对数市值截面回归取残差（需要行业分类）
+}
+
+UNKNOWN_INDUSTRY = '未知'
+
+
+def rank_pct(values: np.ndarray) -> np.ndarray:
+    """沿最后一维的截面百分位 (0, 1]，并列取平均名次，NaN 保持 NaN"""
+    values = np.asarray(values, dtype=np.float64)
+    ranks = rankdata(values, axis=-1, nan_policy='omit')
+    count = np.sum(~np.isnan(values), axis=-1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return ranks / count
+
+
+def winsorized_zscore(values: np.ndarray, limits: float = 0.025) -> np.ndarray:
+    """沿最后一维先按 [limits, 1 - limits] 分位缩尾再 z-score，截面无差异时为 0，NaN 保持 NaN"""
+    values = np.asarray(values, dtype=np.float64)
+    observed = ~np.isnan(values)
+    has_data = observed.any(axis=-1, keepdims=True)
+    filled = np.where(has_data, values, 0.)  # 全 NaN 的截面避免 nanquantile 告警
+
+    if limits:
+        lower = np.nanquantile(filled, limits, axis=-1, keepdims=True)
+        upper = np.nanquantile(filled, 1 - limits, axis=-1, keepdims=True)
+        filled = np.clip(filled, lower, upper)
+
+    count = np.maximum(observed.sum(axis=-1, keepdims=True), 1)
+    masked = np.where(observed, filled, 0.)
+    mean = masked.sum(axis=-1, keepdims=True) / count
+    var = np.where(observed, (filled - mean) ** 2, 0.).sum(axis=-1, keepdims=True) / np.maximum(count - 1, 1)
+    std = np.sqrt(var)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = np.where(std > 0, (filled - mean) / std, 0.)
+    return np.where(observed, z, np.nan)
+
+
+def _weighted_available(parts: List[np.ndarray], weights: List[float]) -> np.ndarray:
+    """按权重合并多个分项，只在有值的分项间重新归一化，全缺失为 NaN"""
+    stacked = np.vstack(parts)
+    w = np.array(weights, dtype=np.float64)[:, None] * ~np.isnan(stacked)
+    total = w.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(total > 0, np.nansum(stacked * w, axis=0) / total, np.nan)
+
+
+def _nan_std(returns: np.ndarray) -> np.ndarray:
+    """逐行忽略 NaN 的样本标准差（ddof=1），有效值不足 2 个为 NaN"""
+    count = np.sum(~np.isnan(returns), axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nansum(returns, axis=1) / count
+        var = np.nansum((returns - mean[:, None]) ** 2, axis=1) / (count - 1)
+    return np.where(count >= 2, np.sqrt(var), np.nan)
+
+
+def industry_groups(codes: List[str], industries: Dict[str, str]) -> np.ndarray:
+    """股票 -> 行业整数编号，没有分类的股票归入同一个 "未知" 行业"""
+    labels = [industries.get(code) or UNKNOWN_INDUSTRY for code in codes]
+    return pd.factorize(np.asarray(labels, dtype=object))[0]
+
+
+def neutralize(values: np.ndarray, groups: np.ndarray, covariates: np.ndarray = None) -> np.ndarray:
+    """逐行对行业哑变量（+ 协变量）做最小二乘，返回残差
+
+    values: (K, N)，每行一个截面回归；groups: (N,) 行业编号；covariates: (K, N, C) 或 None。
+    先在行业内去均值吸收哑变量（Frisch-Waugh-Lovell），再批量解 C×C 正规方程，
+    结果与逐行 lstsq 一致。因变量或协变量缺失的股票不参与回归，残差为 NaN。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rows, n = values.shape
+    if covariates is None:
+        covariates = np.empty((rows, n, 0))
+    mask = np.isfinite(values) & np.isfinite(covariates).all(axis=-1)
+
+    n_groups = int(groups.max()) + 1 if n else 1
+    keys = (np.arange(rows, dtype=np.int64)[:, None] * n_groups + groups[None, :]).ravel()
+    count = np.bincount(keys, weights=mask.ravel(), minlength=rows * n_groups)
+    count = np.maximum(count, 1)
+
+    def demean(a: np.ndarray) -> np.ndarray:
+        a = np.where(mask, a, 0.)
+        mean = np.bincount(keys, weights=a.ravel(), minlength=rows * n_groups) / count
+        return np.where(mask, a - mean[keys].reshape(rows, n), 0.)
+
+    residual = demean(values)
+    if covariates.shape[-1]:
+        x = np.stack([demean(covariates[..., c]) for c in range(covariates.shape[-1])], axis=-1)
+        xtx = np.einsum('knc,knd->kcd', x, x)
+        xty = np.einsum('knc,kn->kc', x, residual)
+        beta = np.einsum('kcd,kd->kc', np.linalg.pinv(xtx), xty)  # 奇异时（如协变量无差异）取最小范数解
+        residual -= np.einsum('knc,kc->kn', x, beta)
+    return np.where(mask, residual, np.nan)
+
+
+def neutralize_exposures(values: np.ndarray, factors: List[str], groups: np.ndarray) -> np.ndarray:
+    """(因子数, 日期数, 股票数) 的暴露逐日中性化：size 只对行业回归，其余因子对行业 + size 回归"""
+    n_factors, days, n = values.shape
+    result = np.empty_like(values, dtype=np.float64)
+    if 'size' in factors:
+        size_row = factors.index('size')
+        result[size_row] = neutralize(values[size_row], groups)
+        others = [i for i in range(n_factors) if i != size_row]
+        covariates = np.broadcast_to(values[size_row][None, :, :, None], (len(others), days, n, 1))
+        covariates = covariates.reshape(len(others) * days, n, 1)
+    else:
+        others, covariates = list(range(n_factors)), None
+    if others:
+        residual = neutralize(values[others].reshape(len(others) * days, n), groups, covariates)
+        result[others] = residual.reshape(len(others), days, n)
+    return result
 
 
 class FactorModel:
-    """多因子选股模型"""
-    
-    def __init__(self, config: dict = None):
-        self.config = config or {}
+    """多因子选股模型
+
+    config（config.yaml factor_model 段）:
+        normalization: zscore（缩尾 z-score）/ rank（截面百分位）
+        winsorize: 缩尾分位，默认 0.025
+        persist: 每日分析时保存原始暴露（保存的始终是未中性化的暴露）
+        neutralize: 打分前对行业哑变量 + 对数市值截面回归取残差，需要传入行业分类
+    """
+
+    def __init__(self, config: dict = None, data_dir: str = "data"):
+        self.config = {**DEFAULT_FACTOR_MODEL, **(config or {})}
         self.logger = loguru.logger
-        
-        self.factors = [
-            'value',
-            'quality',
-            'momentum',
-            'volatility',
-            'size',
-            'liquidity'
-        ]
-    
+        self.exposure_dir = Path(data_dir) / "factors"
+
+        self.factors = list(FACTOR_DIRECTIONS)
+
+    # ---------- 原始暴露 ----------
+
+    def calculate_exposures(self, price_data: Dict[str, pd.DataFrame],
+                            financial_data: Dict[str, dict]) -> pd.DataFrame:
+        """整个股票池的原始因子暴露：code + 各因子列，缺失为 NaN"""
+        codes = list(price_data)
+        if not codes:
+            return pd.DataFrame(columns=['code', *self.factors])
+
+        exposures = pd.DataFrame({'code': codes})
+        for factor, values in self._price_exposures(price_data).items():
+            exposures[factor] = values.reindex(codes).to_numpy()
+        for factor, values in self._financial_exposures(codes, financial_data).items():
+            exposures[factor] = values
+        return exposures[['code', *self.factors]]
+
+    def _price_exposures(self, price_data: Dict[str, pd.DataFrame]) -> Dict[str, pd.Series]:
+        close, _ = PricePanel.from_frames(price_data, ('close',))
+        volume, _ = PricePanel.from_frames(price_data, ('volume',))
+        return {
+            'momentum': pd.Series(self._momentum(close), index=close.codes, dtype=np.float64),
+            'volatility': pd.Series(self._volatility(close), index=close.codes, dtype=np.float64),
+            'liquidity': pd.Series(self._liquidity(volume), index=volume.codes, dtype=np.float64),
+        }
+
+    @staticmethod
+    def _momentum(panel: PricePanel) -> np.ndarray:
+        """20 日、60 日收益率按 0.6 / 0.4 合成（K 线不足的分项缺失）"""
+        close, lengths = panel['close'], panel.lengths
+        if not len(lengths):
+            return np.empty(0)
+        parts = []
+        for window in (20, 60):
+            ret = np.full(len(lengths), np.nan)
+            rows = lengths > window
+            if close.shape[1] > window:
+                ret[rows] = close[rows, -1] / close[rows, -window - 1] - 1
+            parts.append(ret)
+        return _weighted_available(parts, [0.6, 0.4])
+
+    @staticmethod
+    def _volatility(panel: PricePanel) -> np.ndarray:
+        """日收益率年化波动率（K 线不足 20 根缺失）"""
+        close, lengths = panel['close'], panel.lengths
+        vol = np.full(len(lengths), np.nan)
+        rows = lengths >= 20
+        if rows.any():
+            returns = close[rows, 1:] / close[rows, :-1] - 1
+            vol[rows] = _nan_std(returns) * np.sqrt(252)
+        return vol
+
+    @staticmethod
+    def _liquidity(panel: PricePanel) -> np.ndarray:
+        """近 20 日平均成交量的对数（K 线不足 20 根缺失）"""
+        volume, lengths = panel['volume'], panel.lengths
+        liquidity = np.full(len(lengths), np.nan)
+        rows = lengths >= 20
+        if rows.any():
+            liquidity[rows] = np.log1p(volume[rows, -20:].mean(axis=1))
+        return liquidity
+
+    @staticmethod
+    def _financial_exposures(codes: List[str], financial_data: Dict[str, dict]) -> Dict[str, np.ndarray]:
+        panel = FinancialPanel.from_dicts(codes, financial_data, FINANCIAL_FIELDS)
+        pe, pb, roe = panel['pe'], panel['pb'], panel['roe']
+        profit, revenue, market_cap = panel['profit'], panel['revenue'], panel['market_cap']
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # 盈利收益率（亏损为负）与账面市值比
+            earnings_yield = np.where(pe != 0, 1 / pe, np.nan)
+            book_to_price = np.where(pb > 0, 1 / pb, np.nan)
+            margin = np.where(revenue > 0, profit / revenue, np.nan)
+            size = np.where(market_cap > 0, np.log(market_cap), np.nan)
+
+        exposures = {
+            'value': _weighted_available([earnings_yield, book_to_price], [0.6, 0.4]),
+            'quality': _weighted_available([roe / 100, margin], [0.7, 0.3]),
+            'size': size,
+        }
+        for values in exposures.values():
+            values[panel.invalid] = np.nan
+        return exposures
+
+    # ---------- 中性化、标准化与合成 ----------
+
+    def neutralize(self, exposures: pd.DataFrame, industries: Dict[str, str]) -> pd.DataFrame:
+        """单日暴露的行业 + 市值中性化残差（size 本身只做行业中性化）"""
+        factors = [f for f in self.factors if f in exposures.columns]
+        codes = exposures['code'].tolist()
+        values = exposures[factors].to_numpy(dtype=np.float64).T[:, None, :]
+        residual = neutralize_exposures(values, factors, industry_groups(codes, industries))
+
+        result = exposures.copy()
+        for factor, column in zip(factors, residual[:, 0, :]):
+            result[factor] = column
+        return result
+
+    def normalize(self, exposures: pd.DataFrame, method: str = None) -> pd.DataFrame:
+        """按方向调整后截面标准化：zscore 为缩尾 z-score，rank 为 (0, 1] 百分位，缺失保持 NaN"""
+        method = method or self.config['normalization']
+        factors = [f for f in self.factors if f in exposures.columns]
+        values = exposures[factors].to_numpy(dtype=np.float64).T * \
+            np.array([FACTOR_DIRECTIONS[f] for f in factors])[:, None]
+
+        if method == 'rank':
+            normalized = rank_pct(values)
+        elif method == 'zscore':
+            normalized = winsorized_zscore(values, self.config['winsorize'])
+        else:
+            raise ValueError(f"未知的标准化方法: {method}")
+
+        result = exposures[['code']].copy()
+        for factor, column in zip(factors, normalized):
+            result[factor] = column
+        return result
+
     def calculate_factors(self, price_data: Dict[str, pd.DataFrame],
-                         financial_data: Dict[str, dict]) -> pd.DataFrame:
-        """计算所有因子值"""
-        
-        factor_results = []
-        
-        for code, df in price_data.items():
-            factors = self._calculate_single_factors(
-                code, df, financial_data.get(code, {})
-            )
-            factor_results.append(factors)
-        
-        if not factor_results:
+                         financial_data: Dict[str, dict],
+                         industries: Dict[str, str] = None) -> pd.DataFrame:
+        """计算所有因子得分（0-100，缺失取 50）
+
+        rank: 百分位 × 100；zscore: 50 + 10z（T 分数），截断到 [0, 100]。
+        给出行业分类且开启 neutralize 时用中性化残差打分。
+        """
+        return self.neutral_scores(self.calculate_exposures(price_data, financial_data), industries)
+
+    def neutral_scores(self, exposures: pd.DataFrame, industries: Dict[str, str] = None) -> pd.DataFrame:
+        """已算好的原始暴露 → 因子得分，给出行业分类且开启 neutralize 时先中性化"""
+        if exposures.empty:
             return pd.DataFrame()
-        
-        df_factors = pd.DataFrame(factor_results)
-        
+        if industries and self.config['neutralize']:
+            exposures = self.neutralize(exposures, industries)
+        return self.scores_from_exposures(exposures)
+
+    def scores_from_exposures(self, exposures: pd.DataFrame, method: str = None) -> pd.DataFrame:
+        method = method or self.config['normalization']
+        normalized = self.normalize(exposures, method)
+        df_factors = normalized[['code']].copy()
         for factor in self.factors:
-            col = f'{factor}_score'
-            if col in df_factors.columns:
-                df_factors[col] = self._normalize_factor(df_factors[col])
-        
+            if factor not in normalized.columns:
+                continue
+            values = normalized[factor]
+            score = values * 100 if method == 'rank' else (50 + 10 * values).clip(0, 100)
+            df_factors[f'{factor}_score'] = score.fillna(50)
         return df_factors
-    
-    def _calculate_single_factors(self, code: str, 
-                                  price_df: pd.DataFrame,
-                                  financial: dict) -> dict:
-        """计算单只股票的因子值"""
-        
-        result = {'code': code}
-        
-        result['value_score'] = self._factor_value(financial)
-        result['quality_score'] = self._factor_quality(financial)
-        result['momentum_score'] = self._factor_momentum(price_df)
-        result['volatility_score'] = self._factor_volatility(price_df)
-        result['size_score'] = self._factor_size(financial)
-        result['liquidity_score'] = self._factor_liquidity(price_df)
-        
-        return result
-    
-    def _factor_value(self, financial: dict) -> float:
-        """价值因子 - 基于PE/PB"""
-        pe = financial.get('pe', 20)
-        pb = financial.get('pb', 3)
-        
-        if pe is None or pe <= 0:
-            pe = 20
-        if pb is None or pb <= 0:
-            pb = 3
-        
-        pe_score = 1 / np.log(pe + 1) if pe > 0 else 0.5
-        pb_score = 1 / np.log(pb + 1) if pb > 0 else 0.5
-        
-        return (pe_score * 0.6 + pb_score * 0.4) * 100
-    
-    def _factor_quality(self, financial: dict) -> float:
-        """质量因子 - 基于ROE/利润率"""
-        roe = financial.get('roe', 10)
-        profit = financial.get('profit', 0)
-        revenue = financial.get('revenue', 1)
-        
-        if roe is None:
-            roe = 10
-        
-        profit_margin = profit / revenue if revenue > 0 else 0.1
-        
-        roe_score = min(100, roe * 4)
-        margin_score = min(100, profit_margin * 100 * 2)
-        
-        return roe_score * 0.7 + margin_score * 0.3
-    
-    def _factor_momentum(self, df: pd.DataFrame) -> float:
-        """动量因子"""
-        if df is None or len(df) < 60:
-            return 50
-        
-        returns_20d = (df['close'].iloc[-1] / df['close'].iloc[-21] - 1) if len(df) > 20 else 0
-        returns_60d = (df['close'].iloc[-1] / df['close'].iloc[-61] - 1) if len(df) > 60 else returns_20d
-        
-        mom_20 = min(100, max(0, 50 + returns_20d * 500))
-        mom_60 = min(100, max(0, 50 + returns_60d * 300))
-        
-        return mom_20 * 0.6 + mom_60 * 0.4
-    
-    def _factor_volatility(self, df: pd.DataFrame) -> float:
-        """波动率因子 - 低波动更好"""
-        if df is None or len(df) < 20:
-            return 50
-        
-        returns = df['close'].pct_change().dropna()
-        
-        if len(returns) < 10:
-            return 50
-        
-        vol = returns.std() * np.sqrt(252)
-        
-        if vol < 0.1:
-            return 100
-        elif vol < 0.2:
-            return 80
-        elif vol < 0.3:
-            return 60
-        elif vol < 0.5:
-            return 40
-        else:
-            return 20
-    
-    def _factor_size(self, financial: dict) -> float:
-        """规模因子"""
-        market_cap = financial.get('market_cap', 1e10)
-        
-        if market_cap > 1e11:
-            return 80
-        elif market_cap > 5e10:
-            return 70
-        elif market_cap > 1e10:
-            return 60
-        elif market_cap > 5e9:
-            return 50
-        else:
-            return 40
-    
-    def _factor_liquidity(self, df: pd.DataFrame) -> float:
-        """流动性因子"""
-        if df is None or len(df) < 20:
-            return 50
-        
-        avg_volume = df['volume'].tail(20).mean()
-        
-        if avg_volume > 1e8:
-            return 100
-        elif avg_volume > 5e7:
-            return 80
-        elif avg_volume > 1e7:
-            return 60
-        elif avg_volume > 5e6:
-            return 40
-        else:
-            return 20
-    
-    def _normalize_factor(self, series: pd.Series) -> pd.Series:
-        """因子标准化 (0-100)"""
-        min_val = series.min()
-        max_val = series.max()
-        
-        if max_val - min_val == 0:
-            return pd.Series([50] * len(series), index=series.index)
-        
-        normalized = (series - min_val) / (max_val - min_val) * 100
-        
-        return normalized
-    
+
     def calculate_composite_score(self, df_factors: pd.DataFrame,
                                   weights: Dict[str, float] = None) -> pd.DataFrame:
         """计算综合得分"""
-        
+
         if df_factors.empty:
             return df_factors
-        
+
         if weights is None:
             weights = {f: 1/len(self.factors) for f in self.factors}
-        
+
         df_factors = df_factors.copy()
-        
+
         df_factors['composite_score'] = 0
-        
+
         for factor in self.factors:
             col = f'{factor}_score'
             if col in df_factors.columns:
                 weight = weights.get(factor, 1/len(self.factors))
                 df_factors['composite_score'] += df_factors[col] * weight
-        
+
         df_factors = df_factors.sort_values('composite_score', ascending=False)
         df_factors['rank'] = range(1, len(df_factors) + 1)
-        
+
         return df_factors
-    
+
     def select_by_factors(self, df_factors: pd.DataFrame,
                          top_n: int = 10,
                          min_score: float = 50) -> List[str]:
         """根据因子选择股票"""
-        
+
         if df_factors.empty:
             return []
-        
+
         df_filtered = df_factors[
             (df_factors['composite_score'] >= min_score)
         ].head(top_n)
-        
+
         return df_filtered['code'].tolist()
+
+    # ---------- 持久化 ----------
+
+    def exposure_path(self, day) -> Path:
+        return self.exposure_dir / f"exposures_{pd.Timestamp(day):%Y%m%d}.parquet"
+
+    def save_exposures(self, exposures: pd.DataFrame, day) -> Path:
+        """保存某交易日的原始暴露（同日覆盖）"""
+        path = self.exposure_path(day)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        exposures.to_parquet(path, engine='pyarrow', index=False)
+        return path
+
+    def load_exposures(self, day) -> Optional[pd.DataFrame]:
+        path = self.exposure_path(day)
+        if not path.exists():
+            return None
+        return pd.read_parquet(path)
+
+    def exposure_dates(self) -> List[pd.Timestamp]:
+        """已保存暴露的交易日（升序）"""
+        if not self.exposure_dir.exists():
+            return []
+        return sorted(pd.Timestamp(path.stem.split('_')[-1])
+                      for path in self.exposure_dir.glob("exposures_*.parquet"))
+
+    def update_exposures(self, price_data: Dict[str, pd.DataFrame],
+                         financial_data: Dict[str, dict]) -> Optional[pd.DataFrame]:
+        """计算并按最新 K 线日期保存原始暴露（persist 关闭或无行情时只计算）"""
+        exposures = self.calculate_exposures(price_data, financial_data)
+        day = latest_bar_date(price_data)
+        if self.config['persist'] and day is not None and not exposures.empty:
+            self.save_exposures(exposures, day)
+            self.logger.info(f"已保存 {day:%Y-%m-%d} 因子暴露: {len(exposures)} 只股票")
+        return exposures
+
+
+def latest_bar_date(price_data: Dict[str, pd.DataFrame]) -> Optional[pd.Timestamp]:
+    """股票池中最新一根 K 线的日期"""
+    dates = [df['date'].iloc[-1] for df in price_data.values()
+             if df is not None and not df.empty and 'date' in df.columns]
+    return pd.Timestamp(max(dates)).normalize() if dates else None
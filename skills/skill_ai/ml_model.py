@@ -0,0 +1,245 @@
+"""机器学习评分（ai_model.scoring_method: ai / hybrid）
+
+特征库：每个交易日的因子/技术指标得分与基本面字段存为 data/features/features_YYYYMMDD.parquet，
+可由每日评分结果直接写入，也可在存储的历史行情上按日期回补。
+训练集：特征快照在 horizon 个交易日后有了前瞻收益，才追加进 data/features/training.parquet，
+已标注的日期不会重复计算。标签为前瞻收益的截面百分位。
+模型：sklearn HistGradientBoostingRegressor（原生支持缺失值），连同特征列、参数、训练日期一起以
+joblib 缓存在 data/models/ml_scorer.joblib，超过 retrain_days 天或参数变化才重新训练。
+全股票池评分只调用一次 predict。
+"""
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import joblib
+import numpy as np
+import pandas as pd
+import loguru
+
+from .factors import rank_pct
+from .panel import PricePanel, FinancialPanel, bar_dates
+from .scorer import FINANCIAL_DEFAULTS, FACTOR_SCORE_COLUMNS
+
+
+# 情绪得分没有历史数据，回补的快照无法提供，不作为特征
+SCORE_FEATURES = [column for column in FACTOR_SCORE_COLUMNS if column != 'sentiment_score']
+FUNDAMENTAL_FIELDS = ('pe', 'pb', 'roe', 'market_cap')
+FEATURE_COLUMNS = [*SCORE_FEATURES, 'pe', 'pb', 'roe', 'log_market_cap']
+
+DEFAULT_ML = {
+    'horizon': 5,  # 标签：之后第 horizon 个交易日的收益
+    'feature_store': True,  # 每日评分后保存特征快照
+    'train_dates': 250,  # 用最近多少个已标注的快照日期训练
+    'min_samples': 1000,  # 训练样本不足时不训练
+    'retrain_days': 5,
+    'backfill_days': 250,  # --mode train 回补特征快照的交易日数
+    'backfill_step': 5,  # 回补时每隔几个交易日取一个快照
+    'ai_weight': 0.5,  # hybrid: total = (1 - ai_weight) × 因子得分 + ai_weight × AI 得分
+    'model': {
+        'max_iter': 200,
+        'learning_rate': 0.05,
+        'max_depth': 4,
+        'min_samples_leaf': 100,
+        'random_state': 0,
+    },
+}
+
+
+def feature_frame(scores: pd.DataFrame) -> pd.DataFrame:
+    """由评分表（StockScorer.score_stocks 的结果）取 code + FEATURE_COLUMNS，缺失为 NaN"""
+    features = pd.DataFrame({'code': scores['code'].to_numpy()})
+    for column in [*SCORE_FEATURES, 'pe', 'pb', 'roe']:
+        values = scores[column] if column in scores.columns else np.nan
+        features[column] = pd.to_numeric(pd.Series(values, index=scores.index), errors='coerce').to_numpy()
+    market_cap = pd.to_numeric(scores['market_cap'], errors='coerce').to_numpy(dtype=np.float64) \
+        if 'market_cap' in scores.columns else np.full(len(scores), np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        features['log_market_cap'] = np.where(market_cap > 0, np.log(market_cap), np.nan)
+    return features
+
+
+class FeatureStore:
+    """按交易日保存的特征快照与增量标注的训练集"""
+
+    def __init__(self, data_dir: str = "data"):
+        self.logger = loguru.logger
+        self.feature_dir = Path(data_dir) / "features"
+        self.training_path = self.feature_dir / "training.parquet"
+
+    def snapshot_path(self, day) -> Path:
+        return self.feature_dir / f"features_{pd.Timestamp(day):%Y%m%d}.parquet"
+
+    def save(self, features: pd.DataFrame, day) -> Path:
+        """保存某交易日的特征快照（同日覆盖）"""
+        path = self.snapshot_path(day)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        features.to_parquet(path, engine='pyarrow', index=False)
+        return path
+
+    def load(self, day) -> Optional[pd.DataFrame]:
+        path = self.snapshot_path(day)
+        return pd.read_parquet(path) if path.exists() else None
+
+    def dates(self) -> List[pd.Timestamp]:
+        if not self.feature_dir.exists():
+            return []
+        return sorted(pd.Timestamp(path.stem.split('_')[-1])
+                      for path in self.feature_dir.glob("features_*.parquet"))
+
+    def backfill(self, scorer, price_data: Dict[str, pd.DataFrame], financial_data: Dict[str, dict],
+                 days: Sequence) -> int:
+        """在历史日期上重算特征快照（行情截断到当天，财务只有最新一期），已有快照的日期跳过，返回新增数"""
+        existing = set(self.dates())
+        days = [pd.Timestamp(day) for day in days if pd.Timestamp(day) not in existing]
+        if not days:
+            return 0
+
+        panel, _ = PricePanel.from_frames(
+            {code: df for code, df in price_data.items() if df is not None and 'date' in df.columns})
+        financial = FinancialPanel.from_dicts(panel.codes, financial_data, FINANCIAL_DEFAULTS)
+        fundamentals = FinancialPanel.from_dicts(panel.codes, financial_data, dict.fromkeys(FUNDAMENTAL_FIELDS))
+        width = panel['close'].shape[1]
+        days_matrix = bar_dates(panel, price_data)
+
+        for day in days:
+            available = (days_matrix <= day.value).sum(axis=1)
+            last = width - panel.lengths + available - 1
+            on_day = np.zeros(len(panel), dtype=bool)
+            has_bar = available > 0
+            on_day[has_bar] = days_matrix[has_bar, last[has_bar]] == day.value
+            rows = on_day & ~financial.invalid & ~fundamentals.invalid
+
+            factor_scores = scorer.calculate_factor_scores(panel.truncated(available), financial)
+            scores = pd.DataFrame({column: factor_scores[column] for column in SCORE_FEATURES})
+            scores.insert(0, 'code', panel.codes)
+            for field in FUNDAMENTAL_FIELDS:
+                scores[field] = fundamentals[field]
+            self.save(feature_frame(scores[rows].reset_index(drop=True)), day)
+        self.logger.info(f"已回补 {len(days)} 个交易日的特征快照")
+        return len(days)
+
+    def training_set(self, last_dates: int = None) -> pd.DataFrame:
+        """已标注的训练样本（date / code / 特征 / forward_return / label），可只取最近 last_dates 个日期"""
+        if not self.training_path.exists():
+            return pd.DataFrame(columns=['date', 'code', *FEATURE_COLUMNS, 'forward_return', 'label'])
+        training = pd.read_parquet(self.training_path)
+        if last_dates:
+            keep = np.sort(training['date'].unique())[-int(last_dates):]
+            training = training[training['date'].isin(keep)]
+        return training
+
+    def update_training_set(self, close: pd.DataFrame, horizon: int) -> int:
+        """把前瞻收益已可计算、尚未标注的快照追加进训练集，返回新增样本数
+
+        close: 收盘价矩阵（行为交易日，列为股票），停牌日为 NaN 的股票不产生样本
+        """
+        training = self.training_set()
+        labeled = set(pd.to_datetime(training['date']))
+        positions = {day: close.index.get_loc(day) for day in self.dates()
+                     if day not in labeled and day in close.index}
+
+        added = []
+        for day, position in positions.items():
+            if position + horizon >= len(close.index):
+                continue
+            features = self.load(day)
+            entry = close.iloc[position].reindex(features['code']).to_numpy(dtype=np.float64)
+            exit_ = close.iloc[position + horizon].reindex(features['code']).to_numpy(dtype=np.float64)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                forward = exit_ / entry - 1
+            rows = np.isfinite(forward)
+            if not rows.any():
+                continue
+            samples = features[rows].copy()
+            samples.insert(0, 'date', day)
+            samples['forward_return'] = forward[rows]
+            samples['label'] = rank_pct(forward[rows])
+            added.append(samples)
+
+        if not added:
+            return 0
+        training = pd.concat([training, *added], ignore_index=True) if len(training) else pd.concat(added, ignore_index=True)
+        self.training_path.parent.mkdir(parents=True, exist_ok=True)
+        training.sort_values(['date', 'code']).to_parquet(self.training_path, engine='pyarrow', index=False)
+        count = sum(len(samples) for samples in added)
+        self.logger.info(f"训练集新增 {len(added)} 个交易日 {count} 条样本")
+        return count
+
+
+class MLScorer:
+    """梯度提升评分模型
+
+    config（config.yaml ai_model.ml 段）:
+        horizon: 标签的前瞻交易日数
+        feature_store: 每日评分后保存特征快照
+        train_dates / min_samples / retrain_days: 训练窗口、最少样本数、重新训练间隔
+        backfill_days / backfill_step: 回补历史特征快照的范围和间隔
+        ai_weight: hybrid 模式下 AI 得分的权重
+        model: HistGradientBoostingRegressor 参数
+    """
+
+    def __init__(self, config: dict = None, data_dir: str = "data"):
+        self.config = {**DEFAULT_ML, **(config or {})}
+        self.config['model'] = {**DEFAULT_ML['model'], **(self.config.get('model') or {})}
+        self.logger = loguru.logger
+        self.store = FeatureStore(data_dir)
+        self.model_path = Path(data_dir) / "models" / "ml_scorer.joblib"
+        self._bundle = None
+
+    def _signature(self) -> dict:
+        return {'features': FEATURE_COLUMNS, 'horizon': int(self.config['horizon']), 'params': self.config['model']}
+
+    def load(self) -> Optional[dict]:
+        """已缓存的 {'model', 'meta'}，没有或与当前特征/参数不符时为 None"""
+        if self._bundle is None and self.model_path.exists():
+            try:
+                self._bundle = joblib.load(self.model_path)
+            except Exception as e:
+                self.logger.warning(f"读取 ML 模型失败: {e}")
+                return None
+        if self._bundle is None or self._bundle['meta']['signature'] != self._signature():
+            return None
+        return self._bundle
+
+    def is_stale(self, today: date = None) -> bool:
+        bundle = self.load()
+        if bundle is None:
+            return True
+        trained_on = date.fromisoformat(bundle['meta']['trained_on'])
+        return ((today or date.today()) - trained_on).days >= int(self.config['retrain_days'])
+
+    def train(self, today: date = None) -> Optional[dict]:
+        """在最近 train_dates 个已标注日期上训练并缓存模型，样本不足返回 None"""
+        from sklearn.ensemble import HistGradientBoostingRegressor
+
+        training = self.store.training_set(self.config['train_dates'])
+        if len(training) < int(self.config['min_samples']):
+            self.logger.warning(f"训练样本不足（{len(training)} < {self.config['min_samples']}），不训练 ML 模型")
+            return None
+
+        model = HistGradientBoostingRegressor(**self.config['model'])
+        model.fit(training[FEATURE_COLUMNS].to_numpy(dtype=np.float64), training['label'].to_numpy(dtype=np.float64))
+        meta = {
+            'signature': self._signature(),
+            'trained_on': (today or date.today()).isoformat(),
+            'samples': len(training),
+            'start': str(pd.Timestamp(training['date'].min()).date()),
+            'end': str(pd.Timestamp(training['date'].max()).date()),
+        }
+        self.model_path.parent.mkdir(parents=True, exist_ok=True)
+        self._bundle = {'model': model, 'meta': meta}
+        joblib.dump(self._bundle, self.model_path)
+        self.logger.info(f"ML 模型已训练: {meta['samples']} 条样本（{meta['start']} ~ {meta['end']}）")
+        return meta
+
+    def predict(self, scores: pd.DataFrame) -> Optional[np.ndarray]:
+        """整个评分表一次 predict，返回 0-100 的 AI 得分，无模型时为 None
+
+        回归输出只保证排序，数值会向标签均值收缩，因此按当日截面重新取百分位 × 100，与因子得分量纲一致
+        """
+        bundle = self.load()
+        if bundle is None or scores.empty:
+            return None
+        features = feature_frame(scores)[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        return rank_pct(bundle['model'].predict(features)) * 100
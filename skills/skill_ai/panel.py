@@ -0,0 +1,299 @@
+"""横截面面板：把多只股票的行情/财务整理成二维数组，评分、因子在整个股票池上一次性计算
+
+行情面板右对齐（最后一根 K 线在最后一列），较短的序列左侧以 NaN 填充。
+按历史长度分组后每组是无填充的稠密块，滚动窗口、EWM 等沿时间轴逐列递推、跨股票向量化，
+数值结果与逐只调用 pandas 完全一致。
+"""
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+PRICE_FIELDS = ('close', 'high', 'low', 'volume')
+
+
+class PricePanel:
+    """右对齐行情面板
+
+    codes: 股票代码，与数组行一一对应
+    lengths: 每只股票的 K 线数
+    fields: 字段名 -> (股票数, 最长 K 线数) 的 float64 数组
+    """
+
+    def __init__(self, codes: List[str], lengths: np.ndarray, fields: Dict[str, np.ndarray]):
+        self.codes = codes
+        self.lengths = lengths
+        self.fields = fields
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.fields[field]
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """扁平化为数组字典（用于放入共享内存），与 from_arrays 互逆"""
+        return {'lengths': self.lengths, **{f'price_{field}': values for field, values in self.fields.items()}}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], start: int = 0, stop: int = None,
+                    codes: List[str] = None) -> 'PricePanel':
+        """由 arrays() 的结果（或其共享内存视图）取 [start, stop) 行构建面板"""
+        fields = {name[len('price_'):]: values[start:stop]
+                  for name, values in arrays.items() if name.startswith('price_')}
+        return cls(codes, arrays['lengths'][start:stop], fields)
+
+    @classmethod
+    def from_frames(cls, price_data: Dict[str, pd.DataFrame],
+                    fields: Sequence[str] = PRICE_FIELDS) -> Tuple['PricePanel', List[str]]:
+        """由 {code: DataFrame} 构建面板
+
+        缺列、空表、非数值或含 NaN/inf 的股票不进入面板，以 rejected 返回，由调用方逐只处理
+        """
+        codes, columns, rejected = [], [], []
+        for code, df in price_data.items():
+            values = _frame_values(df, fields)
+            if values is None:
+                rejected.append(code)
+            else:
+                codes.append(code)
+                columns.append(values)
+
+        lengths = np.array([len(v[0]) for v in columns], dtype=np.int64)
+        width = int(lengths.max()) if len(lengths) else 0
+        arrays = {field: np.full((len(codes), width), np.nan) for field in fields}
+        for row, values in enumerate(columns):
+            for field, column in zip(fields, values):
+                arrays[field][row, width - len(column):] = column
+        return cls(codes, lengths, arrays), rejected
+
+    def rows(self, min_length: int = 1) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """长度 >= min_length 的股票及其右对齐子面板（列宽收窄到其中最长的序列）"""
+        rows = np.flatnonzero(self.lengths >= min_length)
+        width = self.fields[next(iter(self.fields))].shape[1] if self.fields else 0
+        length = int(self.lengths[rows].max()) if len(rows) else 0
+        return rows, {
+            field: np.ascontiguousarray(values[rows, width - length:])
+            for field, values in self.fields.items()
+        }
+
+    def blocks(self, min_length: int = 1) -> Iterator[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+        """按 K 线数分组，产出 (行号, 各字段的稠密块)，只包含长度 >= min_length 的股票"""
+        width = self.fields[next(iter(self.fields))].shape[1] if self.fields else 0
+        for length in np.unique(self.lengths):
+            if length < min_length:
+                continue
+            rows = np.flatnonzero(self.lengths == length)
+            yield rows, {
+                field: np.ascontiguousarray(values[rows, width - length:])
+                for field, values in self.fields.items()
+            }
+
+    def tail_blocks(self, window: int, min_length: int = 1) -> Iterator[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+        """按 min(K 线数, window) 分组，产出最近 window 根 K 线的稠密块（对应 df.tail(window)）"""
+        width = self.fields[next(iter(self.fields))].shape[1] if self.fields else 0
+        tail = np.minimum(self.lengths, window)
+        for length in np.unique(tail[self.lengths >= min_length]):
+            rows = np.flatnonzero((tail == length) & (self.lengths >= min_length))
+            yield rows, {
+                field: np.ascontiguousarray(values[rows, width - length:])
+                for field, values in self.fields.items()
+            }
+
+    def truncated(self, available: np.ndarray) -> 'PricePanel':
+        """每只股票只保留前 available 根 K 线并重新右对齐（用于在历史日期上重算）"""
+        width = self.fields[next(iter(self.fields))].shape[1] if self.fields else 0
+        new_width = int(available.max()) if len(available) else 0
+        target = np.arange(new_width)[None, :]
+        valid = target >= new_width - available[:, None]
+        source = np.where(valid, target + (width - new_width) - (self.lengths - available)[:, None], 0)
+        fields = {field: np.where(valid, np.take_along_axis(values, source, axis=1), np.nan)
+                  for field, values in self.fields.items()}
+        return PricePanel(self.codes, available.astype(np.int64), fields)
+
+
+def bar_dates(panel: PricePanel, price_data: Dict[str, pd.DataFrame]) -> np.ndarray:
+    """与面板右对齐的 K 线日期（datetime64[ns] 的 int64 值），左侧填充为 int64 最大值
+
+    (bar_dates(...) <= day).sum(axis=1) 即截至 day 的 K 线数，可直接传给 truncated
+    """
+    width = panel['close'].shape[1] if len(panel) else 0
+    days = np.full((len(panel), width), np.iinfo(np.int64).max)
+    for row, code in enumerate(panel.codes):
+        values = pd.to_datetime(price_data[code]['date']).dt.normalize().to_numpy('datetime64[ns]').view(np.int64)
+        days[row, width - len(values):] = values
+    return days
+
+
+def _frame_values(df: Optional[pd.DataFrame], fields: Sequence[str]) -> Optional[List[np.ndarray]]:
+    if df is None or df.empty or any(field not in df.columns for field in fields):
+        return None
+    values = []
+    for field in fields:
+        series = df[field]
+        if not pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+            return None
+        column = series.to_numpy(dtype=np.float64)
+        if not np.isfinite(column).all():
+            return None
+        values.append(column)
+    return values
+
+
+class FinancialPanel:
+    """财务面板：fields 为字段 -> float64 数组，none 为字段值为 None 的掩码
+
+    字段缺失时取 defaults 中的默认值（与 dict.get(key, default) 一致），
+    非数值（字符串、pd.NA 等）的股票记入 invalid，由调用方逐只处理
+    """
+
+    def __init__(self, fields: Dict[str, np.ndarray], none: Dict[str, np.ndarray], invalid: np.ndarray):
+        self.fields = fields
+        self.none = none
+        self.invalid = invalid
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.fields[field]
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            'financial_invalid': self.invalid,
+            **{f'financial_{field}': values for field, values in self.fields.items()},
+            **{f'financial_none_{field}': mask for field, mask in self.none.items()},
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], start: int = 0,
+                    stop: int = None) -> 'FinancialPanel':
+        fields, none = {}, {}
+        for name, values in arrays.items():
+            if name.startswith('financial_none_'):
+                none[name[len('financial_none_'):]] = values[start:stop]
+            elif name.startswith('financial_') and name != 'financial_invalid':
+                fields[name[len('financial_'):]] = values[start:stop]
+        return cls(fields, none, arrays['financial_invalid'][start:stop])
+
+    @classmethod
+    def from_dicts(cls, codes: Sequence[str], financial_data: Dict[str, dict],
+                   defaults: Dict[str, Optional[float]]) -> 'FinancialPanel':
+        n = len(codes)
+        fields = {field: np.full(n, np.nan) for field in defaults}
+        none = {field: np.zeros(n, dtype=bool) for field in defaults}
+        invalid = np.zeros(n, dtype=bool)
+
+        for row, code in enumerate(codes):
+            financial = financial_data.get(code, {})
+            if not isinstance(financial, dict):
+                invalid[row] = True
+                continue
+            for field, default in defaults.items():
+                value = financial.get(field, default)
+                if value is None:
+                    none[field][row] = True
+                elif isinstance(value, (int, float, np.number)):
+                    fields[field][row] = value
+                else:
+                    invalid[row] = True
+        return cls(fields, none, invalid)
+
+
+# ---------- 与 pandas 逐元素一致的时间轴算子（输入为 (股票数, K 线数) 稠密块） ----------
+
+def ewm_mean(values: np.ndarray, com: float = None, span: float = None,
+             adjust: bool = True) -> np.ndarray:
+    """等价于 df.ewm(com=..|span=.., adjust=..).mean()（ignore_na=False, min_periods=0）"""
+    if span is not None:
+        com = (span - 1) / 2.0
+    alpha = 1. / (1. + com)
+    old_wt_factor = 1. - alpha
+    new_wt = 1. if adjust else alpha
+
+    rows, length = values.shape
+    out = np.empty_like(values)
+    weighted = values[:, 0].copy()
+    old_wt = np.ones(rows)
+    out[:, 0] = weighted
+    for i in range(1, length):
+        cur = values[:, i]
+        observed = ~np.isnan(cur)
+        started = ~np.isnan(weighted)
+
+        old_wt = np.where(started, old_wt * old_wt_factor, old_wt)
+        update = started & observed
+        blended = (old_wt * weighted + new_wt * cur) / (old_wt + new_wt)
+        # 常数序列不做加权，避免数值误差
+        weighted = np.where(update & (weighted != cur), blended, weighted)
+        if adjust:
+            old_wt = np.where(update, old_wt + new_wt, old_wt)
+        else:
+            old_wt = np.where(update, 1., old_wt)
+        weighted = np.where(~started & observed, cur, weighted)
+        out[:, i] = weighted
+    return out
+
+
+def rolling_mean_last(values: np.ndarray, window: int) -> np.ndarray:
+    """等价于 df.rolling(window).mean().iloc[-1]
+
+    按 pandas 的在线算法逐列加入/移出窗口（Kahan 补偿求和、常数窗口和符号修正），保证末值逐位一致
+    """
+    rows, length = values.shape
+    sum_x = np.zeros(rows)
+    comp_add = np.zeros(rows)
+    comp_remove = np.zeros(rows)
+    nobs = np.zeros(rows, dtype=np.int64)
+    neg_ct = np.zeros(rows, dtype=np.int64)
+    same_ct = np.zeros(rows, dtype=np.int64)
+    prev_value = values[:, 0].copy() if length else np.zeros(rows)
+
+    for i in range(length):
+        if i >= window:
+            val = values[:, i - window]
+            observed = ~np.isnan(val)
+            y = -val - comp_remove
+            t = sum_x + y
+            comp_remove = np.where(observed, t - sum_x - y, comp_remove)
+            sum_x = np.where(observed, t, sum_x)
+            nobs -= observed
+            neg_ct -= observed & np.signbit(val)
+
+        val = values[:, i]
+        observed = ~np.isnan(val)
+        y = val - comp_add
+        t = sum_x + y
+        comp_add = np.where(observed, t - sum_x - y, comp_add)
+        sum_x = np.where(observed, t, sum_x)
+        nobs += observed
+        neg_ct += observed & np.signbit(val)
+        same_ct = np.where(observed, np.where(val == prev_value, same_ct + 1, 1), same_ct)
+        prev_value = np.where(observed, val, prev_value)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = sum_x / nobs
+    result = np.where(same_ct >= nobs, prev_value, result)
+    result = np.where((same_ct < nobs) & (neg_ct == 0) & (result < 0), 0., result)
+    result = np.where((same_ct < nobs) & (neg_ct == nobs) & (result > 0), 0., result)
+    return np.where(nobs >= window, result, np.nan)
+
+
+def rolling_extreme(values: np.ndarray, window: int, how: str = 'min') -> np.ndarray:
+    """等价于 df.rolling(window).min()/max()，前 window-1 列为 NaN"""
+    out = np.full_like(values, np.nan)
+    if values.shape[1] >= window:
+        view = np.lib.stride_tricks.sliding_window_view(values, window, axis=1)
+        out[:, window - 1:] = view.min(axis=2) if how == 'min' else view.max(axis=2)
+    return out
+
+
+def row_mean(values: np.ndarray) -> np.ndarray:
+    """等价于逐行 Series.mean()（无 NaN）"""
+    return values.sum(axis=1, dtype=np.float64) / values.shape[1]
+
+
+def row_std(values: np.ndarray, ddof: int = 1) -> np.ndarray:
+    """等价于逐行 Series.std(ddof)（无 NaN）"""
+    count = float(values.shape[1])
+    avg = values.sum(axis=1, dtype=np.float64) / count
+    sqr = (avg[:, None] - values) ** 2
+    return np.sqrt(sqr.sum(axis=1, dtype=np.float64) / (count - ddof))
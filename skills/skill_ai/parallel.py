@@ -0,0 +1,152 @@
+"""多进程分片计算：面板数组放入共享内存，worker 按行区间挂载只读视图，不序列化 DataFrame
+
+用法:
+    with SharedArrays({'close': close, 'lengths': lengths}) as shared:
+        results = map_shards(func, shared.spec, n_rows, workers=8)
+
+func(arrays, start, stop, *args) 在 worker 中执行，arrays 为共享数组的视图，
+返回值按分片顺序拼回，结果与单进程计算一致且顺序确定。
+
+进程池按 (进程数, 启动方式) 在模块级复用：解释器和 numpy 的启动开销只在第一次调用时付出，
+之后的评分、因子评估、权重校准调用直接提交任务；进程退出时统一关闭。
+"""
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+
+DEFAULT_PARALLEL = {
+    'workers': 0,  # 0/1 单进程，auto 为 CPU 核数
+    'min_stocks': 2000,  # 股票数达到该值才启用进程池
+    'start_method': 'spawn',
+}
+
+
+def parallel_options(config: dict = None) -> dict:
+    """合并 ai_model.parallel 配置，workers 解析为进程数"""
+    options = {**DEFAULT_PARALLEL, **((config or {}).get('parallel') or {})}
+    workers = options['workers']
+    if workers == 'auto':
+        workers = os.cpu_count() or 1
+    options['workers'] = max(int(workers or 1), 1)
+    return options
+
+
+def use_pool(options: dict, n_rows: int) -> bool:
+    return options['workers'] > 1 and n_rows >= max(options['min_stocks'], 2)
+
+
+class SharedArrays:
+    """把一组 numpy 数组复制进共享内存，spec 可传给子进程挂载"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self._blocks = []
+        self.spec = {}
+        try:
+            for name, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+                self._blocks.append(shm)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+                self.spec[name] = (shm.name, array.shape, array.dtype.str)
+        except Exception:
+            self.release()
+            raise
+
+    def release(self):
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+def attach(spec: Dict[str, Tuple[str, tuple, str]]) -> Tuple[Dict[str, np.ndarray], List[SharedMemory]]:
+    """在子进程中挂载共享数组（只读视图，释放由创建方负责）"""
+    arrays, handles = {}, []
+    for name, (shm_name, shape, dtype) in spec.items():
+        shm = SharedMemory(name=shm_name)
+        handles.append(shm)
+        view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        view.flags.writeable = False
+        arrays[name] = view
+    return arrays, handles
+
+
+def shard_bounds(n_rows: int, shards: int) -> List[Tuple[int, int]]:
+    """把 [0, n_rows) 切成至多 shards 个连续区间"""
+    shards = max(min(shards, n_rows), 1)
+    edges = np.linspace(0, n_rows, shards + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+_POOLS: Dict[Tuple[int, str], ProcessPoolExecutor] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(workers: int, start_method: str = 'spawn') -> ProcessPoolExecutor:
+    """取（必要时创建）可复用的进程池"""
+    key = (workers, start_method)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context(start_method))
+            _POOLS[key] = pool
+        return pool
+
+
+def _discard_pool(workers: int, start_method: str):
+    with _POOLS_LOCK:
+        pool = _POOLS.pop((workers, start_method), None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def shutdown_pools():
+    """关闭全部复用的进程池"""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _run_shard(func: Callable, spec: dict, start: int, stop: int, args: tuple):
+    arrays, handles = attach(spec)
+    try:
+        return func(arrays, start, stop, *args)
+    finally:
+        del arrays
+        for shm in handles:
+            shm.close()
+
+
+def map_shards(func: Callable, spec: dict, n_rows: int, workers: int, args: tuple = (),
+               start_method: str = 'spawn', shards: int = None) -> list:
+    """按行分片并行执行 func(arrays, start, stop, *args)，结果按分片顺序返回（默认 workers * 2 个分片）
+
+    使用复用的进程池；池已损坏（worker 异常退出）时丢弃并重建一次
+    """
+    bounds = shard_bounds(n_rows, shards or workers * 2)
+    for attempt in range(2):
+        executor = get_pool(workers, start_method)
+        try:
+            futures = [executor.submit(_run_shard, func, spec, start, stop, args) for start, stop in bounds]
+            return [future.result() for future in futures]
+        except BrokenProcessPool:
+            _discard_pool(workers, start_method)
+            if attempt:
+                raise
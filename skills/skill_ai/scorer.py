@@ -1,16 +1,94 @@
+import hashlib
+import json
 import numpy as np
 import pandas as pd
 from typing import Dict, List, Optional
 from datetime import datetime
 import loguru
 
+from .panel import PricePanel, FinancialPanel, ewm_mean, rolling_mean_last, rolling_extreme, row_mean, row_std
+from .parallel import SharedArrays, map_shards, parallel_options, use_pool
+
+
+# 逐只评分时 financial.get(key, 默认值) 的默认值
+FINANCIAL_DEFAULTS = {'pe': 20, 'pb': 3, 'roe': 10, 'revenue_growth': None}
+
+FACTOR_SCORE_COLUMNS = [
+    'pe_score', 'pb_score', 'roe_score', 'revenue_growth_score',
+    'momentum_score', 'volatility_score', 'liquidity_score',
+    'macd_score', 'rsi_score', 'kdj_score', 'sentiment_score',
+]
+
+
+# 评分逻辑变化时递增，使已保存的评分指纹全部失效
+SCORE_VERSION = 2
+
+# 增量评分内部字段：随评分保存，不出现在对外结果中
+INTERNAL_SCORE_FIELDS = ('fingerprint',)
+
+# 参与历史校验和的行情列
+CHECKSUM_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+
+def _bar(price_df: pd.DataFrame, index: int) -> list:
+    return [
+        str(price_df['date'].iat[index]) if 'date' in price_df.columns else None,
+        str(price_df['close'].iat[index]) if 'close' in price_df.columns else None,
+    ]
+
+
+def score_fingerprint(price_df: Optional[pd.DataFrame], financial, news: Optional[List[dict]],
+                      weights: Dict[str, float]) -> str:
+    """评分输入指纹：K 线根数、首末根 K 线、全部历史的校验和、财务数据、新闻水位线（条数、最新时间）、因子权重
+
+    前复权在除权日会改写整段历史，只看最后一根 K 线会漏掉这种变化，因此对整段 OHLCV 取校验和
+    """
+    history = None
+    if price_df is not None and not price_df.empty:
+        digest = hashlib.sha1()
+        for column in CHECKSUM_COLUMNS:
+            if column in price_df.columns:
+                digest.update(column.encode('utf-8'))
+                digest.update(np.ascontiguousarray(price_df[column].to_numpy(dtype=np.float64)).tobytes())
+        history = [len(price_df), _bar(price_df, 0), _bar(price_df, -1), digest.hexdigest()]
+    watermark = [len(news), max(str(n.get('datetime', '')) for n in news)] if news else [0, '']
+    payload = json.dumps(
+        [SCORE_VERSION, history, financial, watermark, weights],
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def public_score(score: dict) -> dict:
+    """去掉内部字段的评分记录，供 API 与报告使用"""
+    return {k: v for k, v in score.items() if k not in INTERNAL_SCORE_FIELDS}
+
+
+def public_scores(df_scores: pd.DataFrame) -> pd.DataFrame:
+    """去掉内部字段列的评分表"""
+    return df_scores.drop(columns=list(INTERNAL_SCORE_FIELDS), errors='ignore')
+
+
+def _factor_score_shard(arrays: Dict[str, np.ndarray], start: int, stop: int, config: dict) -> Dict[str, np.ndarray]:
+    """进程池 worker：对共享面板的 [start, stop) 行计算因子得分"""
+    return StockScorer(config).calculate_factor_scores(
+        PricePanel.from_arrays(arrays, start, stop),
+        FinancialPanel.from_arrays(arrays, start, stop)
+    )
+
 
 class StockScorer:
-    """股票评分引擎"""
+    """股票评分引擎
+
+    scoring_method: factor 按因子阶梯加权；ai 用 ml_model（MLScorer）预测的得分；
+    hybrid 按 ml_model.config['ai_weight'] 混合两者。没有可用模型时退回 factor
+    """
     
-    def __init__(self, config: dict = None):
+    def __init__(self, config: dict = None, ml_model=None):
         self.config = config or {}
         self.logger = loguru.logger
+        self.scoring_method = self.config.get('scoring_method', 'factor')
+        self.ml_model = ml_model
         
         self.factor_weights = {
             'pe': 0.10,
@@ -28,35 +106,293 @@ class StockScorer:
         
         if 'factors' in self.config and isinstance(self.config['factors'], dict):
             self.factor_weights.update(self.config['factors'])
+        
+        # ai_model.parallel: 股票数达到 min_stocks 且 workers > 1 时按股票分片到进程池计算
+        self.parallel = parallel_options(self.config)
     
     def score_stocks(self, price_data: Dict[str, pd.DataFrame],
                     financial_data: Dict[str, dict],
-                    news_data: Dict[str, List[dict]]) -> pd.DataFrame:
-        """对股票进行综合评分"""
-        
-        results = []
+                    news_data: Dict[str, List[dict]],
+                    previous_scores: Dict[str, dict] = None) -> pd.DataFrame:
+        """对股票进行综合评分
+
+        默认在整个股票池的行情/财务面板上向量化计算（config vectorized: false 时逐只计算），
+        两种方式结果一致；无法放进面板的股票（缺列、含缺失值等）仍逐只评分
+
+        previous_scores: 上次保存的评分 {code: 评分记录}，传入时为增量评分——
+            每条结果带 fingerprint 列，输入指纹未变的股票直接沿用上次评分，只重算变化的股票
+        """
+        fingerprints, reused = None, {}
+        if previous_scores is not None:
+            fingerprints = {
+                code: score_fingerprint(df, financial_data.get(code), news_data.get(code), self.factor_weights)
+                for code, df in price_data.items()
+            }
+            for code, fingerprint in fingerprints.items():
+                previous = previous_scores.get(code)
+                if previous and previous.get('fingerprint') == fingerprint:
+                    reused[code] = self._reuse_score(previous)
+                    reused[code]['fingerprint'] = fingerprint
+            if reused:
+                self.logger.info(f"增量评分: 重算 {len(price_data) - len(reused)} 只，沿用 {len(reused)} 只")
+                price_data = {code: df for code, df in price_data.items() if code not in reused}
+        
+        if self.config.get('vectorized', True):
+            results = self._score_panel(price_data, financial_data, news_data)
+        else:
+            results = self._score_each(price_data, financial_data, news_data)
         
-        for code, df in price_data.items():
-            try:
-                score = self._calculate_score(
-                    code, df, 
-                    financial_data.get(code, {}),
-                    news_data.get(code, [])
-                )
-                results.append(score)
-            except Exception as e:
-                self.logger.error(f"评分 {code} 失败: {e}")
+        if fingerprints is not None:
+            for score in results:
+                score['fingerprint'] = fingerprints[score['code']]
+            scored = {score['code']: score for score in results}
+            results = [reused.get(code) or scored[code] for code in fingerprints
+                       if code in reused or code in scored]
         
         if not results:
             return pd.DataFrame()
         
         df_scores = pd.DataFrame(results)
+        if self.scoring_method in ('ai', 'hybrid'):
+            df_scores = self._apply_ml_scores(df_scores)
         
-        df_scores = df_scores.sort_values('total_score', ascending=False)
+        # 稳定排序：同分按输入顺序排名，与是否分片计算无关
+        df_scores = df_scores.sort_values('total_score', ascending=False, kind='mergesort')
         df_scores['rank'] = range(1, len(df_scores) + 1)
         
         return df_scores
     
+    def _apply_ml_scores(self, df_scores: pd.DataFrame) -> pd.DataFrame:
+        """整表一次预测 AI 得分，按 scoring_method 重算 total_score（因子得分由各因子列重新加权，沿用的评分同样适用）"""
+        ai_score = self.ml_model.predict(df_scores) if self.ml_model is not None else None
+        if ai_score is None:
+            self.logger.warning(f"没有可用的 ML 模型，{self.scoring_method} 评分退回因子评分")
+            return df_scores
+        
+        factor_score = np.zeros(len(df_scores))
+        for column in FACTOR_SCORE_COLUMNS:
+            weight = self.factor_weights.get(column.replace('_score', ''), 0.1)
+            factor_score = factor_score + df_scores[column].to_numpy(dtype=np.float64) * weight
+        ai_weight = self.ml_model.config['ai_weight'] if self.scoring_method == 'hybrid' else 1.
+        
+        df_scores = df_scores.copy()
+        df_scores['factor_score'] = np.round(factor_score, 2)
+        df_scores['ai_score'] = np.round(ai_score, 2)
+        df_scores['total_score'] = np.round((1 - ai_weight) * factor_score + ai_weight * ai_score, 2)
+        return df_scores
+    
+    @staticmethod
+    def _reuse_score(previous: dict) -> dict:
+        """沿用已保存评分：去掉存储附加字段与内部字段，排名重新计算"""
+        score = {k: v for k, v in public_score(previous).items() if k not in ('rank', 'saved_at', '_id')}
+        if isinstance(score.get('timestamp'), str):
+            score['timestamp'] = pd.Timestamp(score['timestamp'])
+        return score
+    
+    def _score_each(self, price_data: Dict[str, pd.DataFrame],
+                    financial_data: Dict[str, dict],
+                    news_data: Dict[str, List[dict]]) -> List[dict]:
+        """逐只评分"""
+        results = []
+        
+        for code, df in price_data.items():
+            score = self._score_one(code, df, financial_data, news_data)
+            if score is not None:
+                results.append(score)
+        
+        return results
+    
+    def _score_one(self, code: str, df: pd.DataFrame,
+                   financial_data: Dict[str, dict],
+                   news_data: Dict[str, List[dict]]) -> Optional[dict]:
+        try:
+            return self._calculate_score(
+                code, df, 
+                financial_data.get(code, {}),
+                news_data.get(code, [])
+            )
+        except Exception as e:
+            self.logger.error(f"评分 {code} 失败: {e}")
+            return None
+    
+    def _score_panel(self, price_data: Dict[str, pd.DataFrame],
+                     financial_data: Dict[str, dict],
+                     news_data: Dict[str, List[dict]]) -> List[dict]:
+        """向量化评分，按 price_data 原顺序返回与逐只评分相同的记录"""
+        panel, rejected = PricePanel.from_frames(price_data)
+        financial = FinancialPanel.from_dicts(panel.codes, financial_data, FINANCIAL_DEFAULTS)
+        
+        factor_scores = self._panel_factor_scores(panel, financial)
+        invalid = financial.invalid.copy()
+        sentiment = []
+        for row, code in enumerate(panel.codes):
+            news = news_data.get(code, [])
+            try:
+                sentiment.append(self._score_sentiment(news) if news else 50)
+            except Exception:
+                invalid[row] = True
+                sentiment.append(50)
+        factor_scores['sentiment_score'] = sentiment
+        
+        total_score = np.zeros(len(panel))
+        for column in FACTOR_SCORE_COLUMNS:
+            weight = self.factor_weights.get(column.replace('_score', ''), 0.1)
+            total_score = total_score + np.asarray(factor_scores[column], dtype=np.float64) * weight
+        
+        columns = {column: list(values) if isinstance(values, list) else values.tolist()
+                   for column, values in factor_scores.items()}
+        total_score = total_score.tolist()
+        timestamp = datetime.now()
+        
+        scored = {}
+        for row, code in enumerate(panel.codes):
+            if invalid[row]:
+                rejected.append(code)
+                continue
+            financial_row = financial_data.get(code, {})
+            scored[code] = {
+                'code': code,
+                'total_score': round(total_score[row], 2),
+                **{column: columns[column][row] for column in FACTOR_SCORE_COLUMNS},
+                'pe': financial_row.get('pe'),
+                'pb': financial_row.get('pb'),
+                'roe': financial_row.get('roe'),
+                'market_cap': financial_row.get('market_cap'),
+                'timestamp': timestamp
+            }
+        
+        for code in rejected:
+            score = self._score_one(code, price_data[code], financial_data, news_data)
+            if score is not None:
+                scored[code] = score
+        
+        return [scored[code] for code in price_data if code in scored]
+    
+    def _panel_factor_scores(self, panel: PricePanel,
+                             financial: FinancialPanel) -> Dict[str, np.ndarray]:
+        """股票数较多时行情/财务面板放入共享内存，按行分片交给进程池，结果按分片顺序拼回"""
+        if not use_pool(self.parallel, len(panel)):
+            return self.calculate_factor_scores(panel, financial)
+        
+        workers = self.parallel['workers']
+        self.logger.info(f"多进程评分: {len(panel)} 只股票，{workers} 个进程")
+        with SharedArrays({**panel.arrays(), **financial.arrays()}) as shared:
+            shards = map_shards(
+                _factor_score_shard, shared.spec, len(panel), workers,
+                args=(self.config,), start_method=self.parallel['start_method']
+            )
+        return {column: np.concatenate([shard[column] for shard in shards]) for column in shards[0]}
+    
+    def calculate_factor_scores(self, panel: PricePanel,
+                                financial: FinancialPanel) -> Dict[str, np.ndarray]:
+        """在整个面板上计算各因子得分（阶梯与 _score_pe 等逐只方法一一对应），返回 因子列 -> 整数数组"""
+        n = len(panel)
+        scores = {column: np.full(n, 50, dtype=np.int64) for column in FACTOR_SCORE_COLUMNS[:-1]}
+        
+        pe, pe_none = financial['pe'], financial.none['pe']
+        scores['pe_score'] = np.select(
+            [pe_none, pe <= 0, pe < 10, pe < 20, pe < 30, pe < 50],
+            [50, 50, 100, 80, 60, 40], 20
+        )
+        pb, pb_none = financial['pb'], financial.none['pb']
+        scores['pb_score'] = np.select(
+            [pb_none, pb <= 0, pb < 1, pb < 2, pb < 3, pb < 5],
+            [50, 50, 100, 80, 60, 40], 20
+        )
+        roe = financial['roe']
+        scores['roe_score'] = np.select(
+            [financial.none['roe'], roe > 25, roe > 20, roe > 15, roe > 10, roe > 5],
+            [50, 100, 85, 70, 55, 40], 20
+        )
+        growth = financial['revenue_growth']
+        scores['revenue_growth_score'] = np.select(
+            [financial.none['revenue_growth'], growth > 30, growth > 15, growth > 0, growth > -10],
+            [50, 100, 80, 60, 40], 20
+        )
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for rows, block in panel.tail_blocks(20, min_length=20):
+                close = block['close']
+                ma5 = row_mean(np.ascontiguousarray(close[:, -5:]))
+                ma20 = row_mean(close)
+                scores['momentum_score'][rows] = np.select(
+                    [ma5 > ma20 * 1.05, ma5 > ma20, ma5 > ma20 * 0.95], [80, 60, 40], 20
+                )
+            
+            for rows, block in panel.tail_blocks(20, min_length=5):
+                avg_volume = row_mean(block['volume'])
+                scores['liquidity_score'][rows] = np.select(
+                    [avg_volume > 1e8, avg_volume > 5e7, avg_volume > 1e7, avg_volume > 5e6],
+                    [100, 80, 60, 40], 20
+                )
+            
+            for rows, block in panel.blocks(min_length=20):
+                scores['volatility_score'][rows] = self._panel_volatility(block['close'])
+            
+            # EWM/滚动窗口对左侧 NaN 填充的处理与从首根 K 线开始计算一致，整面板一次递推
+            rows, block = panel.rows(min_length=35)
+            scores['macd_score'][rows] = self._panel_macd(block['close'])
+            rows, block = panel.rows(min_length=15)
+            scores['rsi_score'][rows] = self._panel_rsi(block['close'])
+            rows, block = panel.rows(min_length=9)
+            scores['kdj_score'][rows] = self._panel_kdj(block['high'], block['low'], block['close'])
+        
+        return scores
+    
+    def _panel_volatility(self, close: np.ndarray) -> np.ndarray:
+        returns = np.ascontiguousarray(close[:, 1:] / close[:, :-1] - 1)
+        volatility = row_std(returns) * np.sqrt(252)
+        return np.select(
+            [volatility < 0.15, volatility < 0.25, volatility < 0.35, volatility < 0.5],
+            [100, 80, 60, 40], 20
+        )
+    
+    def _panel_macd(self, close: np.ndarray) -> np.ndarray:
+        macd = ewm_mean(close, span=12, adjust=False) - ewm_mean(close, span=26, adjust=False)
+        hist = macd - ewm_mean(macd, span=9, adjust=False)
+        current_hist, prev_hist = hist[:, -1], hist[:, -2]
+        return np.select(
+            [(prev_hist <= 0) & (current_hist > 0),
+             (prev_hist >= 0) & (current_hist < 0),
+             current_hist > prev_hist],
+            [90, 20, np.where(current_hist > 0, 70, 60)],
+            np.where(current_hist < 0, 40, 30)
+        )
+    
+    def _panel_rsi(self, close: np.ndarray, period: int = 14) -> np.ndarray:
+        delta = np.full_like(close, np.nan)
+        delta[:, 1:] = close[:, 1:] - close[:, :-1]
+        padding = np.isnan(close)
+        gain = np.where(padding, np.nan, np.where(delta > 0, delta, 0.))
+        loss = np.where(padding, np.nan, -np.where(delta < 0, delta, 0.))
+        gain = rolling_mean_last(gain, period)
+        loss = rolling_mean_last(loss, period)
+        
+        loss = np.where(loss == 0, 0.0001, loss)
+        rsi = 100 - (100 / (1 + gain / loss))
+        return np.select(
+            [np.isnan(rsi), rsi < 30, rsi < 40, rsi > 70, rsi > 60],
+            [50, 90, 75, 20, 35], 60
+        )
+    
+    def _panel_kdj(self, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                   n: int = 9) -> np.ndarray:
+        low_list = rolling_extreme(low, n, 'min')
+        high_list = rolling_extreme(high, n, 'max')
+        
+        diff = high_list - low_list
+        diff = np.where(diff == 0, 0.0001, diff)
+        rsv = (close - low_list) / diff * 100
+        
+        k = ewm_mean(rsv, com=2)
+        d = ewm_mean(k, com=2)
+        curr_k, curr_d = k[:, -1], d[:, -1]
+        return np.select(
+            [np.isnan(curr_k) | np.isnan(curr_d), curr_k > curr_d],
+            [50, np.where(curr_k < 20, 90, 75)],
+            np.where(curr_k > 80, 20, 40)
+        )
+    
     def _calculate_score(self, code: str, price_df: pd.DataFrame,
                         financial: dict, news: list) -> dict:
         """计算单只股票的综合评分"""
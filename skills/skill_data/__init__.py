@@ -1,5 +1,9 @@
 from .fetcher import StockDataFetcher
 from .storage import DataStorage
+from .storage_cache import CachedStorage
+from .analytics import AnalyticalStorage
 from .news import NewsFetcher
+from .trading_calendar import TradingCalendar
+from .universe import IndexUniverse, IndustryClassification
 
-__all__ = ['StockDataFetcher', 'DataStorage', 'NewsFetcher']
+__all__ = ['StockDataFetcher', 'DataStorage', 'CachedStorage', 'AnalyticalStorage', 'NewsFetcher', 'TradingCalendar', 'IndexUniverse', 'IndustryClassification']
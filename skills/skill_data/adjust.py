@@ -0,0 +1,55 @@
+"""复权：存储不复权 K 线 + 累计后复权因子，读取时按需换算前/后复权价格"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+# 需要随复权因子缩放的价格列（成交量、成交额保持原值）
+ADJUSTED_COLUMNS = ('open', 'high', 'low', 'close')
+
+ADJUST_MODES = ('qfq', 'hfq', 'none')
+
+
+def normalize_factors(factors: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """整理为按日期升序、每个日期一条的 (date, factor) 表"""
+    if factors is None or factors.empty:
+        return pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'), 'factor': pd.Series(dtype=float)})
+    df = pd.DataFrame({
+        'date': pd.to_datetime(factors['date']),
+        'factor': pd.to_numeric(factors['factor'], errors='coerce'),
+    })
+    df = df[df['factor'] > 0].sort_values('date', kind='mergesort')
+    return df.drop_duplicates(subset=['date'], keep='last').reset_index(drop=True)
+
+
+def apply_adjustment(prices: pd.DataFrame, factors: Optional[pd.DataFrame],
+                     mode: str = 'qfq') -> pd.DataFrame:
+    """把不复权行情换算为复权行情
+
+    factors 为累计后复权因子（除权除息日起生效，后复权价 = 原始价 × 因子）：
+        hfq: 原始价 × 当日因子
+        qfq: 原始价 × 当日因子 / 最新因子，最新一段价格与原始价一致
+    每根 K 线的因子通过对因子日期 searchsorted 一次取得，整列相乘
+    """
+    if mode not in ADJUST_MODES:
+        raise ValueError(f"未知的复权方式: {mode}")
+
+    factors = normalize_factors(factors)
+    if mode == 'none' or prices is None or prices.empty or factors.empty or 'date' not in prices.columns:
+        return prices.copy() if prices is not None else prices
+
+    factor_dates = factors['date'].values
+    factor_values = factors['factor'].to_numpy(dtype=float)
+
+    # 首个因子日期之前的 K 线沿用首个因子
+    positions = factor_dates.searchsorted(pd.to_datetime(prices['date']).values, side='right') - 1
+    multiplier = factor_values[np.clip(positions, 0, None)]
+    if mode == 'qfq':
+        multiplier = multiplier / factor_values[-1]
+
+    adjusted = prices.copy()
+    for column in ADJUSTED_COLUMNS:
+        if column in adjusted.columns:
+            adjusted[column] = pd.to_numeric(adjusted[column], errors='coerce').to_numpy() * multiplier
+    return adjusted
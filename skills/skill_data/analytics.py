@@ -0,0 +1,367 @@
+"""分析型存储：在已存的 parquet 行情、财务和评分之上跑嵌入式列式 SQL，用于横截面筛选"""
+import re
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import pandas as pd
+
+from .storage import DataStorage, _to_timestamp
+
+
+# 行情快照文件名 {code}_{YYYYMMDD}.parquet
+_SNAPSHOT_PATTERN = r'([^/\\]+)_(\d{8})\.parquet$'
+
+_FILTER_OPS = {'>': '>', '>=': '>=', '<': '<', '<=': '<=', '==': '=', '!=': '!='}
+
+_FILTER_EXPR = re.compile(r'^\s*(\w+)\s*(>=|<=|==|!=|>|<)\s*(-?\d+(?:\.\d+)?)\s*$')
+
+
+def parse_filter(expr: str) -> Tuple[str, str, float]:
+    """把 "roe>15" 形式的条件解析为 (列, 运算符, 数值)"""
+    match = _FILTER_EXPR.match(expr)
+    if not match:
+        raise ValueError(f"无法解析筛选条件: {expr}")
+    column, op, value = match.groups()
+    return column, op, float(value)
+
+
+class AnalyticalStorage(DataStorage):
+    """分析型存储（在 DataStorage 之上增加 SQL 查询与横截面筛选）
+
+    读写接口与 DataStorage 完全一致，额外提供：
+        query(sql, params): 对 prices / financials / scores / adjust_factors 执行只读 SQL
+        screen(filters, ...): 动量 + 财务 + 评分的横截面筛选，条件下推到 SQL 引擎
+
+    config:
+        analytics_engine: auto（默认，有 duckdb 用 duckdb，否则 SQLite）/ duckdb / sqlite
+            duckdb 直接扫描 parquet 快照；SQLite 把 K 线同步到 store.sqlite 的 prices 表
+    """
+
+    PRICE_FIELDS = ('open', 'high', 'low', 'close', 'volume', 'amount', 'pct_change', 'turnover')
+    SCREEN_COLUMNS = ('close', 'momentum', 'momentum_pct', 'total_score', 'rank',
+                      *DataStorage._FINANCIAL_COLUMNS)
+
+    _PRICE_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS prices (
+            code TEXT NOT NULL,
+            date TEXT NOT NULL,
+            open REAL, high REAL, low REAL, close REAL, volume REAL, amount REAL,
+            pct_change REAL, turnover REAL,
+            PRIMARY KEY (code, date)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_prices_date ON prices (date);
+        CREATE TABLE IF NOT EXISTS price_sources (
+            file TEXT PRIMARY KEY,
+            mtime REAL
+        );
+    """
+
+    def __init__(self, data_dir: str = "data", config: dict = None):
+        super().__init__(data_dir, config)
+        self.engine = self._select_engine(self.config.get('analytics_engine', 'auto'))
+
+        self._duck = None
+        self._duck_prices_stale = True
+        self._duck_store_version = None
+
+        if self.engine == 'sqlite':
+            with self._connect() as conn:
+                conn.executescript(self._PRICE_SCHEMA)
+
+    def _select_engine(self, engine: str) -> str:
+        if engine not in ('auto', 'duckdb', 'sqlite'):
+            raise ValueError(f"未知的分析引擎: {engine}")
+        if engine == 'sqlite':
+            return 'sqlite'
+        try:
+            import duckdb  # noqa: F401
+            return 'duckdb'
+        except ImportError:
+            if engine == 'duckdb':
+                raise
+            self.logger.info("未安装 duckdb，分析查询使用 SQLite")
+            return 'sqlite'
+
+    # ------------------------------------------------------------------
+    # 写入：SQLite 引擎下同步维护 prices 表
+    # ------------------------------------------------------------------
+
+    def _write_price_snapshot(self, code: str, df: pd.DataFrame) -> str:
+        file_path = super()._write_price_snapshot(code, df)
+        if self.engine == 'sqlite':
+            path = Path(file_path)
+            self._sync_code(code, self._code_files(code), self._indexed_sources(code), {path.name: df})
+        else:
+            self._duck_prices_stale = True
+        return file_path
+
+    def _price_rows(self, code: str, df: pd.DataFrame) -> list:
+        if df is None or df.empty or 'date' not in df.columns:
+            return []
+        frame = pd.DataFrame({'code': code, 'date': pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')})
+        for field in self.PRICE_FIELDS:
+            frame[field] = pd.to_numeric(df[field], errors='coerce') if field in df.columns else None
+        frame = frame.astype(object).where(frame.notna(), None)
+        return list(frame.itertuples(index=False, name=None))
+
+    def _code_files(self, code: str) -> Dict[str, Path]:
+        return {f.name: f for f in sorted(self.price_dir.glob(f"{code}_*.parquet"))}
+
+    def _indexed_sources(self, code: str) -> Dict[str, float]:
+        with self._connect() as conn:
+            return dict(conn.execute(
+                "SELECT file, mtime FROM price_sources WHERE file >= ? AND file < ?", (f"{code}_", f"{code}`")
+            ).fetchall())
+
+    def _sync_code(self, code: str, files: Dict[str, Path], indexed: Dict[str, float],
+                   frames: Dict[str, pd.DataFrame] = None) -> int:
+        """把一只股票的 prices 行与其现存快照对齐，只写入新增或变化的 K 线，返回写入行数
+
+        只新增了比已索引快照更新的快照时，新快照按日期覆盖已有行；快照被删除、原地重写
+        （合并、同日重存）或插入了更早的快照时，按全部现存快照重算并删除多余的行
+        """
+        frames = frames or {}
+        mtimes = {name: f.stat().st_mtime for name, f in files.items()}
+        unchanged = all(name in mtimes and mtimes[name] == mtime for name, mtime in indexed.items())
+        new = [name for name in files if name not in indexed]
+        if unchanged and not new:
+            return 0
+        rebuild = not unchanged or bool(indexed and min(new) < max(indexed))
+
+        desired = {}
+        for name in (files if rebuild else new):
+            df = frames[name] if name in frames else self._read_price_file(files[name])
+            for row in self._price_rows(code, df):
+                desired[row[1]] = row
+
+        fields = ', '.join(self.PRICE_FIELDS)
+        placeholders = ', '.join('?' * (2 + len(self.PRICE_FIELDS)))
+        with self._connect() as conn:
+            existing = {
+                row[0]: row[1:]
+                for row in conn.execute(f"SELECT date, {fields} FROM prices WHERE code = ?", (code,))
+            }
+            changed = [row for date, row in desired.items() if existing.get(date) != row[2:]]
+            conn.executemany(
+                f"INSERT OR REPLACE INTO prices (code, date, {fields}) VALUES ({placeholders})", changed
+            )
+            if rebuild:
+                conn.executemany("DELETE FROM prices WHERE code = ? AND date = ?",
+                                 [(code, date) for date in existing if date not in desired])
+                conn.executemany("DELETE FROM price_sources WHERE file = ?",
+                                 [(name,) for name in indexed if name not in files])
+            conn.executemany("INSERT OR REPLACE INTO price_sources (file, mtime) VALUES (?, ?)",
+                             [(name, mtime) for name, mtime in mtimes.items()])
+        return len(changed)
+
+    def refresh(self):
+        """让分析表与磁盘上的行情快照保持一致（其他进程写入的快照也会被纳入）
+
+        SQLite 引擎每次 query 前调用：按股票比较快照文件名和 mtime，只同步有变化的股票，
+        只写入新增或变化的 K 线；快照被删除或重写的股票不会留下已不在任何快照中的行
+        """
+        if self.engine == 'duckdb':
+            self._duck_prices_stale = True
+            self._duck_store_version = None
+            return
+
+        files, indexed = {}, {}
+        for f in sorted(self.price_dir.glob("*.parquet")):
+            files.setdefault(f.stem.rsplit('_', 1)[0], {})[f.name] = f
+        with self._connect() as conn:
+            for name, mtime in conn.execute("SELECT file, mtime FROM price_sources"):
+                indexed.setdefault(name.rsplit('_', 1)[0], {})[name] = mtime
+
+        written = 0
+        for code in sorted(set(files) | set(indexed)):
+            written += self._sync_code(code, files.get(code, {}), indexed.get(code, {}))
+        if written:
+            self.logger.info(f"分析表已同步 {written} 根 K 线")
+
+    def compact_prices(self, codes: List[str] = None) -> dict:
+        """合并行情快照后重新同步分析表（被删除的快照不再作为 K 线来源）"""
+        stats = super().compact_prices(codes)
+        if stats['codes']:
+            self.refresh()
+        return stats
+
+    # ------------------------------------------------------------------
+    # DuckDB 连接：prices 为 parquet 视图，financials / scores / adjust_factors 取自 store.sqlite
+    # ------------------------------------------------------------------
+
+    def _store_version(self) -> tuple:
+        paths = (self.db_path, self.db_path.with_name(self.db_path.name + '-wal'))
+        return tuple(p.stat().st_mtime_ns if p.exists() else 0 for p in paths)
+
+    def _duckdb(self):
+        import duckdb
+
+        if self._duck is None:
+            self._duck = duckdb.connect()
+
+        if self._duck_prices_stale:
+            self._duck.execute(self._duck_price_view())
+            self._duck_prices_stale = False
+
+        version = self._store_version()
+        if version != self._duck_store_version:
+            with self._connect() as conn:
+                financials = pd.read_sql_query(
+                    f"SELECT code, {', '.join(self._FINANCIAL_COLUMNS)} FROM financials", conn
+                )
+                scores = pd.read_sql_query("SELECT code, total_score, rank FROM scores", conn)
+                factors = pd.read_sql_query("SELECT code, date, factor FROM adjust_factors", conn)
+            factors['date'] = pd.to_datetime(factors['date'])
+            self._duck.register('financials', financials)
+            self._duck.register('scores', scores)
+            self._duck.register('adjust_factors', factors)
+            self._duck_store_version = version
+
+        return self._duck
+
+    def _duck_price_view(self) -> str:
+        files = list(self.price_dir.glob("*.parquet"))
+        if not files:
+            fields = ', '.join(f"NULL::DOUBLE AS {f}" for f in self.PRICE_FIELDS)
+            return (f"CREATE OR REPLACE VIEW prices AS SELECT NULL::VARCHAR AS code, "
+                    f"NULL::TIMESTAMP AS date, {fields} WHERE false")
+
+        source = (f"read_parquet('{(self.price_dir / '*.parquet').as_posix()}', "
+                  f"filename=true, union_by_name=true)")
+        available = set(self._duck.execute(f"DESCRIBE SELECT * FROM {source}").df()['column_name'])
+        fields = ', '.join(
+            f"CAST({f} AS DOUBLE) AS {f}" if f in available else f"NULL::DOUBLE AS {f}"
+            for f in self.PRICE_FIELDS
+        )
+        # 同一股票同一天可能出现在多个快照中，取最新快照
+        return f"""
+            CREATE OR REPLACE VIEW prices AS
+            SELECT code, date, {', '.join(self.PRICE_FIELDS)} FROM (
+                SELECT regexp_extract(filename, '{_SNAPSHOT_PATTERN}', 1) AS code,
+                       regexp_extract(filename, '{_SNAPSHOT_PATTERN}', 2) AS snapshot,
+                       CAST(date AS TIMESTAMP) AS date, {fields}
+                FROM {source}
+            )
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY code, date ORDER BY snapshot DESC) = 1
+        """
+
+    # ------------------------------------------------------------------
+    # 查询接口
+    # ------------------------------------------------------------------
+
+    def _date_param(self, value):
+        ts = _to_timestamp(value)
+        if ts is None:
+            return None
+        return ts.to_pydatetime() if self.engine == 'duckdb' else ts.strftime('%Y-%m-%d')
+
+    def query(self, sql: str, params: Sequence = None) -> pd.DataFrame:
+        """执行 SQL（? 占位符），可用表: prices / financials / scores / adjust_factors"""
+        params = list(params or [])
+        if self.engine == 'duckdb':
+            return self._duckdb().execute(sql, params).df()
+
+        self.refresh()
+        with self._connect() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def screen(self, filters: List[Tuple[str, str, float]] = None, momentum_window: int = 20,
+               as_of=None, start=None, history: bool = False, order_by: str = 'momentum',
+               ascending: bool = False, limit: int = None) -> pd.DataFrame:
+        """横截面筛选
+
+        每只股票计算 momentum_window 日动量及其横截面分位 momentum_pct（0~1），
+        关联财务字段和最新评分后按 filters 过滤，例如
+            screen([('roe', '>', 15), ('momentum_pct', '>=', 0.9)])
+        默认取每只股票截至 as_of 的最新一根 K 线；history=True 时对 start 之后的
+        每个交易日分别计算分位并返回所有满足条件的 (date, code)
+        保存了复权因子的股票（price_mode: raw）先在 SQL 中换算为前复权收盘价再计算动量，
+        与 load_adjusted_price_data 的 qfq 一致
+        """
+        if order_by not in self.SCREEN_COLUMNS:
+            raise ValueError(f"不支持的排序字段: {order_by}")
+        window = int(momentum_window)
+        if window < 1:
+            raise ValueError("momentum_window 必须为正整数")
+
+        params = []
+        bar_where = ''
+        if as_of is not None:
+            bar_where = 'WHERE p.date <= ?'
+            params.append(self._date_param(as_of))
+
+        if history:
+            selection = 'momentum IS NOT NULL'
+            if start is not None:
+                selection += ' AND date >= ?'
+                params.append(self._date_param(start))
+            partition = 'PARTITION BY date'
+        else:
+            selection = 'momentum IS NOT NULL AND recency = 1'
+            partition = ''
+
+        conditions, filter_params = self._filter_sql(filters or [])
+        params.extend(filter_params)
+
+        sql = f"""
+            WITH factors AS (
+                SELECT code, factor,
+                       CASE WHEN ROW_NUMBER() OVER w = 1 THEN NULL ELSE date END AS valid_from,
+                       LEAD(date) OVER w AS valid_to,
+                       FIRST_VALUE(factor) OVER (PARTITION BY code ORDER BY date DESC) AS latest
+                FROM adjust_factors WHERE factor > 0
+                WINDOW w AS (PARTITION BY code ORDER BY date)
+            ),
+            adjusted AS (
+                -- 首个因子日期之前的 K 线沿用首个因子，没有因子的股票保持原价
+                SELECT p.code, p.date, p.close * COALESCE(f.factor / f.latest, 1) AS close
+                FROM prices p
+                LEFT JOIN factors f ON f.code = p.code
+                    AND (f.valid_from IS NULL OR p.date >= f.valid_from)
+                    AND (f.valid_to IS NULL OR p.date < f.valid_to)
+                {bar_where}
+            ),
+            bars AS (
+                SELECT code, date, close,
+                       close / NULLIF(LAG(close, {window}) OVER (PARTITION BY code ORDER BY date), 0) - 1
+                           AS momentum,
+                       ROW_NUMBER() OVER (PARTITION BY code ORDER BY date DESC) AS recency
+                FROM adjusted
+            ),
+            selected AS (
+                SELECT code, date, close, momentum,
+                       PERCENT_RANK() OVER ({partition} ORDER BY momentum) AS momentum_pct
+                FROM bars WHERE {selection}
+            ),
+            joined AS (
+                SELECT b.code, b.date, b.close, b.momentum, b.momentum_pct,
+                       {', '.join(f'f.{c}' for c in self._FINANCIAL_COLUMNS)},
+                       s.total_score, s.rank
+                FROM selected b
+                LEFT JOIN financials f ON f.code = b.code
+                LEFT JOIN scores s ON s.code = b.code
+            )
+            SELECT * FROM joined
+            {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+            ORDER BY {order_by} {'ASC' if ascending else 'DESC'}, date, code
+        """
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+
+        df = self.query(sql, params)
+        if not df.empty:
+            df['date'] = pd.to_datetime(df['date'])
+        return df
+
+    def _filter_sql(self, filters) -> Tuple[List[str], list]:
+        conditions, params = [], []
+        for item in filters:
+            column, op, value = parse_filter(item) if isinstance(item, str) else item
+            if column not in self.SCREEN_COLUMNS:
+                raise ValueError(f"不支持的筛选字段: {column}")
+            if op not in _FILTER_OPS:
+                raise ValueError(f"不支持的运算符: {op}")
+            conditions.append(f"{column} {_FILTER_OPS[op]} ?")
+            params.append(float(value))
+        return conditions, params
@@ -0,0 +1,150 @@
+"""基于 Motor 的异步 MongoDB 存储，供 FastAPI 路由在事件循环内直接 await"""
+from datetime import datetime
+from typing import List, Optional
+
+from pymongo import UpdateOne
+import pandas as pd
+import loguru
+
+from .mongo_storage import bucket_query, buckets_to_prices
+
+
+class AsyncMongoDBStorage:
+    """与 MongoDBStorage 同名同语义的异步读写接口
+
+    db 为 Motor 数据库对象（AsyncIOMotorDatabase），客户端由 mongo_client 的连接管理器共享；
+    config 与 MongoDBStorage 相同（price_layout 决定读平铺 K 线还是分桶），
+    集合、投影和排序与同步实现保持一致，两者可以读写同一份数据
+    """
+
+    def __init__(self, db, config: dict = None):
+        self.db = db
+        self.config = config or {}
+        self.logger = loguru.logger
+
+    @property
+    def prices(self):
+        return self.db["stock_prices"]
+
+    @property
+    def price_buckets(self):
+        return self.db["stock_price_buckets"]
+
+    @property
+    def bucketed_prices(self) -> bool:
+        return self.config.get('price_layout', 'bar') == 'bucket'
+
+    @property
+    def financials(self):
+        return self.db["stock_financials"]
+
+    @property
+    def news(self):
+        return self.db["stock_news"]
+
+    @property
+    def scores(self):
+        return self.db["stock_scores"]
+
+    @property
+    def portfolios(self):
+        return self.db["portfolios"]
+
+    @property
+    def backtest_results(self):
+        return self.db["backtest_results"]
+
+    async def load_price_data(self, code: str, start=None, end=None,
+                              columns: List[str] = None, limit: int = None) -> pd.DataFrame:
+        if self.bucketed_prices:
+            query, projection = bucket_query(code, start, end, columns)
+            buckets = await self.price_buckets.find(query, projection).sort('year', 1).to_list(length=None)
+            return buckets_to_prices(buckets, start, end, columns, limit)
+
+        query = {'stock_code': code}
+        date_query = {}
+        if start is not None:
+            date_query['$gte'] = pd.Timestamp(start).to_pydatetime()
+        if end is not None:
+            date_query['$lte'] = pd.Timestamp(end).to_pydatetime()
+        if date_query:
+            query['date'] = date_query
+
+        if columns is None:
+            projection = {'_id': 0, 'saved_at': 0}
+        else:
+            projection = {'_id': 0, 'date': 1, **{c: 1 for c in columns}}
+
+        cursor = self.prices.find(query, projection).sort('date', 1)
+        if limit:
+            cursor = cursor.limit(limit)
+        docs = await cursor.to_list(length=None)
+        if not docs:
+            return pd.DataFrame()
+
+        df = pd.DataFrame(docs)
+        if columns is not None and 'date' not in columns:
+            df = df[[c for c in columns if c in df.columns]]
+        return df
+
+    async def load_financial_data(self, code: str) -> Optional[dict]:
+        return await self.financials.find_one({'stock_code': code}, {'_id': 0, 'saved_at': 0})
+
+    async def load_news(self, code: str, limit: int = 50) -> List[dict]:
+        cursor = self.news.find(
+            {'stock_code': code}, {'_id': 0, 'saved_at': 0, 'stock_code': 0}
+        ).sort('publish_date', -1).limit(limit)
+        return await cursor.to_list(length=None)
+
+    async def save_stock_score(self, score: dict) -> str:
+        score['saved_at'] = datetime.now()
+        await self.scores.update_one({'code': score['code']}, {'$set': score}, upsert=True)
+        return score['code']
+
+    async def save_scores_batch(self, scores) -> int:
+        records = scores.to_dict('records') if isinstance(scores, pd.DataFrame) else list(scores)
+        saved_at = datetime.now()
+        operations = [
+            UpdateOne({'code': score['code']}, {'$set': {**score, 'saved_at': saved_at}}, upsert=True)
+            for score in records if score.get('code')
+        ]
+
+        if operations:
+            await self.scores.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    async def load_latest_scores(self, limit: int = 10) -> List[dict]:
+        cursor = self.scores.find({}, {'_id': 0, 'saved_at': 0}).sort('total_score', -1).limit(limit)
+        return await cursor.to_list(length=None)
+
+    async def save_portfolio(self, portfolio: dict) -> str:
+        portfolio['updated_at'] = datetime.now()
+        portfolio.pop('_id', None)
+
+        await self.portfolios.update_one({'name': portfolio['name']}, {'$set': portfolio}, upsert=True)
+        return portfolio['name']
+
+    async def load_portfolios(self) -> List[dict]:
+        return await self.portfolios.find({}, {'_id': 0}).to_list(length=None)
+
+    async def delete_portfolio(self, portfolio_id: str) -> int:
+        result = await self.portfolios.delete_one({'$or': [{'id': portfolio_id}, {'name': portfolio_id}]})
+        return result.deleted_count
+
+    async def save_backtest_result(self, result: dict) -> str:
+        result['saved_at'] = datetime.now()
+        result.pop('_id', None)
+
+        inserted = await self.backtest_results.insert_one(result)
+        return str(inserted.inserted_id)
+
+    async def load_backtest_results(self, portfolio_id: str = None) -> List[dict]:
+        query = {}
+        if portfolio_id:
+            query['portfolio_id'] = portfolio_id
+
+        cursor = self.backtest_results.find(query, {'_id': 0}).sort('saved_at', -1)
+        return await cursor.to_list(length=None)
+
+    async def load_backtest_result(self, backtest_id: str) -> Optional[dict]:
+        return await self.backtest_results.find_one({'id': backtest_id}, {'_id': 0})
@@ -14,11 +14,14 @@ class StockDataFetcher:
         self.config = config or {}
         self.logger = loguru.logger
         self._data_cache = {}
+        # raw: 存储不复权行情 + 复权因子，读取时再换算；adjusted: 直接抓取前复权行情
+        self.store_raw_prices = self.config.get('price_mode', 'adjusted') == 'raw'
 
     def fetch_price_data(self, stock_codes: List[str],
                          start_date: str = None,
-                         end_date: str = None) -> Dict[str, pd.DataFrame]:
-        """获取股票历史行情数据"""
+                         end_date: str = None,
+                         adjust: str = "qfq") -> Dict[str, pd.DataFrame]:
+        """获取股票历史行情数据（adjust: qfq 前复权 / hfq 后复权 / "" 不复权）"""
         if end_date is None:
             end_date = datetime.now().strftime("%Y%m%d")
         if start_date is None:
@@ -28,7 +31,7 @@ class StockDataFetcher:
         failed_codes = []
         for code in stock_codes:
             try:
-                df = akshare_source.fetch_price(code, start_date, end_date)
+                df = akshare_source.fetch_price(code, start_date, end_date, adjust=adjust)
             except Exception as e:
                 self.logger.error(f"akshare 获取 {code} 数据失败: {e}")
                 df = None
@@ -40,7 +43,7 @@ class StockDataFetcher:
                 failed_codes.append(code)
 
         if failed_codes:
-            result.update(self._fetch_price_via_baostock(failed_codes, start_date, end_date))
+            result.update(self._fetch_price_via_baostock(failed_codes, start_date, end_date, adjust))
 
         for code in stock_codes:
             if code not in result:
@@ -48,13 +51,14 @@ class StockDataFetcher:
 
         return result
 
-    def _fetch_price_via_baostock(self, codes: List[str], start_date: str, end_date: str) -> Dict[str, pd.DataFrame]:
+    def _fetch_price_via_baostock(self, codes: List[str], start_date: str, end_date: str,
+                                  adjust: str = "qfq") -> Dict[str, pd.DataFrame]:
         """akshare 兜底：同一会话内批量重试失败的代码"""
         result = {}
         try:
             with BaostockSession() as session:
                 for code in codes:
-                    df = session.fetch_price(code, start_date, end_date)
+                    df = session.fetch_price(code, start_date, end_date, adjust=adjust)
                     if df is not None and not df.empty:
                         result[code] = df
                         self.logger.info(f"[baostock] 成功获取 {code} 数据 {len(df)} 条")
@@ -64,6 +68,39 @@ class StockDataFetcher:
             self.logger.error(f"baostock 兜底获取行情数据失败: {e}")
         return result
 
+    def fetch_adjust_factors(self, stock_codes: List[str]) -> Dict[str, pd.DataFrame]:
+        """获取累计后复权因子，akshare 失败的代码走 baostock 兜底"""
+        result = {}
+        failed_codes = []
+        for code in stock_codes:
+            try:
+                df = akshare_source.fetch_adjust_factor(code)
+            except Exception as e:
+                self.logger.error(f"akshare 获取 {code} 复权因子失败: {e}")
+                df = None
+
+            if df is not None and not df.empty:
+                result[code] = df
+            else:
+                failed_codes.append(code)
+
+        if failed_codes:
+            try:
+                with BaostockSession() as session:
+                    for code in failed_codes:
+                        df = session.fetch_adjust_factor(code)
+                        if df is not None and not df.empty:
+                            result[code] = df
+                            self.logger.info(f"[baostock] 成功获取 {code} 复权因子")
+            except Exception as e:
+                self.logger.error(f"baostock 兜底获取复权因子失败: {e}")
+
+        for code in stock_codes:
+            if code not in result:
+                self.logger.warning(f"无法获取 {code} 复权因子")
+
+        return result
+
     def fetch_financial_data(self, stock_codes: List[str]) -> Dict[str, dict]:
         """获取财务数据"""
         spot_data = {}
@@ -183,6 +220,47 @@ class StockDataFetcher:
 
         return {}
 
+    def fetch_index_constituents(self, index_code: str, date: str = None) -> pd.DataFrame:
+        """获取指数成分股（code / date），date（YYYY-MM-DD）为历史日期时只能走 baostock"""
+        if date is None:
+            try:
+                df = akshare_source.fetch_index_constituents(index_code)
+                if df is not None and not df.empty:
+                    return df
+            except Exception as e:
+                self.logger.error(f"akshare 获取 {index_code} 成分股失败: {e}")
+
+        try:
+            with BaostockSession() as session:
+                df = session.fetch_index_constituents(index_code, date or "")
+                if df is not None and not df.empty:
+                    self.logger.info(f"[baostock] 成功获取 {index_code} 成分股 {len(df)} 只")
+                    return df
+        except Exception as e:
+            self.logger.error(f"baostock 获取 {index_code} 成分股失败: {e}")
+
+        return pd.DataFrame(columns=['code', 'date'])
+
+    def fetch_industry_map(self) -> Dict[str, str]:
+        """获取全市场股票行业分类：baostock 一次返回全市场，失败时用 akshare 申万分类"""
+        try:
+            with BaostockSession() as session:
+                mapping = session.fetch_industry_map()
+                if mapping:
+                    return mapping
+        except Exception as e:
+            self.logger.error(f"baostock 获取行业分类失败: {e}")
+
+        try:
+            mapping = akshare_source.fetch_industry_map()
+            if mapping:
+                self.logger.info(f"[akshare] 成功获取申万行业分类 {len(mapping)} 条")
+                return mapping
+        except Exception as e:
+            self.logger.error(f"akshare 获取行业分类失败: {e}")
+
+        return {}
+
     def fetch_market_summary(self) -> dict:
         """获取市场概览数据（依赖实时快照，baostock 无对应接口，无法兜底）"""
         try:
@@ -0,0 +1,272 @@
+"""进程级 MongoDB 连接管理：API、引擎和存储共用同一个调优过的连接池"""
+import os
+import threading
+from collections import deque
+from typing import Dict
+
+from pymongo import MongoClient, uri_parser
+from pymongo.monitoring import ConnectionPoolListener
+import loguru
+
+
+DEFAULT_POOL_OPTIONS = {
+    'max_pool_size': 50,
+    'min_pool_size': 0,
+    'max_idle_time_ms': 300000,
+    'wait_queue_timeout_ms': 5000,
+    'server_selection_timeout_ms': 2000,
+    'connect_timeout_ms': 2000,
+    'socket_timeout_ms': 30000,
+    'compressors': None,
+}
+
+_ENV_OPTIONS = {
+    'max_pool_size': 'MONGO_MAX_POOL_SIZE',
+    'min_pool_size': 'MONGO_MIN_POOL_SIZE',
+    'max_idle_time_ms': 'MONGO_MAX_IDLE_TIME_MS',
+    'wait_queue_timeout_ms': 'MONGO_WAIT_QUEUE_TIMEOUT_MS',
+    'server_selection_timeout_ms': 'MONGO_SERVER_SELECTION_TIMEOUT_MS',
+    'connect_timeout_ms': 'MONGO_CONNECT_TIMEOUT_MS',
+    'socket_timeout_ms': 'MONGO_SOCKET_TIMEOUT_MS',
+    'compressors': 'MONGO_COMPRESSORS',
+}
+
+_CLIENT_KWARGS = {
+    'max_pool_size': 'maxPoolSize',
+    'min_pool_size': 'minPoolSize',
+    'max_idle_time_ms': 'maxIdleTimeMS',
+    'wait_queue_timeout_ms': 'waitQueueTimeoutMS',
+    'server_selection_timeout_ms': 'serverSelectionTimeoutMS',
+    'connect_timeout_ms': 'connectTimeoutMS',
+    'socket_timeout_ms': 'socketTimeoutMS',
+    'compressors': 'compressors',
+}
+
+
+def pool_options(config: dict = None) -> dict:
+    """连接池参数：默认值 < 环境变量 < config.yaml database.pool"""
+    options = dict(DEFAULT_POOL_OPTIONS)
+    for key, env in _ENV_OPTIONS.items():
+        value = os.getenv(env)
+        if value not in (None, ''):
+            options[key] = value if key == 'compressors' else int(value)
+    options.update({k: v for k, v in (config or {}).items() if k in options})
+    return options
+
+
+def _client_kwargs(options: dict) -> dict:
+    kwargs = {}
+    for key, value in options.items():
+        if value is None:
+            continue
+        if key == 'compressors' and isinstance(value, (list, tuple)):
+            value = ','.join(value)
+        kwargs[_CLIENT_KWARGS[key]] = value
+    return kwargs
+
+
+def _pool_key(uri: str) -> str:
+    """同一集群、同一认证身份共用一个连接池；URI 中的库名只影响默认 authSource"""
+    if uri.startswith('mongodb+srv://'):
+        return uri
+    try:
+        parsed = uri_parser.parse_uri(uri)
+    except Exception:
+        return uri
+    nodes = ','.join(f"{host}:{port}" for host, port in sorted(parsed['nodelist']))
+    username = parsed.get('username')
+    if not username:
+        return nodes
+    auth_source = parsed['options'].get('authsource') or parsed.get('database') or 'admin'
+    return f"{username}@{nodes}/{auth_source}"
+
+
+class PoolMetrics(ConnectionPoolListener):
+    """连接池事件监听：签出次数、失败次数、等待耗时和当前连接数"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=window)
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.checked_out = 0
+        self.pool_clears = 0
+        self.max_wait_ms = 0.0
+
+    def _record_wait(self, event):
+        duration = getattr(event, 'duration', None)
+        if duration is None:
+            return
+        wait_ms = duration * 1000
+        self._waits.append(wait_ms)
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+            self._record_wait(event)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self._record_wait(event)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0
+            return {
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'checked_out': self.checked_out,
+                'connections_open': self.connections_created - self.connections_closed,
+                'connections_created': self.connections_created,
+                'pool_clears': self.pool_clears,
+                'wait_ms_avg': round(sum(waits) / len(waits), 3) if waits else 0.0,
+                'wait_ms_p95': round(p95, 3),
+                'wait_ms_max': round(self.max_wait_ms, 3),
+            }
+
+
+class MongoConnectionManager:
+    """按集群/认证身份复用 MongoClient（同步）和 Motor 客户端（异步）
+
+    - 第一次创建某个集群的客户端时确定连接池参数，之后的调用直接复用；
+      之后的调用显式要求不同参数时记录一次警告（已创建的池无法更改）
+    - 同步和异步客户端各自一个池（Motor 无法复用 pymongo 的池），共用同一组参数和指标
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: Dict[str, MongoClient] = {}
+        self._async_clients: Dict[str, object] = {}
+        self._metrics: Dict[str, PoolMetrics] = {}
+        self._options: Dict[str, dict] = {}
+        self._conflicts = set()
+        self.logger = loguru.logger
+
+    def _prepare(self, key: str, config: dict = None) -> dict:
+        if key not in self._options:
+            self._options[key] = pool_options(config)
+            self._metrics[key] = PoolMetrics()
+            return self._options[key]
+
+        options = self._options[key]
+        conflicts = tuple(sorted(
+            (name, value) for name, value in (config or {}).items()
+            if name in options and options[name] != value
+        ))
+        if conflicts and (key, conflicts) not in self._conflicts:
+            self._conflicts.add((key, conflicts))
+            ignored = ', '.join(f"{name}={value} (沿用 {options[name]})" for name, value in conflicts)
+            self.logger.warning(f"MongoDB 连接池 {key} 已按首次调用的参数创建，忽略: {ignored}")
+        return options
+
+    def get_client(self, uri: str, config: dict = None) -> MongoClient:
+        key = _pool_key(uri)
+        with self._lock:
+            options = self._prepare(key, config)
+            client = self._clients.get(key)
+            if client is None:
+                client = MongoClient(
+                    uri, event_listeners=[self._metrics[key]], **_client_kwargs(options)
+                )
+                self._clients[key] = client
+                self.logger.info(f"创建 MongoDB 连接池: {key} (maxPoolSize={options['max_pool_size']})")
+            return client
+
+    def get_async_client(self, uri: str, config: dict = None):
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        key = _pool_key(uri)
+        with self._lock:
+            options = self._prepare(key, config)
+            client = self._async_clients.get(key)
+            if client is None:
+                client = AsyncIOMotorClient(
+                    uri, event_listeners=[self._metrics[key]], **_client_kwargs(options)
+                )
+                self._async_clients[key] = client
+            return client
+
+    def pool_stats(self) -> Dict[str, dict]:
+        """各连接池的参数与等待耗时等指标"""
+        with self._lock:
+            return {
+                key: {
+                    'options': dict(self._options[key]),
+                    'sync': key in self._clients,
+                    'async': key in self._async_clients,
+                    **self._metrics[key].snapshot(),
+                }
+                for key in self._options
+            }
+
+    def close_all(self):
+        """关闭全部客户端（进程退出时调用）"""
+        with self._lock:
+            for client in list(self._clients.values()) + list(self._async_clients.values()):
+                try:
+                    client.close()
+                except Exception as e:
+                    self.logger.warning(f"关闭 MongoDB 客户端失败: {e}")
+            self._clients.clear()
+            self._async_clients.clear()
+            self._options.clear()
+            self._metrics.clear()
+            self._conflicts.clear()
+
+
+connection_manager = MongoConnectionManager()
+
+
+def get_mongo_client(uri: str, config: dict = None) -> MongoClient:
+    """获取进程内共享的 MongoClient"""
+    return connection_manager.get_client(uri, config)
+
+
+def get_async_mongo_client(uri: str, config: dict = None):
+    """获取进程内共享的 Motor 客户端"""
+    return connection_manager.get_async_client(uri, config)
+
+
+def get_pool_stats() -> Dict[str, dict]:
+    return connection_manager.pool_stats()
+
+
+def close_mongo_clients():
+    connection_manager.close_all()
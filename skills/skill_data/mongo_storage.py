@@ -1,31 +1,244 @@
-from pymongo import MongoClient
+import pymongo
+from pymongo import MongoClient, UpdateOne, DeleteMany, InsertOne, IndexModel, ASCENDING, DESCENDING
 from pymongo.collection import Collection
+from pymongo.errors import ConnectionFailure
 from datetime import datetime
 from typing import Dict, List, Optional
+import numpy as np
 import pandas as pd
+import loguru
 import os
 
+from .adjust import apply_adjustment, normalize_factors
+from .mongo_client import get_mongo_client
+
+
+def _same_bar(stored: Optional[dict], record: dict) -> bool:
+    """库中 K 线与新记录逐字段相同（NaN 视为相等）时无需重写"""
+    if stored is None or stored.keys() != record.keys():
+        return False
+    for key, value in record.items():
+        old = stored[key]
+        if key == 'date':
+            if pd.Timestamp(old) != pd.Timestamp(value):
+                return False
+        elif old != value and not (pd.isna(old) and pd.isna(value)):
+            return False
+    return True
+
+
+def _bucket_to_frame(buckets: List[dict]) -> pd.DataFrame:
+    """把若干分桶文档的列数组拼接为 DataFrame，不经过逐行 dict"""
+    names = []
+    for bucket in buckets:
+        for name in bucket.get('columns', {}):
+            if name not in names:
+                names.append(name)
+    
+    data = {'date': np.concatenate([
+        np.asarray(bucket['dates'], dtype='datetime64[ms]') for bucket in buckets
+    ]).astype('datetime64[ns]')}
+    for name in names:
+        parts = []
+        for bucket in buckets:
+            values = bucket.get('columns', {}).get(name)
+            parts.append(np.asarray(values) if values is not None
+                         else np.full(len(bucket['dates']), np.nan))
+        data[name] = np.concatenate(parts)
+    return pd.DataFrame(data)
+
+
+def bucket_query(code: str, start=None, end=None, columns: List[str] = None):
+    """分桶读取的 (查询条件, 投影)：按年份取覆盖日期范围的桶，只投影需要的列数组"""
+    query = {'stock_code': code}
+    years = {}
+    if start:
+        years['$gte'] = pd.Timestamp(start).year
+    if end:
+        years['$lte'] = pd.Timestamp(end).year
+    if years:
+        query['year'] = years
+    
+    projection = {'_id': 0, 'dates': 1}
+    if columns is None:
+        projection['columns'] = 1
+    else:
+        projection.update({f'columns.{c}': 1 for c in columns if c != 'date'})
+    return query, projection
+
+
+def buckets_to_prices(buckets: List[dict], start=None, end=None,
+                      columns: List[str] = None, limit: int = None) -> pd.DataFrame:
+    """按年份升序的分桶展开为 K 线表，并按日期范围、列和条数截取（同步/异步存储共用）"""
+    if not buckets:
+        return pd.DataFrame()
+    
+    df = _bucket_to_frame(buckets)
+    dates = df['date'].to_numpy()
+    lo = dates.searchsorted(pd.Timestamp(start).to_datetime64(), 'left') if start else 0
+    hi = dates.searchsorted(pd.Timestamp(end).to_datetime64(), 'right') if end else len(df)
+    df = df.iloc[lo:hi]
+    
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    if limit:
+        df = df.head(limit)
+    return df.reset_index(drop=True)
+
+
+def _frames_equal(left: pd.DataFrame, right: pd.DataFrame) -> bool:
+    """分桶内容比较：列、日期和数值一致（NaN 视为相等）即无需重写"""
+    if list(left.columns) != list(right.columns) or len(left) != len(right):
+        return False
+    try:
+        pd.testing.assert_frame_equal(
+            left.reset_index(drop=True), right.reset_index(drop=True),
+            check_dtype=False, check_datetimelike_compat=True
+        )
+    except AssertionError:
+        return False
+    return True
+
 
 class MongoDBStorage:
-    def __init__(self, connection_string: str = None, database: str = "aiqrh"):
+    """MongoDB 存储
+
+    config:
+        price_layout: bar（每根 K 线一个文档，默认）/ bucket（每只股票每年一个列式文档）；
+                      切换后旧布局集合中的行情不会被读取，由 migrate_price_layout 迁移
+        ensure_indexes: 连接时创建声明的索引，默认开启；先用 ping_timeout_ms（默认 500）探测，
+                        MongoDB 不可用时跳过，不阻塞启动
+        news_ttl_days: 新闻保留天数（按 saved_at 的 TTL 索引），默认 30，0 表示不过期
+        pool: 连接池参数（max_pool_size / min_pool_size / max_idle_time_ms / compressors 等），
+              客户端由进程内的连接管理器共享，见 mongo_client.py
+    """
+    
+    def __init__(self, connection_string: str = None, database: str = "aiqrh",
+                 config: dict = None):
         self.connection_string = connection_string or os.getenv(
             "MONGO_CONNECTION",
             "mongodb://localhost:27017/aiqrh"
         )
         self.database_name = database
+        self.config = config or {}
         self.client: Optional[MongoClient] = None
         self.db = None
+        self.logger = loguru.logger
         
     def connect(self):
         if self.client is None:
-            self.client = MongoClient(self.connection_string)
+            self.client = get_mongo_client(self.connection_string, self.config.get('pool'))
             self.db = self.client[self.database_name]
+            if self.ping():
+                if self.config.get('ensure_indexes', True):
+                    self.ensure_indexes()
+                self._check_price_layout()
         return self
     
+    def ping(self) -> bool:
+        """在 ping_timeout_ms 内探测 MongoDB 是否可用，不等待整个服务器选择超时"""
+        try:
+            with pymongo.timeout(self.config.get('ping_timeout_ms', 500) / 1000):
+                self.client.admin.command('ping')
+            return True
+        except ConnectionFailure as e:
+            self.logger.warning(f"MongoDB 不可用，跳过索引创建和布局检查: {e}")
+            return False
+    
+    def _check_price_layout(self):
+        """旧布局集合中仍有行情时记录错误：这些行情不会被读取，需要迁移"""
+        try:
+            stale = self._legacy_prices.find_one({}, {'_id': 1}) is not None
+        except Exception as e:
+            self.logger.warning(f"检查行情布局失败: {e}")
+            return
+        if stale:
+            self.logger.error(
+                f"price_layout={self.config.get('price_layout', 'bar')}，但 {self._legacy_prices.name} "
+                f"中仍有旧布局的行情，不会被读取；运行 python main.py --mode maintain 迁移"
+            )
+    
+    def _declared_indexes(self) -> Dict[str, List[IndexModel]]:
+        """各集合的查询/排序模式对应的索引"""
+        news_indexes = [
+            IndexModel([('stock_code', ASCENDING), ('publish_date', DESCENDING)],
+                       name='stock_code_publish_date'),
+        ]
+        news_ttl_days = self.config.get('news_ttl_days', 30)
+        if news_ttl_days:
+            news_indexes.append(IndexModel(
+                [('saved_at', ASCENDING)], name='saved_at_ttl',
+                expireAfterSeconds=int(news_ttl_days * 86400)
+            ))
+        
+        return {
+            'stock_prices': [
+                IndexModel([('stock_code', ASCENDING), ('date', ASCENDING)],
+                           unique=True, name='stock_code_date_unique'),
+            ],
+            'stock_price_buckets': [
+                IndexModel([('stock_code', ASCENDING), ('year', ASCENDING)],
+                           unique=True, name='stock_code_year_unique'),
+            ],
+            'stock_financials': [
+                IndexModel([('stock_code', ASCENDING)], unique=True, name='stock_code_unique'),
+            ],
+            'adjust_factors': [
+                IndexModel([('stock_code', ASCENDING), ('date', ASCENDING)],
+                           unique=True, name='stock_code_date_unique'),
+            ],
+            'stock_news': news_indexes,
+            'stock_scores': [
+                IndexModel([('code', ASCENDING)], unique=True, name='code_unique'),
+                IndexModel([('total_score', DESCENDING)], name='total_score_desc'),
+            ],
+            'portfolios': [
+                IndexModel([('name', ASCENDING)], unique=True, name='name_unique'),
+            ],
+            'backtest_results': [
+                IndexModel([('saved_at', DESCENDING)], name='saved_at_desc'),
+                IndexModel([('portfolio_id', ASCENDING), ('saved_at', DESCENDING)],
+                           name='portfolio_id_saved_at'),
+            ],
+        }
+    
+    def ensure_indexes(self) -> Dict[str, List[str]]:
+        """创建声明的索引（幂等），单个索引失败只记录告警，返回各集合已创建的索引名"""
+        created = {}
+        for collection, indexes in self._declared_indexes().items():
+            created[collection] = []
+            for index in indexes:
+                try:
+                    created[collection].extend(self.db[collection].create_indexes([index]))
+                except ConnectionFailure as e:
+                    self.logger.warning(f"MongoDB 不可用，跳过索引创建: {e}")
+                    return created
+                except Exception as e:
+                    self.logger.warning(f"创建索引 {collection}.{index.document['name']} 失败: {e}")
+        return created
+    
+    def index_stats(self) -> List[dict]:
+        """各集合索引的使用统计（$indexStats），用于发现未被使用或缺失的索引"""
+        stats = []
+        for collection in self._declared_indexes():
+            try:
+                for doc in self.db[collection].aggregate([{'$indexStats': {}}]):
+                    accesses = doc.get('accesses', {})
+                    stats.append({
+                        'collection': collection,
+                        'name': doc.get('name'),
+                        'key': dict(doc.get('key', {})),
+                        'ops': accesses.get('ops', 0),
+                        'since': accesses.get('since'),
+                    })
+            except Exception as e:
+                self.logger.warning(f"获取 {collection} 索引统计失败: {e}")
+        return stats
+    
     def close(self):
-        if self.client:
-            self.client.close()
-            self.client = None
+        """释放对共享客户端的引用；连接池由连接管理器在进程退出时统一关闭"""
+        self.client = None
+        self.db = None
     
     @property
     def prices(self) -> Collection:
@@ -51,47 +264,247 @@ class MongoDBStorage:
     def backtest_results(self) -> Collection:
         return self.db["backtest_results"]
     
+    @property
+    def adjust_factors(self) -> Collection:
+        return self.db["adjust_factors"]
+    
+    @property
+    def price_buckets(self) -> Collection:
+        return self.db["stock_price_buckets"]
+    
+    @property
+    def bucketed_prices(self) -> bool:
+        """price_layout=bucket 时每只股票每年一个文档，按列存放日期和 OHLCV 数组"""
+        return self.config.get('price_layout', 'bar') == 'bucket'
+    
+    @property
+    def _legacy_prices(self) -> Collection:
+        """另一种布局的行情集合"""
+        return self.prices if self.bucketed_prices else self.price_buckets
+    
+    def pending_layout_migration(self) -> List[str]:
+        """行情仍在另一种布局集合中、尚未迁移到当前 price_layout 的股票"""
+        return sorted(self._legacy_prices.distinct('stock_code'))
+    
+    def migrate_price_layout(self) -> Dict[str, int]:
+        """把另一种布局中的行情逐只写入当前 price_layout，写入后删除旧文档（中断后可重跑）"""
+        saved_at = datetime.now()
+        result = {'codes': 0, 'documents_written': 0}
+        for code in self.pending_layout_migration():
+            if self.bucketed_prices:
+                df = self._find_price_frame({'stock_code': code}, self._price_projection())
+                df = df.drop(columns=['stock_code'], errors='ignore')
+                operations = self._bucket_upserts(code, df, saved_at) if not df.empty else []
+                target = self.price_buckets
+            else:
+                query, projection = bucket_query(code)
+                df = buckets_to_prices(list(self.price_buckets.find(query, projection).sort('year', 1)))
+                operations = self._price_upserts(code, df, saved_at) if not df.empty else []
+                target = self.prices
+            if operations:
+                target.bulk_write(operations, ordered=False)
+            self._legacy_prices.delete_many({'stock_code': code})
+            result['codes'] += 1
+            result['documents_written'] += len(operations)
+        if result['codes']:
+            self.logger.info(f"行情已迁移到 {self.config.get('price_layout', 'bar')} 布局: "
+                             f"{result['codes']} 只股票，写入 {result['documents_written']} 个文档")
+        return result
+    
     def save_price_data(self, code: str, df: pd.DataFrame) -> int:
+        """按 (stock_code, date) upsert，只写入新增或变化的 K 线/分桶，返回写入文档数"""
+        return self.save_price_batch({code: df})
+    
+    def _price_upserts(self, code: str, df: pd.DataFrame, saved_at: datetime) -> List[UpdateOne]:
+        """对比库中已有 K 线，只为新增或变化的记录生成幂等 upsert"""
         records = df.to_dict('records')
-        for r in records:
-            r['stock_code'] = code
-            r['saved_at'] = datetime.now()
-            
-        result = self.prices.update_many(
-            {'stock_code': code},
-            {'$set': {'deleted': True}},
-            upsert=False
+        existing = self._existing_bars(code, [r['date'] for r in records])
+        
+        operations = []
+        for record in records:
+            if _same_bar(existing.get(pd.Timestamp(record['date'])), record):
+                continue
+            record['stock_code'] = code
+            record['saved_at'] = saved_at
+            operations.append(UpdateOne(
+                {'stock_code': code, 'date': record['date']},
+                {'$set': record},
+                upsert=True
+            ))
+        return operations
+    
+    def _existing_bars(self, code: str, dates: list) -> Dict[pd.Timestamp, dict]:
+        """读取日期范围内已有的 K 线，用于判断哪些记录需要写入"""
+        if not dates:
+            return {}
+        cursor = self.prices.find(
+            {'stock_code': code, 'date': {'$gte': min(dates), '$lte': max(dates)}},
+            {'_id': 0, 'saved_at': 0, 'stock_code': 0}
         )
-        self.prices.delete_many({'stock_code': code, 'deleted': True})
+        return {pd.Timestamp(doc['date']): doc for doc in cursor}
+    
+    def _bucket_upserts(self, code: str, df: pd.DataFrame, saved_at: datetime) -> List[UpdateOne]:
+        """按年合并进已有分桶，只为内容变化的分桶生成 upsert"""
+        df = df.sort_values('date')
+        years = pd.DatetimeIndex(df['date']).year
+        existing = {
+            doc['year']: doc for doc in self.price_buckets.find(
+                {'stock_code': code, 'year': {'$in': sorted(set(years.tolist()))}},
+                {'_id': 0, 'year': 1, 'dates': 1, 'columns': 1}
+            )
+        }
+        
+        operations = []
+        for year, new_bars in df.groupby(years):
+            old_bars = _bucket_to_frame([existing[year]]) if year in existing else None
+            merged = new_bars
+            if old_bars is not None:
+                merged = pd.concat([old_bars, new_bars], ignore_index=True)
+                merged = merged.sort_values('date', kind='mergesort').drop_duplicates('date', keep='last')
+                if _frames_equal(old_bars, merged):
+                    continue
+            
+            values = merged.drop(columns=['date'])
+            operations.append(UpdateOne(
+                {'stock_code': code, 'year': int(year)},
+                {'$set': {
+                    'dates': list(pd.DatetimeIndex(merged['date']).to_pydatetime()),
+                    'columns': {c: values[c].tolist() for c in values.columns},
+                    'saved_at': saved_at,
+                }},
+                upsert=True
+            ))
+        return operations
+    
+    def save_price_batch(self, price_data: Dict[str, pd.DataFrame]) -> int:
+        """批量保存行情，所有股票的变化合并为一次无序 bulk_write"""
+        saved_at = datetime.now()
+        build = self._bucket_upserts if self.bucketed_prices else self._price_upserts
+        collection = self.price_buckets if self.bucketed_prices else self.prices
+        
+        operations = []
+        for code, df in price_data.items():
+            if df is not None and not df.empty:
+                operations.extend(build(code, df, saved_at))
         
-        if records:
-            self.prices.insert_many(records)
-        return len(records)
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+        return len(operations)
+    
+    @staticmethod
+    def _date_query(start=None, end=None) -> Optional[dict]:
+        """起止日期转换为 date 字段的范围条件（库中 date 为 BSON datetime）"""
+        condition = {}
+        if start:
+            condition['$gte'] = pd.Timestamp(start).to_pydatetime()
+        if end:
+            condition['$lte'] = pd.Timestamp(end).to_pydatetime()
+        return condition or None
+    
+    @staticmethod
+    def _price_projection(columns: List[str] = None) -> dict:
+        """只取需要的字段，_id / saved_at 不回传"""
+        if columns is None:
+            return {'_id': 0, 'saved_at': 0}
+        projection = {'_id': 0, 'date': 1}
+        projection.update({c: 1 for c in columns})
+        return projection
     
-    def load_price_data(self, code: str, start_date: str = None, 
-                        end_date: str = None, limit: int = None) -> pd.DataFrame:
+    def load_price_data(self, code: str, start: str = None, end: str = None,
+                        columns: List[str] = None, limit: int = None) -> pd.DataFrame:
+        if self.bucketed_prices:
+            return self._load_bucketed_prices(code, start, end, columns, limit)
+        
         query = {'stock_code': code}
         
-        if start_date or end_date:
-            query['date'] = {}
-            if start_date:
-                query['date']['$gte'] = start_date
-            if end_date:
-                query['date']['$lte'] = end_date
+        date_query = self._date_query(start, end)
+        if date_query:
+            query['date'] = date_query
+        
+        projection = self._price_projection(columns)
+        df = self._find_price_frame(query, projection, limit)
+        
+        if not df.empty and columns is not None and 'date' not in columns:
+            df = df[[c for c in columns if c in df.columns]]
+        return df
+    
+    def _find_price_frame(self, query: dict, projection: dict, limit: int = None) -> pd.DataFrame:
+        """按日期升序读取 K 线
+
+        安装了 pymongoarrow 时由 find_arrow_all 在 C 层把 BSON 按列解码为 Arrow 表再转为 DataFrame；
+        否则逐文档读取后交给 pandas 构建。两条路径整数列都保持 int64（有缺失值时为 float64），
+        _id / saved_at 已由投影排除
+        """
+        try:
+            from pymongoarrow.api import find_arrow_all
+        except ImportError:
+            find_arrow_all = None
         
-        cursor = self.prices.find(query).sort('date', 1)
+        if find_arrow_all is not None:
+            try:
+                table = find_arrow_all(
+                    self.prices, query, projection=projection,
+                    sort=[('date', 1)], limit=limit or 0
+                )
+                return table.to_pandas() if table.num_rows else pd.DataFrame()
+            except Exception as e:
+                self.logger.warning(f"pymongoarrow 解码失败，回退到逐文档读取: {e}")
         
+        cursor = self.prices.find(query, projection).sort('date', 1)
         if limit:
             cursor = cursor.limit(limit)
-        
         data = list(cursor)
+        return pd.DataFrame(data) if data else pd.DataFrame()
+    
+    def _load_bucketed_prices(self, code: str, start=None, end=None,
+                              columns: List[str] = None, limit: int = None) -> pd.DataFrame:
+        """一次查询取回覆盖日期范围的分桶，直接由列数组拼出 DataFrame"""
+        query, projection = bucket_query(code, start, end, columns)
+        buckets = list(self.price_buckets.find(query, projection).sort('year', 1))
+        return buckets_to_prices(buckets, start, end, columns, limit)
+    
+    def load_all_price_data(self, code: str, start: str = None, end: str = None,
+                            columns: List[str] = None) -> pd.DataFrame:
+        """与 DataStorage 接口对齐：MongoDB 中每根 K 线只存一份，直接按范围读取"""
+        return self.load_price_data(code, start, end, columns)
+    
+    def save_adjust_factors(self, factors: Dict[str, pd.DataFrame]) -> int:
+        """按股票整体替换累计后复权因子，除权除息只需更新这里，不必重写行情"""
+        operations, count = [], 0
+        for code, df in factors.items():
+            df = normalize_factors(df)
+            operations.append(DeleteMany({'stock_code': code}))
+            operations.extend(
+                InsertOne({'stock_code': code, 'date': date.to_pydatetime(), 'factor': float(factor)})
+                for date, factor in zip(df['date'], df['factor'])
+            )
+            count += len(df)
         
-        if data:
-            for d in data:
-                d.pop('_id', None)
-                d.pop('saved_at', None)
-            return pd.DataFrame(data)
-        return pd.DataFrame()
+        if operations:
+            # 删除必须先于插入，使用有序写
+            self.adjust_factors.bulk_write(operations, ordered=True)
+        return count
+    
+    def load_adjust_factors(self, code: str) -> pd.DataFrame:
+        docs = list(self.adjust_factors.find(
+            {'stock_code': code}, {'_id': 0, 'date': 1, 'factor': 1}
+        ).sort('date', 1))
+        if not docs:
+            return pd.DataFrame(columns=['date', 'factor'])
+        return pd.DataFrame(docs)[['date', 'factor']]
+    
+    def load_adjusted_price_data(self, code: str, mode: str = 'qfq', start: str = None,
+                                 end: str = None, columns: List[str] = None) -> pd.DataFrame:
+        """读取不复权行情并按复权因子换算（qfq / hfq）"""
+        read_columns = None
+        if columns is not None:
+            read_columns = list(columns) if 'date' in columns else ['date', *columns]
+        df = apply_adjustment(
+            self.load_price_data(code, start, end, read_columns), self.load_adjust_factors(code), mode
+        )
+        if columns is not None and 'date' not in columns and not df.empty:
+            df = df[list(columns)]
+        return df
     
     def save_financial_data(self, code: str, data: dict) -> str:
         data['stock_code'] = code
@@ -104,12 +517,23 @@ class MongoDBStorage:
         )
         return code
     
+    def save_financial_batch(self, financial_data: Dict[str, dict]) -> int:
+        saved_at = datetime.now()
+        operations = [
+            UpdateOne(
+                {'stock_code': code},
+                {'$set': {**data, 'stock_code': code, 'saved_at': saved_at}},
+                upsert=True
+            )
+            for code, data in financial_data.items()
+        ]
+        
+        if operations:
+            self.financials.bulk_write(operations, ordered=False)
+        return len(operations)
+    
     def load_financial_data(self, code: str) -> Optional[dict]:
-        result = self.financials.find_one({'stock_code': code})
-        if result:
-            result.pop('_id', None)
-            result.pop('saved_at', None)
-        return result
+        return self.financials.find_one({'stock_code': code}, {'_id': 0, 'saved_at': 0})
     
     def save_news(self, code: str, news_list: List[dict]) -> int:
         if not news_list:
@@ -124,18 +548,33 @@ class MongoDBStorage:
         self.news.insert_many(news_list)
         return len(news_list)
     
+    def save_news_batch(self, news_data: Dict[str, List[dict]]) -> int:
+        """批量替换新闻：先一次性删除涉及股票的旧新闻，再一次性插入"""
+        news_data = {code: news for code, news in news_data.items() if news}
+        if not news_data:
+            return 0
+        
+        # 无序 bulk_write 不保证删除先于插入，因此拆成两次请求
+        self.news.bulk_write(
+            [DeleteMany({'stock_code': code}) for code in news_data],
+            ordered=False
+        )
+        
+        saved_at = datetime.now()
+        documents = [
+            {**n, 'stock_code': code, 'saved_at': saved_at}
+            for code, news_list in news_data.items()
+            for n in news_list
+        ]
+        self.news.insert_many(documents, ordered=False)
+        return len(documents)
+    
     def load_news(self, code: str, limit: int = 50) -> List[dict]:
         cursor = self.news.find(
-            {'stock_code': code}
+            {'stock_code': code}, {'_id': 0, 'saved_at': 0, 'stock_code': 0}
         ).sort('publish_date', -1).limit(limit)
         
-        results = []
-        for doc in cursor:
-            doc.pop('_id', None)
-            doc.pop('saved_at', None)
-            doc.pop('stock_code', None)
-            results.append(doc)
-        return results
+        return list(cursor)
     
     def save_stock_score(self, score: dict) -> str:
         score['saved_at'] = datetime.now()
@@ -147,15 +586,28 @@ class MongoDBStorage:
         )
         return score['code']
     
+    def save_scores_batch(self, scores) -> int:
+        """批量保存评分，scores 可以是评分 DataFrame 或 dict 列表"""
+        records = scores.to_dict('records') if isinstance(scores, pd.DataFrame) else list(scores)
+        saved_at = datetime.now()
+        operations = [
+            UpdateOne({'code': score['code']}, {'$set': {**score, 'saved_at': saved_at}}, upsert=True)
+            for score in records if score.get('code')
+        ]
+        
+        if operations:
+            self.scores.bulk_write(operations, ordered=False)
+        return len(operations)
+    
     def load_latest_scores(self, limit: int = 10) -> List[dict]:
-        cursor = self.scores.find().sort('total_score', -1).limit(limit)
+        cursor = self.scores.find({}, {'_id': 0, 'saved_at': 0}).sort('total_score', -1).limit(limit)
         
-        results = []
-        for doc in cursor:
-            doc.pop('_id', None)
-            doc.pop('saved_at', None)
-            results.append(doc)
-        return results
+        return list(cursor)
+    
+    def load_scores(self, codes: List[str] = None) -> Dict[str, dict]:
+        """按代码加载已保存的评分记录（含输入指纹），用于增量评分"""
+        query = {'code': {'$in': list(codes)}} if codes is not None else {}
+        return {doc['code']: doc for doc in self.scores.find(query, {'_id': 0, 'saved_at': 0})}
     
     def save_portfolio(self, portfolio: dict) -> str:
         portfolio['updated_at'] = datetime.now()
@@ -172,13 +624,11 @@ class MongoDBStorage:
         return portfolio['name']
     
     def load_portfolios(self) -> List[dict]:
-        cursor = self.portfolios.find()
-        
-        results = []
-        for doc in cursor:
-            doc.pop('_id', None)
-            results.append(doc)
-        return results
+        return list(self.portfolios.find({}, {'_id': 0}))
+    
+    def delete_portfolio(self, portfolio_id: str) -> int:
+        result = self.portfolios.delete_one({'$or': [{'id': portfolio_id}, {'name': portfolio_id}]})
+        return result.deleted_count
     
     def save_backtest_result(self, result: dict) -> str:
         result['saved_at'] = datetime.now()
@@ -194,10 +644,7 @@ class MongoDBStorage:
         if portfolio_id:
             query['portfolio_id'] = portfolio_id
             
-        cursor = self.backtest_results.find(query).sort('saved_at', -1)
-        
-        results = []
-        for doc in cursor:
-            doc.pop('_id', None)
-            results.append(doc)
-        return results
+        return list(self.backtest_results.find(query, {'_id': 0}).sort('saved_at', -1))
+    
+    def load_backtest_result(self, backtest_id: str) -> Optional[dict]:
+        return self.backtest_results.find_one({'id': backtest_id}, {'_id': 0})
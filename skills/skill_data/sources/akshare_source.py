@@ -17,8 +17,9 @@ PRICE_COLUMN_MAP = {
 }
 
 
-def fetch_price(code: str, start_date: str, end_date: str, timeout: int = 10) -> Optional[pd.DataFrame]:
-    """获取单只股票历史行情（前复权），超时视为失败以便上层走兜底数据源"""
+def fetch_price(code: str, start_date: str, end_date: str, timeout: int = 10,
+                adjust: str = "qfq") -> Optional[pd.DataFrame]:
+    """获取单只股票历史行情（默认前复权，adjust="" 为不复权），超时视为失败以便上层走兜底数据源"""
     import akshare as ak
 
     if not (code.endswith(".SH") or code.endswith(".SZ")):
@@ -26,7 +27,7 @@ def fetch_price(code: str, start_date: str, end_date: str, timeout: int = 10) ->
     stock_code = code.split(".")[0]
 
     def fetch():
-        return ak.stock_zh_a_hist(symbol=stock_code, start_date=start_date, end_date=end_date, adjust="qfq")
+        return ak.stock_zh_a_hist(symbol=stock_code, start_date=start_date, end_date=end_date, adjust=adjust)
 
     with ThreadPoolExecutor(max_workers=1) as executor:
         future = executor.submit(fetch)
@@ -45,6 +46,70 @@ def fetch_price(code: str, start_date: str, end_date: str, timeout: int = 10) ->
     return df.sort_values('date')
 
 
+def fetch_adjust_factor(code: str) -> Optional[pd.DataFrame]:
+    """获取累计后复权因子（新浪），返回 (date, factor)，后复权价 = 不复权价 × factor"""
+    import akshare as ak
+
+    if not (code.endswith(".SH") or code.endswith(".SZ")):
+        return None
+    symbol = f"{code[-2:].lower()}{code.split('.')[0]}"
+
+    df = ak.stock_zh_a_daily(symbol=symbol, adjust="hfq-factor")
+    if df is None or df.empty:
+        return None
+
+    return pd.DataFrame({
+        'date': pd.to_datetime(df['date']),
+        'factor': pd.to_numeric(df['hfq_factor'], errors='coerce'),
+    }).dropna().sort_values('date')
+
+
+def fetch_trade_dates() -> Optional[pd.Series]:
+    """获取沪深交易日历（新浪，通常包含到当年年底）"""
+    import akshare as ak
+
+    df = ak.tool_trade_date_hist_sina()
+    if df is None or df.empty:
+        return None
+    return pd.to_datetime(df['trade_date']).sort_values().reset_index(drop=True)
+
+
+_EXCHANGE_SUFFIX = {'上海证券交易所': 'SH', '深圳证券交易所': 'SZ'}
+
+
+def fetch_index_constituents(index_code: str) -> Optional[pd.DataFrame]:
+    """获取中证系列指数最新成分股（中证指数官网），返回 code / date（成分表日期）"""
+    import akshare as ak
+
+    df = ak.index_stock_cons_csindex(symbol=index_code.split(".")[0])
+    if df is None or df.empty:
+        return None
+    codes = df['成分券代码'].astype(str).str.zfill(6)
+    suffix = df['交易所'].map(_EXCHANGE_SUFFIX)
+    suffix = suffix.fillna(codes.str[0].map(lambda head: 'SH' if head == '6' else 'SZ'))
+    return pd.DataFrame({
+        'code': codes + '.' + suffix,
+        'date': pd.to_datetime(df['日期']),
+    })
+
+
+def fetch_industry_map() -> dict:
+    """获取全市场股票所属申万一级行业（行业代码前两位），取每只股票最近一次归属"""
+    import akshare as ak
+
+    df = ak.stock_industry_clf_hist_sw()
+    if df is None or df.empty:
+        return {}
+    df = df.sort_values('start_date').drop_duplicates('symbol', keep='last')
+    mapping = {}
+    for symbol, industry_code in zip(df['symbol'].astype(str).str.zfill(6), df['industry_code'].astype(str)):
+        if symbol.startswith('6'):
+            mapping[f"{symbol}.SH"] = f"SW{industry_code[:2]}"
+        elif symbol.startswith('0') or symbol.startswith('3'):
+            mapping[f"{symbol}.SZ"] = f"SW{industry_code[:2]}"
+    return mapping
+
+
 def fetch_spot_map() -> dict:
     """获取全市场实时行情快照，用于提取 PE/PB/市值"""
     import akshare as ak
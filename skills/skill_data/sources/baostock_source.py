@@ -23,6 +23,18 @@ def _to_baostock_code(code: str) -> Optional[str]:
     return None
 
 
+# 复权方式到 baostock adjustflag：1 后复权 / 2 前复权 / 3 不复权
+_ADJUST_FLAGS = {"hfq": "1", "qfq": "2", "": "3"}
+
+
+# 指数代码到 baostock 成分股查询接口
+_INDEX_QUERIES = {
+    "000300.SH": "query_hs300_stocks",
+    "000905.SH": "query_zz500_stocks",
+    "000016.SH": "query_sz50_stocks",
+}
+
+
 def _to_dashed_date(yyyymmdd: str) -> str:
     """akshare 风格的 YYYYMMDD 转换为 baostock 要求的 YYYY-MM-DD"""
     return datetime.strptime(yyyymmdd, "%Y%m%d").strftime("%Y-%m-%d")
@@ -43,8 +55,9 @@ class BaostockSession:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self._bs.logout()
 
-    def fetch_price(self, code: str, start_date: str, end_date: str) -> Optional[pd.DataFrame]:
-        """获取单只股票历史行情（前复权）"""
+    def fetch_price(self, code: str, start_date: str, end_date: str,
+                    adjust: str = "qfq") -> Optional[pd.DataFrame]:
+        """获取单只股票历史行情（默认前复权，adjust="" 为不复权）"""
         bs_code = _to_baostock_code(code)
         if bs_code is None:
             return None
@@ -52,7 +65,7 @@ class BaostockSession:
         rs = self._bs.query_history_k_data_plus(
             bs_code, "date,open,high,low,close,volume,amount,turn,pctChg",
             start_date=_to_dashed_date(start_date), end_date=_to_dashed_date(end_date),
-            frequency="d", adjustflag="2",
+            frequency="d", adjustflag=_ADJUST_FLAGS.get(adjust, "2"),
         )
         if rs.error_code != '0':
             logger.error(f"baostock 获取 {code} 数据失败: {rs.error_msg}")
@@ -74,6 +87,85 @@ class BaostockSession:
         df['amplitude'] = (df['high'] - df['low']) / df['close'].shift(1) * 100
         return df.sort_values('date')
 
+    def fetch_adjust_factor(self, code: str) -> Optional[pd.DataFrame]:
+        """获取累计后复权因子（backAdjustFactor），返回 (date, factor)"""
+        bs_code = _to_baostock_code(code)
+        if bs_code is None:
+            return None
+
+        rs = self._bs.query_adjust_factor(
+            code=bs_code, start_date="1990-01-01", end_date=datetime.now().strftime("%Y-%m-%d")
+        )
+        if rs.error_code != '0':
+            logger.error(f"baostock 获取 {code} 复权因子失败: {rs.error_msg}")
+            return None
+
+        rows = []
+        while rs.next():
+            rows.append(rs.get_row_data())
+        if not rows:
+            return None
+
+        df = pd.DataFrame(rows, columns=rs.fields)
+        return pd.DataFrame({
+            'date': pd.to_datetime(df['dividOperateDate']),
+            'factor': pd.to_numeric(df['backAdjustFactor'], errors='coerce'),
+        }).dropna().sort_values('date')
+
+    def fetch_trade_dates(self, start_date: str = "1990-12-19") -> Optional[pd.Series]:
+        """获取交易日历，截至当年年底"""
+        rs = self._bs.query_trade_dates(start_date=start_date, end_date=f"{datetime.now().year}-12-31")
+        if rs.error_code != '0':
+            logger.error(f"baostock 获取交易日历失败: {rs.error_msg}")
+            return None
+
+        dates = []
+        while rs.next():
+            calendar_date, is_trading_day = rs.get_row_data()[:2]
+            if is_trading_day == '1':
+                dates.append(calendar_date)
+        if not dates:
+            return None
+        return pd.Series(pd.to_datetime(dates))
+
+    def fetch_index_constituents(self, index_code: str, date: str = "") -> Optional[pd.DataFrame]:
+        """获取指数成分股（仅沪深300/中证500/上证50），date 为 YYYY-MM-DD 时取当日的历史成分"""
+        query = _INDEX_QUERIES.get(index_code)
+        if query is None:
+            return None
+
+        rs = getattr(self._bs, query)(date=date)
+        if rs.error_code != '0':
+            logger.error(f"baostock 获取 {index_code} 成分股失败: {rs.error_msg}")
+            return None
+
+        rows = []
+        while rs.next():
+            update_date, bs_code = rs.get_row_data()[:2]
+            market, num = bs_code.split('.')
+            rows.append((f"{num}.{market.upper()}", update_date))
+        if not rows:
+            return None
+        df = pd.DataFrame(rows, columns=['code', 'date'])
+        df['date'] = pd.to_datetime(df['date'])
+        return df
+
+    def fetch_industry_map(self) -> dict:
+        """获取全市场股票所属行业（证监会行业分类）"""
+        rs = self._bs.query_stock_industry()
+        if rs.error_code != '0':
+            logger.error(f"baostock 获取行业分类失败: {rs.error_msg}")
+            return {}
+
+        mapping = {}
+        while rs.next():
+            _update_date, bs_code, _code_name, industry = rs.get_row_data()[:4]
+            if not industry:
+                continue
+            market, num = bs_code.split('.')
+            mapping[f"{num}.{market.upper()}"] = repair_mojibake_text(industry)
+        return mapping
+
     def fetch_financial(self, code: str) -> Optional[dict]:
         """获取财务指标：仅 PE/PB 取自最新交易日估值字段，ROE/营收等 baostock 无稳定接口，留空"""
         bs_code = _to_baostock_code(code)
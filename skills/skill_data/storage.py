@@ -1,39 +1,243 @@
 import json
+import math
 import os
+import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional
 import pandas as pd
 import loguru
 
+from .adjust import apply_adjustment, normalize_factors
+
+
+# 每个 row group 约半年交易日，按日期排序后 min/max 统计可用于裁剪读取
+PRICE_ROW_GROUP_SIZE = 120
+
+
+def _to_timestamp(value) -> Optional[pd.Timestamp]:
+    """兼容 YYYYMMDD / YYYY-MM-DD / datetime 的日期参数"""
+    if value is None or value == '':
+        return None
+    return pd.Timestamp(value)
+
+
+def _as_float(value) -> Optional[float]:
+    """写入 SQLite 数值列前的转换，无法转换或 NaN 时为 NULL"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def _dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _read_json(file_path: Path):
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _date_filters(start=None, end=None) -> Optional[list]:
+    """把起止日期转换为 parquet 谓词下推条件"""
+    filters = []
+    start, end = _to_timestamp(start), _to_timestamp(end)
+    if start is not None:
+        filters.append(('date', '>=', start))
+    if end is not None:
+        filters.append(('date', '<=', end))
+    return filters or None
+
 
 class DataStorage:
-    """数据存储管理器"""
+    """数据存储管理器
+    
+    config:
+        arrow_hot_cache: 为每只股票额外维护一份未压缩的 Arrow IPC 文件（合并去重后的全部历史），
+            load_price_data / load_all_price_data 读取时 mmap 打开，
+            多个 worker 进程通过 OS page cache 共享同一份页面
+        arrow_zero_copy: 热数据读取不复制，数值/日期列直接引用只读的 mmap 页面，
+            对返回结果原地修改（df.loc[...] = ... / fillna(inplace=True)）会报错，调用方需自行 copy()
+    """
     
-    def __init__(self, data_dir: str = "data"):
+    def __init__(self, data_dir: str = "data", config: dict = None):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.config = config or {}
         self.logger = loguru.logger
         
         self.price_dir = self.data_dir / "prices"
-        self.financial_dir = self.data_dir / "financial"
-        self.news_dir = self.data_dir / "news"
-        self.scores_dir = self.data_dir / "scores"
+        self.hot_price_dir = self.data_dir / "prices_hot"
+        # 财务、新闻、评分合并存放在一个 SQLite 库中
+        self.db_path = self.data_dir / "store.sqlite"
+
+        self.arrow_hot_cache = bool(self.config.get('arrow_hot_cache', False))
+        self.arrow_zero_copy = bool(self.config.get('arrow_zero_copy', False))
 
-        for d in [self.price_dir, self.financial_dir, self.news_dir, self.scores_dir]:
+        dirs = [self.price_dir]
+        if self.arrow_hot_cache:
+            dirs.append(self.hot_price_dir)
+        for d in dirs:
             d.mkdir(parents=True, exist_ok=True)
+
+        self._init_store()
     
     def save_price_data(self, code: str, df: pd.DataFrame) -> str:
-        """保存行情数据"""
+        """保存行情数据（按日期排序写入，row group 带 min/max 统计）"""
+        file_path = self._write_price_snapshot(code, df)
+        self.logger.info(f"保存 {code} 行情数据到 {file_path}")
+        return file_path
+    
+    def save_price_batch(self, price_data: Dict[str, pd.DataFrame]) -> int:
+        """批量保存行情数据，每只股票一个列式快照分区"""
+        count = 0
+        for code, df in price_data.items():
+            if df is None or df.empty:
+                continue
+            self._write_price_snapshot(code, df)
+            count += 1
+        self.logger.info(f"批量保存 {count} 只股票行情数据")
+        return count
+    
+    def _write_price_snapshot(self, code: str, df: pd.DataFrame) -> str:
         file_path = self.price_dir / f"{code}_{datetime.now().strftime('%Y%m%d')}.parquet"
         
-        df.to_parquet(file_path, index=False)
-        self.logger.info(f"保存 {code} 行情数据到 {file_path}")
+        if 'date' in df.columns:
+            df = df.sort_values('date')
+        self._write_parquet(df, file_path)
+        
+        if self.arrow_hot_cache:
+            self._write_hot_price(code, self._merged_history(code, df, file_path), file_path, df)
         
         return str(file_path)
     
-    def load_price_data(self, code: str, date: str = None) -> Optional[pd.DataFrame]:
-        """加载行情数据"""
+    def _write_parquet(self, df: pd.DataFrame, file_path: Path):
+        df.to_parquet(
+            file_path, index=False, engine='pyarrow',
+            row_group_size=PRICE_ROW_GROUP_SIZE, write_statistics=True
+        )
+    
+    def _hot_price_path(self, code: str) -> Path:
+        return self.hot_price_dir / f"{code}.arrow"
+    
+    def _merged_history(self, code: str, df: pd.DataFrame, snapshot: Path) -> pd.DataFrame:
+        """新快照与该股票其余快照合并去重后的全部历史；热数据覆盖其余快照时直接在其上追加"""
+        if 'date' not in df.columns:
+            return df
+        others = [f for f in sorted(self.price_dir.glob(f"{code}_*.parquet")) if f != snapshot]
+        if not others:
+            return df
+        
+        table = self._open_hot_price(code, others, others[-1])
+        if table is not None:
+            frames = [table.to_pandas()]
+        else:
+            frames = [self._read_price_file(f) for f in others]
+        frames = [frame for frame in frames if not frame.empty]
+        merged = pd.concat([*frames, df], ignore_index=True)
+        return merged.sort_values('date', kind='mergesort').drop_duplicates(
+            subset=['date'], keep='last'
+        ).reset_index(drop=True)
+    
+    def _write_hot_price(self, code: str, history: pd.DataFrame, snapshot: Path, snapshot_df: pd.DataFrame):
+        """写入未压缩 Arrow IPC 文件，内容为合并去重后的全部历史（即 load_all_price_data 的结果）
+
+        schema 元数据记录最新快照的文件名、列和它在历史中的连续行区间，load_price_data 据此切片；
+        快照含重复日期等无法对应到连续区间时不记录，按快照读取回退到 parquet。
+        先写临时文件再原子替换，已 mmap 的读者不受影响
+        """
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        
+        metadata = {b'snapshot': snapshot.name.encode(),
+                    b'snapshot_columns': _dumps(list(snapshot_df.columns)).encode()}
+        if 'date' not in history.columns:
+            metadata[b'snapshot_rows'] = f"0,{len(history)}".encode()
+        elif not snapshot_df.empty:
+            dates = pd.Index(history['date'])
+            lo = int(dates.searchsorted(snapshot_df['date'].iloc[0], 'left'))
+            hi = int(dates.searchsorted(snapshot_df['date'].iloc[-1], 'right'))
+            if hi - lo == len(snapshot_df) and snapshot_df['date'].is_unique:
+                metadata[b'snapshot_rows'] = f"{lo},{hi}".encode()
+        
+        file_path = self._hot_price_path(code)
+        tmp_path = file_path.with_suffix('.arrow.tmp')
+        table = pa.Table.from_pandas(history, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+        feather.write_feather(table, str(tmp_path), compression='uncompressed')
+        os.replace(tmp_path, file_path)
+    
+    def _open_hot_price(self, code: str, files: List[Path], latest: Path):
+        """mmap 打开热数据表；不是由 latest 快照生成，或比任一 parquet 快照旧
+        （例如其他进程关闭了热缓存写入）时放弃"""
+        import pyarrow as pa
+        
+        file_path = self._hot_price_path(code)
+        if not file_path.exists():
+            return None
+        mtime = file_path.stat().st_mtime
+        if any(f.stat().st_mtime > mtime for f in files):
+            return None
+        
+        with pa.memory_map(str(file_path), 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+        if (table.schema.metadata or {}).get(b'snapshot') != latest.name.encode():
+            return None
+        return table
+    
+    def _hot_frame(self, table, start=None, end=None, columns: List[str] = None) -> pd.DataFrame:
+        """热数据表按日期二分切片、列投影后转为 DataFrame
+
+        文件按日期有序写入，slice 不复制数据。默认转换时复制，返回的 DataFrame 可原地修改；
+        arrow_zero_copy 开启时，无缺失值的数值/日期列以 to_numpy(zero_copy_only=True)
+        直接引用 mmap 页面（只读），其余列才转换复制
+        """
+        import pyarrow as pa
+        
+        if (start or end) and 'date' in table.column_names and table.num_rows:
+            dates = table.column('date').to_numpy()
+            lo = dates.searchsorted(_to_timestamp(start).to_datetime64(), 'left') if start else 0
+            hi = dates.searchsorted(_to_timestamp(end).to_datetime64(), 'right') if end else len(dates)
+            table = table.slice(lo, max(hi - lo, 0))
+        if columns is not None:
+            table = table.select([c for c in columns if c in table.column_names])
+        if not self.arrow_zero_copy:
+            return table.to_pandas()
+        
+        data = {}
+        for name, column in zip(table.column_names, table.columns):
+            kind = column.type
+            if column.num_chunks == 1 and column.null_count == 0 and (
+                    pa.types.is_integer(kind) or pa.types.is_floating(kind) or pa.types.is_timestamp(kind)):
+                data[name] = column.chunk(0).to_numpy(zero_copy_only=True)
+            else:
+                data[name] = column.to_pandas()
+        return pd.DataFrame(data, columns=table.column_names, copy=False)
+    
+    def _read_price_file(self, file_path: Path, start=None, end=None,
+                         columns: List[str] = None) -> pd.DataFrame:
+        """读取单个行情文件，日期条件和列投影下推到 parquet"""
+        return pd.read_parquet(
+            file_path, engine='pyarrow',
+            columns=columns, filters=_date_filters(start, end)
+        )
+    
+    def load_price_data(self, code: str, date: str = None,
+                        start: str = None, end: str = None,
+                        columns: List[str] = None) -> Optional[pd.DataFrame]:
+        """加载行情数据（arrow_zero_copy 开启且命中热数据时，返回的数值列为只读）
+
+        Args:
+            date: 指定快照日期 (YYYYMMDD)，默认取最新快照
+            start/end: 行情日期范围，只读取命中的 row group
+            columns: 只读取指定列
+        """
         if date:
             file_path = self.price_dir / f"{code}_{date}.parquet"
         else:
@@ -41,74 +245,224 @@ class DataStorage:
             if not files:
                 return None
             file_path = max(files, key=lambda x: x.stat().st_mtime)
+            
+            table = self._open_hot_price(code, files, file_path) if self.arrow_hot_cache else None
+            rows = table.schema.metadata.get(b'snapshot_rows') if table is not None else None
+            if rows:
+                lo, hi = map(int, rows.split(b','))
+                snapshot_columns = json.loads(table.schema.metadata[b'snapshot_columns'])
+                table = table.slice(lo, hi - lo).select(snapshot_columns)
+                return self._hot_frame(table, start, end, columns)
         
         if file_path.exists():
-            return pd.read_parquet(file_path)
+            return self._read_price_file(file_path, start, end, columns)
         return None
     
-    def load_all_price_data(self, code: str) -> pd.DataFrame:
-        """加载所有历史行情数据"""
-        files = list(self.price_dir.glob(f"{code}_*.parquet"))
+    def load_all_price_data(self, code: str, start: str = None, end: str = None,
+                            columns: List[str] = None) -> pd.DataFrame:
+        """加载所有历史行情数据（开启热缓存时直接 mmap 读取合并好的历史）"""
+        files = sorted(self.price_dir.glob(f"{code}_*.parquet"))
         
         if not files:
             return pd.DataFrame()
         
+        if self.arrow_hot_cache:
+            table = self._open_hot_price(code, files, files[-1])
+            if table is not None:
+                return self._hot_frame(table, start, end, columns)
+        
+        # 去重排序依赖 date 列，投影时临时带上
+        read_columns = None
+        if columns is not None:
+            read_columns = list(columns) if 'date' in columns else ['date', *columns]
+        
         dfs = []
-        for f in sorted(files):
-            df = pd.read_parquet(f)
-            dfs.append(df)
+        for f in files:
+            df = self._read_price_file(f, start, end, read_columns)
+            if not df.empty:
+                dfs.append(df)
         
         if dfs:
             result = pd.concat(dfs, ignore_index=True)
-            return result.sort_values('date').drop_duplicates(subset=['date'])
+            result = result.sort_values('date', kind='mergesort').drop_duplicates(subset=['date'], keep='last')
+            if columns is not None and 'date' not in columns:
+                result = result[list(columns)]
+            return result.reset_index(drop=True)
         return pd.DataFrame()
     
+    def save_adjust_factors(self, factors: Dict[str, pd.DataFrame]) -> int:
+        """保存累计后复权因子（按股票整体替换），除权除息只需更新这里，不必重写行情"""
+        rows = []
+        for code, df in factors.items():
+            df = normalize_factors(df)
+            rows.extend(zip([code] * len(df), df['date'].dt.strftime('%Y-%m-%d'), df['factor']))
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM adjust_factors WHERE code = ?", [(code,) for code in factors])
+            conn.executemany("INSERT INTO adjust_factors (code, date, factor) VALUES (?, ?, ?)", rows)
+        
+        self.logger.info(f"保存 {len(factors)} 只股票复权因子 {len(rows)} 条")
+        return len(rows)
+    
+    def load_adjust_factors(self, code: str) -> pd.DataFrame:
+        """加载累计后复权因子 (date, factor)"""
+        with self._connect() as conn:
+            df = pd.read_sql_query(
+                "SELECT date, factor FROM adjust_factors WHERE code = ? ORDER BY date", conn, params=(code,)
+            )
+        df['date'] = pd.to_datetime(df['date'])
+        return df
+    
+    def load_adjusted_price_data(self, code: str, mode: str = 'qfq', start: str = None,
+                                 end: str = None, columns: List[str] = None) -> pd.DataFrame:
+        """读取不复权历史行情并按复权因子换算（qfq / hfq）"""
+        read_columns = None
+        if columns is not None:
+            read_columns = list(columns) if 'date' in columns else ['date', *columns]
+        df = apply_adjustment(
+            self.load_all_price_data(code, start, end, read_columns), self.load_adjust_factors(code), mode
+        )
+        if columns is not None and 'date' not in columns and not df.empty:
+            df = df[list(columns)]
+        return df
+    
+    def price_snapshots(self) -> Dict[str, List[Path]]:
+        """每只股票的行情快照文件，按快照日期升序"""
+        snapshots = {}
+        for f in sorted(self.price_dir.glob("*.parquet")):
+            snapshots.setdefault(f.stem.rsplit('_', 1)[0], []).append(f)
+        return snapshots
+    
+    def compaction_candidates(self, codes: List[str] = None) -> Dict[str, List[Path]]:
+        """可合并的股票及其快照：至少两个快照，且保存过复权因子（price_mode: raw 的不复权行情）
+
+        前复权快照各自以抓取当时的最新价为基准，不同快照拼接会在接缝处出现跳变，不参与合并
+        """
+        with self._connect() as conn:
+            raw_codes = {row[0] for row in conn.execute("SELECT DISTINCT code FROM adjust_factors")}
+        return {
+            code: files for code, files in self.price_snapshots().items()
+            if len(files) > 1 and code in raw_codes and (codes is None or code in codes)
+        }
+    
+    def compact_prices(self, codes: List[str] = None) -> dict:
+        """把不复权股票的多个日快照合并为一个分区并去除重复 K 线（范围见 compaction_candidates）
+
+        合并结果沿用最新快照的文件名（先写临时文件再原子替换），旧快照随后删除。
+        load_all_price_data 的结果不变；load_price_data 不指定 date 时返回合并后的全部历史
+        （此前只是最新快照），按 date 读取被删除的旧快照返回 None。
+        所有快照都为空的股票跳过
+        """
+        stats = {'codes': 0, 'files_removed': 0, 'rows_removed': 0}
+        for code, files in self.compaction_candidates(codes).items():
+            frames = [self._read_price_file(f) for f in files]
+            non_empty = [df for df in frames if not df.empty]
+            if not non_empty:
+                self.logger.warning(f"{code} 的 {len(files)} 个行情快照均为空，跳过合并")
+                continue
+            merged = pd.concat(non_empty, ignore_index=True)
+            if 'date' in merged.columns:
+                merged = merged.sort_values('date', kind='mergesort').drop_duplicates(
+                    subset=['date'], keep='last'
+                ).reset_index(drop=True)
+            
+            target = files[-1]
+            tmp_path = target.with_suffix('.parquet.tmp')
+            self._write_parquet(merged, tmp_path)
+            os.replace(tmp_path, target)
+            for f in files[:-1]:
+                f.unlink()
+            if self.arrow_hot_cache:
+                self._write_hot_price(code, merged, target, merged)
+            
+            stats['codes'] += 1
+            stats['files_removed'] += len(files) - 1
+            stats['rows_removed'] += sum(len(df) for df in frames) - len(merged)
+        
+        self.logger.info(
+            f"行情快照合并: {stats['codes']} 只股票，删除 {stats['files_removed']} 个文件、"
+            f"{stats['rows_removed']} 条重复 K 线"
+        )
+        return stats
+    
+    def prune_news(self, before: datetime) -> int:
+        """删除保存时间早于 before 的新闻"""
+        with self._connect() as conn:
+            deleted = conn.execute(
+                "DELETE FROM news WHERE saved_at < ?", (before.isoformat(),)
+            ).rowcount
+        self.logger.info(f"清理 {deleted} 条过期新闻")
+        return deleted
+    
+    def vacuum(self):
+        """回收 SQLite 空闲页并截断 WAL"""
+        with self._connect() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+    
     def save_financial_data(self, code: str, data: dict) -> str:
         """保存财务数据"""
-        file_path = self.financial_dir / f"{code}_financial.json"
-        
         data['saved_at'] = datetime.now().isoformat()
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with self._connect() as conn:
+            conn.execute(self._FINANCIAL_UPSERT, self._financial_row(code, data))
         
         self.logger.info(f"保存 {code} 财务数据")
-        return str(file_path)
+        return str(self.db_path)
+    
+    def save_financial_batch(self, financial_data: Dict[str, dict]) -> int:
+        """批量保存财务数据，单个事务写入"""
+        saved_at = datetime.now().isoformat()
+        rows = [
+            self._financial_row(code, {**data, 'saved_at': saved_at})
+            for code, data in financial_data.items()
+        ]
+        with self._connect() as conn:
+            conn.executemany(self._FINANCIAL_UPSERT, rows)
+        
+        self.logger.info(f"批量保存 {len(rows)} 只股票财务数据")
+        return len(rows)
     
     def load_financial_data(self, code: str) -> Optional[dict]:
         """加载财务数据"""
-        file_path = self.financial_dir / f"{code}_financial.json"
-        
-        if file_path.exists():
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return None
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload FROM financials WHERE code = ?", (code,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
     
     def save_news(self, code: str, news_list: List[dict]) -> str:
         """保存新闻数据"""
-        file_path = self.news_dir / f"{code}_news.json"
-        
-        data = {
-            'code': code,
-            'news': news_list,
-            'saved_at': datetime.now().isoformat()
-        }
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        self.save_news_batch({code: news_list}, log=False)
         
         self.logger.info(f"保存 {code} {len(news_list)} 条新闻")
-        return str(file_path)
+        return str(self.db_path)
     
-    def load_news(self, code: str) -> List[dict]:
-        """加载新闻数据"""
-        file_path = self.news_dir / f"{code}_news.json"
+    def save_news_batch(self, news_data: Dict[str, List[dict]], log: bool = True) -> int:
+        """批量保存新闻数据（按股票整体替换），返回新闻总条数"""
+        saved_at = datetime.now().isoformat()
+        rows = [
+            (code, str(n.get('datetime', '')), n.get('title'),
+             _as_float(n.get('sentiment_score')), saved_at, _dumps(n))
+            for code, news_list in news_data.items()
+            for n in news_list
+        ]
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM news WHERE code = ?", [(code,) for code in news_data])
+            conn.executemany(
+                "INSERT INTO news (code, datetime, title, sentiment_score, saved_at, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
         
-        if file_path.exists():
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('news', [])
-        return []
+        if log:
+            self.logger.info(f"批量保存 {len(news_data)} 只股票 {len(rows)} 条新闻")
+        return len(rows)
+    
+    def load_news(self, code: str) -> List[dict]:
+        """加载新闻数据（保持写入顺序）"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT payload FROM news WHERE code = ? ORDER BY id", (code,)
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
     
     def get_latest_data_date(self, code: str) -> Optional[str]:
         """获取最新数据日期"""
@@ -156,33 +510,175 @@ class DataStorage:
         if not code:
             return None
 
-        file_path = self.scores_dir / f"{code}_score.json"
-
         score['saved_at'] = datetime.now().isoformat()
-
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(score, f, ensure_ascii=False, indent=2, default=str)
+        with self._connect() as conn:
+            conn.execute(self._SCORE_UPSERT, self._score_row(score))
 
         self.logger.info(f"保存 {code} 评分数据")
-        return str(file_path)
+        return str(self.db_path)
+
+    def save_scores_batch(self, scores) -> int:
+        """批量保存评分，scores 可以是评分 DataFrame 或 dict 列表"""
+        records = scores.to_dict('records') if isinstance(scores, pd.DataFrame) else list(scores)
+        saved_at = datetime.now().isoformat()
+
+        rows = [
+            self._score_row({**score, 'saved_at': saved_at})
+            for score in records if score.get('code')
+        ]
+        with self._connect() as conn:
+            conn.executemany(self._SCORE_UPSERT, rows)
+
+        self.logger.info(f"批量保存 {len(rows)} 条评分数据")
+        return len(rows)
 
     def load_latest_scores(self, limit: int = 10) -> List[dict]:
-        """加载最新的评分数据"""
-        files = list(self.scores_dir.glob("*_score.json"))
+        """加载最新的评分数据，按 total_score 索引倒序只读取前 limit 行"""
+        sql = "SELECT payload FROM scores ORDER BY total_score DESC"
+        params = ()
+        if limit:
+            sql += " LIMIT ?"
+            params = (limit,)
 
-        if not files:
-            return []
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def load_scores(self, codes: List[str] = None) -> Dict[str, dict]:
+        """按代码加载已保存的评分记录（含输入指纹），用于增量评分"""
+        with self._connect() as conn:
+            if codes is None:
+                rows = conn.execute("SELECT code, payload FROM scores").fetchall()
+            else:
+                codes = list(codes)
+                rows = []
+                for i in range(0, len(codes), 500):
+                    chunk = codes[i:i + 500]
+                    rows.extend(conn.execute(
+                        f"SELECT code, payload FROM scores WHERE code IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall())
+        return {code: json.loads(payload) for code, payload in rows}
+
+    # ------------------------------------------------------------------
+    # 财务 / 新闻 / 评分的合并存储（SQLite）
+    # ------------------------------------------------------------------
+
+    _FINANCIAL_COLUMNS = ('pe', 'pb', 'roe', 'revenue', 'profit', 'revenue_growth', 'market_cap')
+
+    _FINANCIAL_UPSERT = (
+        "INSERT OR REPLACE INTO financials "
+        "(code, pe, pb, roe, revenue, profit, revenue_growth, market_cap, saved_at, payload) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+
+    _SCORE_UPSERT = (
+        "INSERT OR REPLACE INTO scores (code, total_score, rank, saved_at, payload) "
+        "VALUES (?, ?, ?, ?, ?)"
+    )
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS financials (
+            code TEXT PRIMARY KEY,
+            pe REAL, pb REAL, roe REAL, revenue REAL, profit REAL,
+            revenue_growth REAL, market_cap REAL,
+            saved_at TEXT,
+            payload TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS news (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            code TEXT NOT NULL,
+            datetime TEXT,
+            title TEXT,
+            sentiment_score REAL,
+            saved_at TEXT,
+            payload TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_news_code ON news (code, id);
+        CREATE TABLE IF NOT EXISTS scores (
+            code TEXT PRIMARY KEY,
+            total_score REAL,
+            rank INTEGER,
+            saved_at TEXT,
+            payload TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_scores_total_score ON scores (total_score DESC);
+        CREATE TABLE IF NOT EXISTS adjust_factors (
+            code TEXT NOT NULL,
+            date TEXT NOT NULL,
+            factor REAL NOT NULL,
+            PRIMARY KEY (code, date)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    @contextmanager
+    def _connect(self):
+        """每次操作独立连接：WAL 模式下多进程读写互不阻塞"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_store(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self._SCHEMA)
+        self._import_legacy_json()
+
+    def _financial_row(self, code: str, data: dict) -> tuple:
+        return (
+            code,
+            *(_as_float(data.get(c)) for c in self._FINANCIAL_COLUMNS),
+            data.get('saved_at'),
+            _dumps(data),
+        )
+
+    def _score_row(self, score: dict) -> tuple:
+        rank = score.get('rank')
+        return (
+            score['code'],
+            _as_float(score.get('total_score')),
+            int(rank) if _as_float(rank) is not None else None,
+            score.get('saved_at'),
+            _dumps(score),
+        )
+
+    def _import_legacy_json(self):
+        """一次性导入旧版逐股 JSON 文件（文件保留不动）"""
+        with self._connect() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_json_imported'").fetchone():
+                return
 
-        scores = []
-        for file_path in files:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    score = json.load(f)
-                    scores.append(score)
-            except Exception as e:
-                self.logger.error(f"加载评分文件失败 {file_path}: {e}")
+        legacy_dir = {name: self.data_dir / name for name in ('financial', 'news', 'scores')}
+        financial, news, scores = {}, {}, []
+        for file_path in legacy_dir['financial'].glob("*_financial.json"):
+            data = _read_json(file_path)
+            if data is not None:
+                financial[file_path.name[:-len("_financial.json")]] = data
+        for file_path in legacy_dir['news'].glob("*_news.json"):
+            data = _read_json(file_path)
+            if data is not None:
+                news[data.get('code') or file_path.name[:-len("_news.json")]] = data.get('news', [])
+        for file_path in legacy_dir['scores'].glob("*_score.json"):
+            data = _read_json(file_path)
+            if data is not None and data.get('code'):
+                scores.append(data)
 
-        # 按总分排序
-        scores = sorted(scores, key=lambda x: x.get('total_score', 0), reverse=True)
+        with self._connect() as conn:
+            conn.executemany(self._FINANCIAL_UPSERT,
+                             [self._financial_row(code, data) for code, data in financial.items()])
+            conn.executemany(self._SCORE_UPSERT, [self._score_row(score) for score in scores])
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_json_imported', ?)",
+                         (datetime.now().isoformat(),))
+        if news:
+            self.save_news_batch(news, log=False)
 
-        return scores[:limit] if limit else scores
+        if financial or news or scores:
+            self.logger.info(
+                f"已导入旧版 JSON 数据: 财务 {len(financial)} / 新闻 {len(news)} / 评分 {len(scores)}"
+            )
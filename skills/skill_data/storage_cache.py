@@ -0,0 +1,185 @@
+"""存储读缓存：包在 DataStorage / MongoDBStorage 外面的按字节限额 LRU"""
+import copy
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+import pandas as pd
+import loguru
+
+
+_MISSING = object()
+
+
+def _estimate_size(value: Any) -> int:
+    """估算缓存值占用的字节数"""
+    if value is None:
+        return 0
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 1024
+
+
+def _is_empty(value: Any) -> bool:
+    """None / 空表 / 空容器：数据可能稍后才写入，不缓存"""
+    if value is None:
+        return True
+    if isinstance(value, pd.DataFrame):
+        return value.empty
+    if isinstance(value, (dict, list, tuple)):
+        return not value
+    return False
+
+
+def _copy_value(value: Any) -> Any:
+    """返回副本，避免调用方原地修改污染缓存"""
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value
+
+
+class CachedStorage:
+    """读穿透缓存层
+
+    - 缓存 load_price_data / load_all_price_data / load_financial_data / load_news
+      以及复权因子和复权行情的读取结果
+    - None 和空结果不缓存（数据稍后写入时不会一直读到空）；参数不可哈希时直接读底层存储
+    - 总占用按字节限额，超出后按最近最少使用淘汰
+    - 同一进程内写入（含批量写入）某只股票时，该股票的全部缓存条目失效
+    - 其余方法和属性原样转发给底层存储
+    """
+
+    CACHED_METHODS = ('load_price_data', 'load_all_price_data', 'load_financial_data', 'load_news',
+                      'load_adjust_factors', 'load_adjusted_price_data')
+    WRITE_METHODS = ('save_price_data', 'save_financial_data', 'save_news')
+    BATCH_WRITE_METHODS = ('save_price_batch', 'save_financial_batch', 'save_news_batch',
+                           'save_adjust_factors')
+
+    def __init__(self, storage, max_bytes: int = 256 * 1024 * 1024):
+        self.storage = storage
+        self.max_bytes = max_bytes
+        self.logger = loguru.logger
+
+        self._entries: "OrderedDict[Tuple, Tuple[Any, int]]" = OrderedDict()
+        self._keys_by_code: Dict[str, set] = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.storage, name)
+        if name in self.CACHED_METHODS:
+            return self._cached_reader(name, attr)
+        if name in self.WRITE_METHODS:
+            return self._invalidating_writer(attr)
+        if name in self.BATCH_WRITE_METHODS:
+            return self._invalidating_batch_writer(attr)
+        return attr
+
+    def _cached_reader(self, name: str, method):
+        def reader(code, *args, **kwargs):
+            key = (name, code, tuple(repr(v) for v in args),
+                   tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                # code 本身不可哈希（如代码列表）：不走缓存
+                return method(code, *args, **kwargs)
+
+            value = self._get(key)
+            if value is not _MISSING:
+                return _copy_value(value)
+
+            value = method(code, *args, **kwargs)
+            if not _is_empty(value):
+                self._put(key, code, value)
+            return _copy_value(value)
+        return reader
+
+    def _invalidating_writer(self, method):
+        def writer(code: str, *args, **kwargs):
+            try:
+                return method(code, *args, **kwargs)
+            finally:
+                self.invalidate(code)
+        return writer
+
+    def _invalidating_batch_writer(self, method):
+        def writer(data_by_code: Dict[str, Any], *args, **kwargs):
+            try:
+                return method(data_by_code, *args, **kwargs)
+            finally:
+                for code in data_by_code:
+                    self.invalidate(code)
+        return writer
+
+    def _get(self, key: Tuple) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _put(self, key: Tuple, code: str, value: Any):
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size)
+            self._keys_by_code.setdefault(code, set()).add(key)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: Tuple):
+        _, size = self._entries.pop(key)
+        self.current_bytes -= size
+        code_keys = self._keys_by_code.get(key[1])
+        if code_keys is not None:
+            code_keys.discard(key)
+            if not code_keys:
+                self._keys_by_code.pop(key[1], None)
+
+    def invalidate(self, code: str):
+        """使某只股票的全部缓存失效"""
+        with self._lock:
+            for key in list(self._keys_by_code.get(code, ())):
+                self._remove(key)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_code.clear()
+            self.current_bytes = 0
+
+    def cache_stats(self) -> dict:
+        """缓存统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 4) if total else 0,
+            }
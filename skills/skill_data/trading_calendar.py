@@ -0,0 +1,176 @@
+"""交易日历：从 akshare / baostock 获取沪深交易日并缓存到本地，按自然日序号 O(1) 查询"""
+from datetime import date, datetime, time as dt_time, timedelta
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import loguru
+
+from .sources import akshare_source
+from .sources import BaostockSession
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _to_day(value) -> date:
+    """datetime / Timestamp / 'YYYYMMDD' / 'YYYY-MM-DD' 统一为 date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+class TradingCalendar:
+    """沪深交易日历
+
+    交易日列表缓存在 data/calendar/trade_dates.parquet，缓存覆盖不到今天时才重新拉取
+    （新浪日历通常包含到当年年底）。加载后按自然日建立交易日标记和累计交易日数组，
+    任意日期换算成数组下标即可回答 "是否交易日"、"某日以来缺几根 K 线"、"对齐日期索引"。
+
+    config（config.yaml calendar 段）:
+        market_close: 收盘时间，之后当天 K 线视为已产生，默认 "15:30"
+        skip_non_trading_days: 非交易日跳过每日分析，默认 true（由 QuantEngine 读取）
+    """
+
+    def __init__(self, data_dir: str = "data", config: dict = None, dates=None):
+        self.config = config or {}
+        self.logger = loguru.logger
+        self.cache_path = Path(data_dir) / "calendar" / "trade_dates.parquet"
+        self.market_close = dt_time.fromisoformat(str(self.config.get('market_close', '15:30')))
+
+        self._dates = None
+        if dates is not None:
+            self._build(dates)
+
+    # ---------- 加载 ----------
+
+    def _ensure_loaded(self):
+        if self._dates is None:
+            self.load()
+
+    def load(self, refresh: bool = False) -> 'TradingCalendar':
+        """读取本地缓存，缓存缺失或已过期时从数据源重建"""
+        today = date.today()
+        dates = None
+        if not refresh and self.cache_path.exists():
+            dates = pd.read_parquet(self.cache_path)['date']
+            if dates.empty or dates.iloc[-1].date() < today:
+                dates = None
+
+        if dates is None:
+            fetched = self._fetch_trade_dates()
+            if fetched is not None and not fetched.empty:
+                dates = fetched
+                self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+                pd.DataFrame({'date': dates}).to_parquet(self.cache_path, engine='pyarrow', index=False)
+                self.logger.info(f"交易日历已更新: {len(dates)} 个交易日，截至 {dates.iloc[-1]:%Y-%m-%d}")
+            elif self.cache_path.exists():
+                self.logger.warning("交易日历更新失败，沿用本地缓存")
+                dates = pd.read_parquet(self.cache_path)['date']
+            else:
+                self.logger.warning("交易日历不可用，按工作日近似")
+                dates = pd.Series(pd.bdate_range('2005-01-01', f'{today.year}-12-31'))
+
+        self._build(dates)
+        return self
+
+    def _fetch_trade_dates(self) -> Optional[pd.Series]:
+        """akshare 优先，失败走 baostock"""
+        try:
+            dates = akshare_source.fetch_trade_dates()
+            if dates is not None and not dates.empty:
+                return dates
+        except Exception as e:
+            self.logger.error(f"akshare 获取交易日历失败: {e}")
+
+        try:
+            with BaostockSession() as session:
+                return session.fetch_trade_dates()
+        except Exception as e:
+            self.logger.error(f"baostock 获取交易日历失败: {e}")
+        return None
+
+    def _build(self, dates):
+        dates = pd.DatetimeIndex(pd.to_datetime(pd.Series(dates))).normalize().unique().sort_values()
+        self._dates = dates
+        self._origin = dates[0].date().toordinal()
+        days = dates[-1].date().toordinal() - self._origin + 1
+        flags = np.zeros(days, dtype=bool)
+        epoch_days = dates.values.astype('datetime64[D]').astype(np.int64)
+        flags[epoch_days + _EPOCH_ORDINAL - self._origin] = True
+        self._flags = flags
+        # _cum[i]: 截至第 i 个自然日（含）的交易日数
+        self._cum = np.cumsum(flags)
+
+    # ---------- 查询 ----------
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        self._ensure_loaded()
+        return self._dates
+
+    def _offset(self, day) -> int:
+        """自然日在数组中的下标，超出缓存范围时截断到两端"""
+        return min(max(_to_day(day).toordinal() - self._origin, -1), len(self._flags) - 1)
+
+    def _count_through(self, day) -> int:
+        """截至 day（含）的交易日数"""
+        offset = self._offset(day)
+        return int(self._cum[offset]) if offset >= 0 else 0
+
+    def is_trading_day(self, day=None) -> bool:
+        """day 默认今天"""
+        self._ensure_loaded()
+        day = _to_day(day if day is not None else date.today())
+        offset = day.toordinal() - self._origin
+        if 0 <= offset < len(self._flags):
+            return bool(self._flags[offset])
+        return day.weekday() < 5
+
+    def previous_trading_day(self, day=None, inclusive: bool = True) -> Optional[pd.Timestamp]:
+        """day 当天或之前最近的交易日"""
+        self._ensure_loaded()
+        day = _to_day(day if day is not None else date.today())
+        if not inclusive:
+            day -= timedelta(days=1)
+        count = self._count_through(day)
+        return self._dates[count - 1] if count else None
+
+    def next_trading_day(self, day=None, inclusive: bool = False) -> Optional[pd.Timestamp]:
+        """day 之后（inclusive 时含当天）最近的交易日"""
+        self._ensure_loaded()
+        day = _to_day(day if day is not None else date.today())
+        if inclusive:
+            day -= timedelta(days=1)
+        count = self._count_through(day)
+        return self._dates[count] if count < len(self._dates) else None
+
+    def latest_session(self, now: datetime = None) -> Optional[pd.Timestamp]:
+        """当前应已产生日 K 线的最近交易日：交易日收盘前取上一交易日"""
+        now = now or datetime.now()
+        if now.time() >= self.market_close:
+            return self.previous_trading_day(now)
+        return self.previous_trading_day(now, inclusive=False)
+
+    def trading_days_between(self, start, end) -> int:
+        """(start, end] 区间内的交易日数"""
+        self._ensure_loaded()
+        return max(self._count_through(end) - self._count_through(start), 0)
+
+    def missing_since(self, last_bar, now: datetime = None) -> int:
+        """最后一根 K 线之后缺少的 K 线数，last_bar 为空时视为全部缺失"""
+        self._ensure_loaded()
+        session = self.latest_session(now)
+        if session is None:
+            return 0
+        if last_bar is None or pd.isna(last_bar):
+            return self._count_through(session)
+        return self.trading_days_between(last_bar, session)
+
+    def aligned_index(self, start, end) -> pd.DatetimeIndex:
+        """[start, end] 区间内的交易日索引，用于多只股票按同一日期轴对齐"""
+        self._ensure_loaded()
+        start_count = self._count_through(_to_day(start) - timedelta(days=1))
+        return self._dates[start_count:self._count_through(end)]
@@ -0,0 +1,264 @@
+"""股票池元数据：指数成分股（按生效日期保存历史快照，只在指数定期调整后重新拉取）和行业分类"""
+import json
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+import loguru
+
+
+# 中证系列指数每年 6 月、12 月第二个星期五之后的下一交易日调整样本
+SEMIANNUAL_INDICES = ('000300.SH', '000905.SH', '000016.SH', '000852.SH')
+# 综合指数包含交易所全部上市股票，成分随新股上市变化，按天数刷新
+COMPOSITE_INDICES = {'000001.SH': '.SH', '399106.SZ': '.SZ'}
+
+
+def second_friday(year: int, month: int) -> date:
+    first = date(year, month, 1)
+    return first + timedelta(days=(4 - first.weekday()) % 7 + 7)
+
+
+class IndexUniverse:
+    """指数成分股票池
+
+    成分快照存于 data/universe/index_members.parquet（index / effective_date / code），
+    每个指数最近一次检查日期存于 index_checks.json。
+
+    - 中证系列指数：缓存早于最近一次定期调整生效日时重新拉取，生效后 grace_days 天内
+      每天复查一次（数据源可能滞后更新）；成分变化才追加新快照
+    - 综合指数（上证指数等）取全市场股票列表中对应交易所的股票；它和其他不定期调整的指数
+      每 refresh_days 天刷新一次
+
+    config（config.yaml stock_pool 段）:
+        rebalance_grace_days: 调整生效后的复查天数，默认 5
+        refresh_days: 不定期调整指数的刷新间隔，默认 7
+        include_composite: resolve 时是否展开综合指数（全交易所股票），默认 false
+    """
+
+    def __init__(self, data_dir: str = "data", fetcher=None, config: dict = None, calendar=None):
+        self.config = config or {}
+        self.fetcher = fetcher
+        self.calendar = calendar
+        self.logger = loguru.logger
+
+        self.cache_dir = Path(data_dir) / "universe"
+        self.members_path = self.cache_dir / "index_members.parquet"
+        self.checks_path = self.cache_dir / "index_checks.json"
+        self.grace_days = int(self.config.get('rebalance_grace_days', 5))
+        self.refresh_days = int(self.config.get('refresh_days', 7))
+        self.include_composite = bool(self.config.get('include_composite', False))
+
+        self._history = None
+        self._checks = None
+        self._failed = {}  # 指数 -> 本进程拉取失败的日期，当天不再重试
+
+    # ---------- 缓存 ----------
+
+    def _load_cache(self):
+        if self._history is not None:
+            return
+        if self.members_path.exists():
+            self._history = pd.read_parquet(self.members_path)
+        else:
+            self._history = pd.DataFrame({
+                'index': pd.Series(dtype=str),
+                'effective_date': pd.Series(dtype='datetime64[ns]'),
+                'code': pd.Series(dtype=str),
+            })
+        self._checks = json.loads(self.checks_path.read_text()) if self.checks_path.exists() else {}
+
+    def _save_cache(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._history.to_parquet(self.members_path, engine='pyarrow', index=False)
+        self.checks_path.write_text(json.dumps(self._checks, indent=2))
+
+    def history(self, index_code: str) -> pd.DataFrame:
+        """某指数的全部成分快照"""
+        self._load_cache()
+        history = self._history[self._history['index'] == index_code]
+        return history.sort_values(['effective_date', 'code']).reset_index(drop=True)
+
+    # ---------- 调整日程 ----------
+
+    def last_rebalance(self, index_code: str, today: date = None) -> Optional[date]:
+        """today 当天或之前最近一次定期调整的生效日，非定期调整指数返回 None"""
+        if index_code not in SEMIANNUAL_INDICES:
+            return None
+        today = today or date.today()
+        candidates = [self.rebalance_date(year, month)
+                      for year in (today.year - 1, today.year) for month in (6, 12)]
+        return max(day for day in candidates if day <= today)
+
+    def rebalance_date(self, year: int, month: int) -> date:
+        """定期调整生效日：第二个星期五之后的下一交易日（无交易日历时取下周一）"""
+        friday = second_friday(year, month)
+        if self.calendar is not None:
+            effective = self.calendar.next_trading_day(friday)
+            if effective is not None:
+                return effective.date()
+        return friday + timedelta(days=3)
+
+    def needs_refresh(self, index_code: str, today: date = None) -> bool:
+        self._load_cache()
+        today = today or date.today()
+        checked = self._checks.get(index_code)
+        if checked is None or self.history(index_code).empty:
+            return True
+        checked = date.fromisoformat(checked)
+
+        rebalance = self.last_rebalance(index_code, today)
+        if rebalance is None:
+            return (today - checked).days >= self.refresh_days
+        if checked < rebalance:
+            return True
+        return checked < today and (today - rebalance).days < self.grace_days
+
+    # ---------- 刷新 ----------
+
+    def refresh(self, index_code: str, force: bool = False, today: date = None) -> bool:
+        """按调整日程拉取成分，成分有变化时追加快照，返回是否追加"""
+        self._load_cache()
+        today = today or date.today()
+        if not force and (self._failed.get(index_code) == today or not self.needs_refresh(index_code, today)):
+            return False
+
+        codes = self._fetch_members(index_code)
+        if not codes:
+            self._failed[index_code] = today
+            self.logger.warning(f"{index_code} 成分股获取失败，沿用本地缓存")
+            return False
+
+        self._checks[index_code] = today.isoformat()
+        latest = self.members(index_code, refresh=False)
+        changed = set(codes) != set(latest)
+        if changed:
+            effective = self.last_rebalance(index_code, today) or today
+            previous = self.history(index_code)['effective_date']
+            if not previous.empty and previous.max().date() >= effective:
+                effective = today  # 非定期调整（如成分股退市替换）
+            self._append_snapshot(index_code, pd.Timestamp(effective), codes)
+            self.logger.info(f"{index_code} 成分股已更新: {len(codes)} 只，生效日 {effective}")
+        self._save_cache()
+        return changed
+
+    def backfill(self, index_code: str, start, end=None) -> int:
+        """用 baostock 历史成分补齐 [start, end] 内各定期调整生效日的快照，返回新增快照数"""
+        if index_code not in SEMIANNUAL_INDICES:
+            return 0
+        self._load_cache()
+        start, end = pd.Timestamp(start).date(), pd.Timestamp(end or date.today()).date()
+        existing = set(self.history(index_code)['effective_date'].dt.date)
+        added = 0
+        for year in range(start.year - 1, end.year + 1):
+            for month in (6, 12):
+                effective = self.rebalance_date(year, month)
+                if not start <= effective <= end or effective in existing:
+                    continue
+                df = self.fetcher.fetch_index_constituents(index_code, date=effective.isoformat())
+                if df.empty:
+                    continue
+                self._append_snapshot(index_code, pd.Timestamp(effective), sorted(df['code']))
+                existing.add(effective)
+                added += 1
+        if added:
+            self._save_cache()
+        return added
+
+    def _fetch_members(self, index_code: str) -> List[str]:
+        suffix = COMPOSITE_INDICES.get(index_code)
+        if suffix is not None:
+            return sorted(code for code in self.fetcher.get_stock_info_map() if code.endswith(suffix))
+        df = self.fetcher.fetch_index_constituents(index_code)
+        return sorted(df['code'].unique())
+
+    def _append_snapshot(self, index_code: str, effective: pd.Timestamp, codes: Sequence[str]):
+        snapshot = pd.DataFrame({'index': index_code, 'effective_date': effective, 'code': list(codes)})
+        history = self._history[~((self._history['index'] == index_code)
+                                  & (self._history['effective_date'] == effective))]
+        self._history = pd.concat([history, snapshot], ignore_index=True)
+
+    # ---------- 查询 ----------
+
+    def members(self, index_code: str, as_of=None, refresh: bool = True) -> List[str]:
+        """as_of 当天有效的成分股（默认今天，必要时先刷新）；as_of 早于全部快照时返回空列表"""
+        if refresh and as_of is None and self.fetcher is not None:
+            self.refresh(index_code)
+        history = self.history(index_code)
+        if history.empty:
+            return []
+
+        as_of = pd.Timestamp(as_of or date.today())
+        effective = history.loc[history['effective_date'] <= as_of, 'effective_date']
+        if effective.empty:
+            self.logger.warning(f"{index_code} 没有 {as_of:%Y-%m-%d} 之前的成分快照")
+            return []
+        return history.loc[history['effective_date'] == effective.max(), 'code'].tolist()
+
+    def resolve(self, indices: Sequence[str], as_of=None) -> List[str]:
+        """多个指数成分股的并集（按指数顺序去重）
+
+        综合指数展开即整个交易所，只有 include_composite 为 true 时才并入
+        """
+        codes: Dict[str, None] = {}
+        for index_code in indices:
+            if index_code in COMPOSITE_INDICES and not self.include_composite:
+                continue
+            codes.update(dict.fromkeys(self.members(index_code, as_of)))
+        return list(codes)
+
+
+class IndustryClassification:
+    """全市场行业分类，缓存于 data/universe/industry.parquet，每 industry_refresh_days 天刷新
+
+    config（config.yaml stock_pool 段）:
+        industry_refresh_days: 刷新间隔，默认 30
+    """
+
+    def __init__(self, data_dir: str = "data", fetcher=None, config: dict = None):
+        self.config = config or {}
+        self.fetcher = fetcher
+        self.logger = loguru.logger
+        self.cache_path = Path(data_dir) / "universe" / "industry.parquet"
+        self.refresh_days = int(self.config.get('industry_refresh_days', 30))
+        self._mapping = None
+        self._failed_on = None
+
+    def _stale(self, today: date) -> bool:
+        if not self.cache_path.exists():
+            return True
+        modified = date.fromtimestamp(self.cache_path.stat().st_mtime)
+        return (today - modified).days >= self.refresh_days
+
+    def refresh(self, force: bool = False, today: date = None) -> bool:
+        """缓存过期时重新拉取，返回是否更新"""
+        today = today or date.today()
+        if not force and (self._failed_on == today or not self._stale(today)):
+            return False
+
+        mapping = self.fetcher.fetch_industry_map() if self.fetcher is not None else {}
+        if not mapping:
+            self._failed_on = today
+            self.logger.warning("行业分类获取失败，沿用本地缓存")
+            return False
+
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        pd.DataFrame({'code': list(mapping), 'industry': list(mapping.values())}).to_parquet(
+            self.cache_path, engine='pyarrow', index=False)
+        self._mapping = mapping
+        self.logger.info(f"行业分类已更新: {len(mapping)} 只股票")
+        return True
+
+    def industries(self, codes: Sequence[str] = None, refresh: bool = True) -> Dict[str, str]:
+        """{code: 行业}，没有分类的股票不出现在结果中"""
+        if refresh:
+            self.refresh()
+        if self._mapping is None:
+            if self.cache_path.exists():
+                df = pd.read_parquet(self.cache_path)
+                self._mapping = dict(zip(df['code'], df['industry']))
+            else:
+                self._mapping = {}
+        if codes is None:
+            return dict(self._mapping)
+        return {code: self._mapping[code] for code in codes if code in self._mapping}
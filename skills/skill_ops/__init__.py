@@ -1,4 +1,5 @@
 from .scheduler import TaskScheduler
 from .logger import AppLogger
+from .maintenance import StorageMaintenance
 
-__all__ = ['TaskScheduler', 'AppLogger']
+__all__ = ['TaskScheduler', 'AppLogger', 'StorageMaintenance']
@@ -92,6 +92,6 @@ def setup_logging(config: dict = None) -> AppLogger:
     return logger
 
 
-def get_logger() -> loguru.Logger:
+def get_logger() -> "loguru.Logger":
     """获取日志实例"""
     return loguru.logger
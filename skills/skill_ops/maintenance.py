@@ -0,0 +1,146 @@
+"""存储维护：行情快照合并、报告/图表/新闻保留策略和 SQLite 空间回收"""
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+import loguru
+
+
+# 只清理生成的报告和图表，目录中的其他文件不动
+REPORT_PATTERNS = ('daily_report_*.html', 'daily_report_*.pdf', 'weekly_report_*.html',
+                   'weekly_report_*.pdf', 'report_*.json')
+CHART_PATTERNS = ('*.html', '*.png')
+
+DEFAULT_RETENTION = {
+    'report_retention_days': 90,
+    'chart_retention_days': 30,
+    'news_retention_days': 90,
+}
+
+
+def _usage(paths: Iterable[Path]) -> Tuple[int, int]:
+    """目录（递归）或文件的文件数与总字节数"""
+    files, size = 0, 0
+    for path in paths:
+        if path.is_file():
+            candidates = [path]
+        elif path.is_dir():
+            candidates = [p for p in path.rglob('*') if p.is_file()]
+        else:
+            continue
+        for p in candidates:
+            files += 1
+            size += p.stat().st_size
+    return files, size
+
+
+def _format_size(size: int) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class StorageMaintenance:
+    """存储维护任务
+
+    config（config.yaml maintenance 段）:
+        report_retention_days: 报告保留天数，默认 90，0 表示不清理（只清理 REPORT_PATTERNS）
+        chart_retention_days: 图表保留天数，默认 30（只清理 CHART_PATTERNS）
+        news_retention_days: 新闻保留天数（按保存时间），默认 90
+    """
+
+    def __init__(self, storage, data_dir: str = "data", report_dir: str = "reports",
+                 config: dict = None):
+        self.storage = storage
+        self.data_dir = Path(data_dir)
+        self.report_dir = Path(report_dir)
+        self.config = {**DEFAULT_RETENTION, **(config or {})}
+        self.logger = loguru.logger
+
+    def _areas(self) -> Dict[str, List[Path]]:
+        areas = {
+            '行情快照': [self.data_dir / 'prices', self.data_dir / 'prices_hot'],
+            '报告': [self.report_dir],
+            '图表': [self.data_dir / 'charts'],
+        }
+        db_path = getattr(self.storage, 'db_path', None)
+        if db_path is not None:
+            db_path = Path(db_path)
+            areas['SQLite'] = [db_path, db_path.with_name(db_path.name + '-wal')]
+        return areas
+
+    def usage(self) -> Dict[str, Tuple[int, int]]:
+        return {name: _usage(paths) for name, paths in self._areas().items()}
+
+    def _expire_files(self, directory: Path, days: int, dry_run: bool, patterns: Tuple[str, ...]) -> int:
+        """删除目录下（不递归）匹配 patterns 且早于保留期的文件"""
+        if not days or not directory.is_dir():
+            return 0
+        cutoff = (datetime.now() - timedelta(days=days)).timestamp()
+        candidates = {p for pattern in patterns for p in directory.glob(pattern)}
+        expired = sorted(p for p in candidates if p.is_file() and p.stat().st_mtime < cutoff)
+        if not dry_run:
+            for p in expired:
+                p.unlink()
+        return len(expired)
+
+    def run(self, dry_run: bool = False) -> Dict:
+        """执行维护，返回各项操作结果和前后占用对比"""
+        before = self.usage()
+        actions = {}
+
+        if hasattr(self.storage, 'compact_prices'):
+            if dry_run:
+                snapshots = self.storage.compaction_candidates()
+                actions['compact_prices'] = {
+                    'codes': len(snapshots),
+                    'files_removed': sum(len(files) - 1 for files in snapshots.values()),
+                }
+            else:
+                actions['compact_prices'] = self.storage.compact_prices()
+        else:
+            self.logger.info("当前存储不支持快照合并，跳过")
+
+        if hasattr(self.storage, 'migrate_price_layout'):
+            if dry_run:
+                actions['prices_migrated'] = {'codes': len(self.storage.pending_layout_migration())}
+            else:
+                actions['prices_migrated'] = self.storage.migrate_price_layout()
+
+        actions['reports_removed'] = self._expire_files(
+            self.report_dir, self.config['report_retention_days'], dry_run, REPORT_PATTERNS
+        )
+        actions['charts_removed'] = self._expire_files(
+            self.data_dir / 'charts', self.config['chart_retention_days'], dry_run, CHART_PATTERNS
+        )
+
+        news_days = self.config['news_retention_days']
+        if news_days and hasattr(self.storage, 'prune_news') and not dry_run:
+            actions['news_removed'] = self.storage.prune_news(datetime.now() - timedelta(days=news_days))
+
+        if hasattr(self.storage, 'vacuum') and not dry_run:
+            self.storage.vacuum()
+            actions['vacuum'] = True
+
+        return {'dry_run': dry_run, 'actions': actions, 'before': before, 'after': self.usage()}
+
+    @staticmethod
+    def format_summary(result: Dict) -> str:
+        """前后占用对比"""
+        lines = []
+        total_before, total_after = [0, 0], [0, 0]
+        for name, (files_before, size_before) in result['before'].items():
+            files_after, size_after = result['after'].get(name, (0, 0))
+            lines.append(
+                f"  {name}: 文件 {files_before} → {files_after}，"
+                f"大小 {_format_size(size_before)} → {_format_size(size_after)}"
+            )
+            total_before[0] += files_before
+            total_before[1] += size_before
+            total_after[0] += files_after
+            total_after[1] += size_after
+        lines.append(
+            f"  合计: 文件 {total_before[0]} → {total_after[0]}，"
+            f"大小 {_format_size(total_before[1])} → {_format_size(total_after[1])}"
+        )
+        return '\n'.join(lines)
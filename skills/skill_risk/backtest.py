@@ -8,9 +8,11 @@ import loguru
 class BacktestEngine:
     """回测引擎"""
     
-    def __init__(self, config: dict = None):
+    def __init__(self, config: dict = None, calendar=None):
         self.config = config or {}
         self.logger = loguru.logger
+        # 交易日历（skills.skill_data.trading_calendar.TradingCalendar），未提供时由行情日期合并得到
+        self.calendar = calendar
         
         self.initial_capital = self.config.get('initial_capital', 1000000)
         self.commission_rate = self.config.get('commission_rate', 0.0003)
@@ -105,7 +107,18 @@ class BacktestEngine:
     
     def _get_trading_dates(self, price_data: Dict[str, pd.DataFrame],
                           start_date, end_date) -> List:
-        """获取交易日期"""
+        """获取交易日期：有交易日历时取行情覆盖范围内的日历交易日"""
+        if self.calendar is not None:
+            bounds = [
+                (df['date'].min(), df['date'].max())
+                for df in price_data.values() if not df.empty and 'date' in df.columns
+            ]
+            if not bounds:
+                return []
+            first = max(min(b[0] for b in bounds), pd.Timestamp(start_date))
+            last = min(max(b[1] for b in bounds), pd.Timestamp(end_date))
+            return list(self.calendar.aligned_index(first, last))
+        
         all_dates = set()
         
         for df in price_data.values():
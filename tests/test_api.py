@@ -101,6 +101,26 @@ class TestStockRoutes:
         
         assert response.status_code == 200
     
+    def test_get_stock_scores_from_async_storage(self):
+        from api.main import app
+        
+        class FakeAsyncStorage:
+            async def load_latest_scores(self, limit=10):
+                return [{'code': '000858.SZ', 'total_score': 90, 'rank': 1}]
+        
+        engine = mock_engine()
+        app.state.engine = engine
+        app.state.async_storage = FakeAsyncStorage()
+        try:
+            client = TestClient(app)
+            response = client.get("/api/stocks/scores?top_n=5")
+        finally:
+            app.state.async_storage = None
+        
+        assert response.status_code == 200
+        assert response.json()['data']['items'][0]['code'] == '000858.SZ'
+        engine.storage.load_latest_scores.assert_not_called()
+    
     def test_get_stock_detail_not_found(self):
         from api.main import app
         
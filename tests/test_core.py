@@ -83,6 +83,460 @@ class TestStockScorer:
         
         rec = scorer.generate_recommendation('600519.SH', 30)
         assert '卖出' in rec
+    
+    def test_vectorized_scores_match_per_stock(self):
+        from skills.skill_ai.scorer import StockScorer
+        
+        rng = np.random.default_rng(0)
+        price_data, financial_data = {}, {}
+        for i, length in enumerate([250, 250, 120, 30, 12, 3, 250]):
+            close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+            price_data[f'60000{i}.SH'] = pd.DataFrame({
+                'close': close, 'high': close * 1.01, 'low': close * 0.99,
+                'volume': rng.integers(1e5, 3e8, length),
+            })
+            financial_data[f'60000{i}.SH'] = {'pe': [None, -1, 15, 80][i % 4], 'roe': float(i * 5)}
+        price_data['600006.SH'].loc[100, 'close'] = np.nan  # 含缺失值，逐只评分
+        price_data['600007.SH'] = pd.DataFrame({'close': [1.0] * 30})  # 缺列，评分失败
+        news_data = {'600000.SH': [{'sentiment_score': 0.5}]}
+        
+        expected = StockScorer({'vectorized': False}).score_stocks(price_data, financial_data, news_data)
+        actual = StockScorer().score_stocks(price_data, financial_data, news_data)
+        
+        columns = [c for c in expected.columns if c != 'timestamp']
+        assert len(actual) == 7
+        pd.testing.assert_frame_equal(expected[columns], actual[columns])
+    
+    def test_incremental_rescoring_reuses_unchanged(self, tmp_path):
+        from skills.skill_ai.scorer import StockScorer
+        from skills.skill_data.storage import DataStorage
+        
+        dates = pd.bdate_range('2024-01-01', periods=60)
+        price_data = {
+            code: pd.DataFrame({'date': dates, 'close': np.linspace(10, 10 + i, 60),
+                                'high': np.linspace(11, 11 + i, 60), 'low': np.linspace(9, 9 + i, 60),
+                                'volume': np.full(60, 1e7)})
+            for i, code in enumerate(['600000.SH', '600001.SH', '600002.SH'])
+        }
+        financial_data = {code: {'pe': 15} for code in price_data}
+        storage = DataStorage(str(tmp_path))
+        scorer = StockScorer()
+        
+        first = scorer.score_stocks(price_data, financial_data, {}, previous_scores={})
+        storage.save_scores_batch(first)
+        
+        # 只有 600001 有新闻，只重算它
+        news_data = {'600001.SH': [{'datetime': '2024-03-22 10:00:00', 'sentiment_score': 1.0}]}
+        rescored = []
+        score_panel = scorer._score_panel
+        scorer._score_panel = lambda prices, *args: rescored.extend(prices) or score_panel(prices, *args)
+        second = scorer.score_stocks(price_data, financial_data, news_data,
+                                     previous_scores=storage.load_scores(list(price_data)))
+        
+        assert rescored == ['600001.SH']
+        full = StockScorer().score_stocks(price_data, financial_data, news_data)
+        assert second['code'].tolist() == full['code'].tolist()
+        assert second['total_score'].tolist() == full['total_score'].tolist()
+        assert second.set_index('code').loc['600001.SH', 'sentiment_score'] == 100
+
+    def test_fingerprint_tracks_adjusted_history_rewrite(self, tmp_path):
+        from skills.skill_ai.scorer import StockScorer, score_fingerprint, public_score
+        from skills.skill_data.storage import DataStorage
+
+        dates = pd.bdate_range('2024-01-01', periods=60)
+        close = np.linspace(10, 12, 60)
+        df = pd.DataFrame({'date': dates, 'close': close, 'high': close * 1.01,
+                           'low': close * 0.99, 'volume': np.full(60, 1e7)})
+        # 除权后前复权：最后一根不变，之前的历史整体下调
+        rewritten = df.copy()
+        rewritten.loc[:58, ['close', 'high', 'low']] *= 0.9
+        assert score_fingerprint(df, {}, None, {}) != score_fingerprint(rewritten, {}, None, {})
+
+        storage = DataStorage(str(tmp_path))
+        scorer = StockScorer()
+        storage.save_scores_batch(scorer.score_stocks({'600000.SH': df}, {}, {}, previous_scores={}))
+        rescored = []
+        score_panel = scorer._score_panel
+        scorer._score_panel = lambda prices, *args: rescored.extend(prices) or score_panel(prices, *args)
+        previous = storage.load_scores(['600000.SH'])
+        scorer.score_stocks({'600000.SH': rewritten}, {}, {}, previous_scores=previous)
+        assert rescored == ['600000.SH']
+
+        # 指纹只用于增量比对，不对外返回
+        assert 'fingerprint' in previous['600000.SH']
+        assert 'fingerprint' not in public_score(previous['600000.SH'])
+
+    def test_process_pool_scores_match_single_process(self):
+        from skills.skill_ai.scorer import StockScorer
+        from skills.skill_ai.analyzer import StrategyAnalyzer
+        
+        rng = np.random.default_rng(1)
+        price_data = {}
+        for i in range(12):
+            length = int(rng.integers(20, 120))
+            close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+            price_data[f'6000{i:02d}.SH'] = pd.DataFrame({
+                'code': f'6000{i:02d}.SH', 'close': close, 'high': close * 1.01,
+                'low': close * 0.99, 'volume': rng.integers(1e5, 3e8, length),
+            })
+        financial_data = {code: {'pe': float(rng.uniform(5, 60))} for code in price_data}
+        parallel = {'parallel': {'workers': 2, 'min_stocks': 2, 'start_method': 'fork'}}
+        
+        expected = StockScorer().score_stocks(price_data, financial_data, {})
+        actual = StockScorer(parallel).score_stocks(price_data, financial_data, {})
+        columns = [c for c in expected.columns if c != 'timestamp']
+        pd.testing.assert_frame_equal(expected[columns], actual[columns])
+        
+        stock_list = list(price_data)
+        assert StrategyAnalyzer(parallel).analyze_strategy(price_data, stock_list)['stocks'] == \
+            StrategyAnalyzer().analyze_strategy(price_data, stock_list)['stocks']
+        
+        # 进程池在调用之间复用
+        from skills.skill_ai import parallel as parallel_module
+        pool = parallel_module.get_pool(2, 'fork')
+        StockScorer(parallel).score_stocks(price_data, financial_data, {})
+        assert parallel_module.get_pool(2, 'fork') is pool
+
+
+class TestFactorModel:
+    """多因子模型测试"""
+
+    def test_panel_exposures_match_per_stock(self):
+        from skills.skill_ai.factors import FactorModel
+
+        rng = np.random.default_rng(3)
+        price_data, financial_data = {}, {}
+        for i, length in enumerate([120, 80, 40, 10]):
+            close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+            price_data[f'60000{i}.SH'] = pd.DataFrame({'close': close, 'volume': rng.uniform(1e6, 1e8, length)})
+            financial_data[f'60000{i}.SH'] = {'pe': [20.0, -10.0, None, 8.0][i], 'pb': 2.0,
+                                              'roe': 12.0, 'market_cap': 1e10 * (i + 1)}
+
+        exposures = FactorModel().calculate_exposures(price_data, financial_data).set_index('code')
+
+        for code, df in price_data.items():
+            close = df['close']
+            if len(df) > 60:
+                momentum = 0.6 * (close.iloc[-1] / close.iloc[-21] - 1) + 0.4 * (close.iloc[-1] / close.iloc[-61] - 1)
+                assert exposures.loc[code, 'momentum'] == pytest.approx(momentum)
+            if len(df) >= 20:
+                assert exposures.loc[code, 'volatility'] == pytest.approx(close.pct_change().std() * np.sqrt(252))
+                assert exposures.loc[code, 'liquidity'] == pytest.approx(np.log1p(df['volume'].tail(20).mean()))
+
+        assert exposures.loc['600000.SH', 'value'] == pytest.approx(0.6 / 20 + 0.4 / 2)
+        assert exposures.loc['600002.SH', 'value'] == pytest.approx(1 / 2)  # PE 缺失只用 PB
+        close = price_data['600002.SH']['close']
+        assert exposures.loc['600002.SH', 'momentum'] == pytest.approx(close.iloc[-1] / close.iloc[-21] - 1)
+        assert np.isnan(exposures.loc['600003.SH', ['momentum', 'volatility', 'liquidity']]).all()
+
+    def test_normalization_is_robust_to_outliers(self, tmp_path):
+        from skills.skill_ai.factors import FactorModel
+
+        exposures = pd.DataFrame({
+            'code': [f'60000{i}.SH' for i in range(41)],
+            'size': [*np.arange(40.0), 1e6],  # 一个极端值
+            'volatility': [*np.linspace(0.1, 0.5, 40), np.nan],
+        })
+        model = FactorModel({'winsorize': 0.025}, data_dir=str(tmp_path))
+
+        z = model.normalize(exposures, 'zscore')
+        assert z['size'].iloc[:40].std() > 0.8  # 极端值被缩尾，没有把其余股票挤到一起
+        assert z['volatility'].iloc[0] > z['volatility'].iloc[39]  # 低波动得分更高
+        assert np.isnan(z['volatility'].iloc[40])
+
+        ranks = model.normalize(exposures, 'rank')
+        assert ranks['size'].iloc[40] == 1.0
+        assert ranks['size'].iloc[0] == pytest.approx(1 / 41)
+
+        scores = model.scores_from_exposures(exposures)
+        assert scores['volatility_score'].iloc[40] == 50
+        assert scores['size_score'].between(0, 100).all()
+
+        model.save_exposures(exposures, '2024-03-01')
+        assert model.exposure_dates() == [pd.Timestamp('2024-03-01')]
+        pd.testing.assert_frame_equal(model.load_exposures('2024-03-01'), exposures)
+
+    def test_neutralization_matches_per_date_lstsq(self):
+        from skills.skill_ai.factors import neutralize_exposures, industry_groups
+
+        rng = np.random.default_rng(5)
+        factors, days, n = ['momentum', 'size', 'value'], 4, 60
+        codes = [f'{600000 + i}.SH' for i in range(n)]
+        industries = {code: f'行业{i % 5}' for i, code in enumerate(codes[:-3])}  # 末 3 只无分类
+        values = rng.normal(size=(len(factors), days, n))
+        values[1] = rng.uniform(20, 26, size=(days, n))
+        values[0, 1, 7] = np.nan
+        values[1, 2, 11] = np.nan
+
+        groups = industry_groups(codes, industries)
+        assert len(set(groups)) == 6
+        residual = neutralize_exposures(values, factors, groups)
+
+        dummies = (groups[:, None] == np.arange(6)).astype(float)
+        for f in range(len(factors)):
+            for d in range(days):
+                x = dummies if factors[f] == 'size' else np.column_stack([dummies, values[1, d]])
+                y = values[f, d]
+                rows = np.isfinite(y) & np.isfinite(x).all(axis=1)
+                beta = np.linalg.lstsq(x[rows], y[rows], rcond=None)[0]
+                np.testing.assert_allclose(residual[f, d, rows], y[rows] - x[rows] @ beta, atol=1e-9)
+                assert np.isnan(residual[f, d, ~rows]).all()
+                # 残差与行业哑变量、市值正交
+                np.testing.assert_allclose(x[rows].T @ residual[f, d, rows], 0, atol=1e-8)
+
+    def test_daily_scores_carry_neutralized_factor_score(self, tmp_path):
+        from types import SimpleNamespace
+        import loguru
+        from core.engine import QuantEngine
+        from skills.skill_ai.factors import FactorModel
+
+        rng = np.random.default_rng(6)
+        codes = [f'{600000 + i}.SH' for i in range(30)]
+        exposures = pd.DataFrame({'code': codes, **{f: rng.normal(size=30) for f in
+                                                    ('value', 'quality', 'momentum', 'volatility', 'liquidity')},
+                                  'size': rng.uniform(20, 26, 30)})
+        industries = {code: f'行业{i % 3}' for i, code in enumerate(codes)}
+        model = FactorModel({'persist': False}, str(tmp_path))
+        engine = SimpleNamespace(factor_model=model, logger=loguru.logger,
+                                 industries=SimpleNamespace(industries=lambda codes: industries))
+        scores = pd.DataFrame({'code': codes[::-1], 'total_score': np.arange(30.), 'rank': range(1, 31)})
+
+        attached = QuantEngine._attach_factor_model_scores(engine, scores, exposures)
+
+        expected = model.calculate_composite_score(model.neutral_scores(exposures, industries))
+        expected = expected.set_index('code')['composite_score'].round(2)
+        assert attached['multi_factor_score'].tolist() == expected.loc[codes[::-1]].tolist()
+        unneutralized = model.calculate_composite_score(model.neutral_scores(exposures))
+        assert not np.allclose(expected.loc[codes], unneutralized.set_index('code').loc[codes, 'composite_score'])
+        # 只作参考，不改变总分与排名
+        assert attached[['code', 'total_score', 'rank']].equals(scores)
+
+
+class TestFactorEvaluator:
+    """因子评估测试"""
+
+    def test_rank_ic_matches_scipy(self):
+        from scipy.stats import spearmanr
+        from skills.skill_ai.evaluation import ExposureHistory, FactorEvaluator
+
+        rng = np.random.default_rng(4)
+        dates = pd.bdate_range('2024-01-01', periods=40)
+        codes = [f'60{i:04d}.SH' for i in range(60)]
+        close = pd.DataFrame(10 * np.exp(np.cumsum(rng.normal(0, 0.02, (40, 60)), axis=0)),
+                             index=dates, columns=codes)
+        close.iloc[10:14, 5] = np.nan  # 停牌
+        frames = {}
+        for day in dates[:30]:
+            signal = rng.normal(size=60)
+            signal[rng.random(60) < 0.1] = np.nan
+            signal[:10] = np.round(signal[:10])  # 并列
+            frames[day] = pd.DataFrame({'code': codes, 'signal': signal})
+        history = ExposureHistory.from_frames(frames)
+
+        result = FactorEvaluator({'horizons': [1, 5], 'min_stocks': 10}).evaluate(history, close)
+
+        for row in (0, 9, 29):
+            x = frames[dates[row]]['signal'].to_numpy()
+            y = (close.iloc[row + 5] / close.iloc[row] - 1).to_numpy()
+            valid = ~np.isnan(x) & ~np.isnan(y)
+            assert result['ic'][('signal', 5)].iloc[row] == pytest.approx(spearmanr(x[valid], y[valid])[0])
+
+        summary = result['summary'].loc[('signal', 5)]
+        ic = result['ic'][('signal', 5)]
+        assert summary['n_dates'] == 30
+        assert summary['ir'] == pytest.approx(ic.mean() / ic.std())
+        assert list(result['decay'].columns) == ['0-1', '0-5', '1-5']
+        assert list(result['quantiles'].columns) == ['q1', 'q2', 'q3', 'q4', 'q5']
+
+    def test_perfect_signal_spread(self):
+        from skills.skill_ai.evaluation import ExposureHistory, FactorEvaluator
+
+        rng = np.random.default_rng(5)
+        dates = pd.bdate_range('2024-01-01', periods=25)
+        codes = [f'60{i:04d}.SH' for i in range(50)]
+        returns = rng.normal(0, 0.02, (25, 50))
+        close = pd.DataFrame(10 * np.exp(np.cumsum(returns, axis=0)), index=dates, columns=codes)
+        # 暴露等于下一日收益：1 日 IC 恒为 1，高分组收益最高
+        frames = {dates[i]: pd.DataFrame({'code': codes, 'oracle': close.iloc[i + 1] / close.iloc[i] - 1})
+                  for i in range(20)}
+
+        result = FactorEvaluator({'horizons': [1], 'min_stocks': 10}).evaluate(
+            ExposureHistory.from_frames(frames), close)
+
+        assert np.allclose(result['ic'][('oracle', 1)], 1.0)
+        quantiles = result['quantiles'].loc[('oracle', 1)]
+        assert quantiles.is_monotonic_increasing
+        assert result['summary'].loc[('oracle', 1), 'spread'] == pytest.approx(quantiles['q5'] - quantiles['q1'])
+
+
+class TestWeightCalibrator:
+    """评分权重校准测试"""
+
+    def test_score_history_matches_truncated_scoring(self):
+        from skills.skill_ai import StockScorer
+        from skills.skill_ai.calibration import ScoreHistory
+        from skills.skill_ai.panel import PricePanel, FinancialPanel
+        from skills.skill_ai.scorer import FINANCIAL_DEFAULTS
+
+        rng = np.random.default_rng(11)
+        dates = pd.bdate_range('2024-01-01', periods=80)
+        price_data = {}
+        for i, start in enumerate([0, 0, 30, 50]):
+            close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, 80 - start)))
+            price_data[f'60000{i}.SH'] = pd.DataFrame({
+                'date': dates[start:], 'close': close, 'high': close * 1.01, 'low': close * 0.99,
+                'volume': rng.uniform(1e6, 1e8, 80 - start)})
+        price_data['600001.SH'] = price_data['600001.SH'].drop(index=60)  # 停牌一天
+        financial_data = {code: {'pe': 15.0, 'roe': 12.0} for code in price_data}
+        scorer = StockScorer()
+        rebalance = dates[[40, 55, 60, 79]]
+
+        history = ScoreHistory.from_prices(scorer, price_data, financial_data, rebalance)
+
+        assert history.scores.shape == (10, 3, 4)
+        for r, day in enumerate(rebalance[:-1]):
+            truncated = {code: df[df['date'] <= day] for code, df in price_data.items()}
+            truncated = {code: df for code, df in truncated.items() if len(df)}
+            panel, _ = PricePanel.from_frames(truncated)
+            expected = scorer.calculate_factor_scores(
+                panel, FinancialPanel.from_dicts(panel.codes, financial_data, FINANCIAL_DEFAULTS))
+            for f, factor in enumerate(history.factors):
+                column = [history.codes.index(code) for code in panel.codes]
+                np.testing.assert_array_equal(history.scores[f, r, column], expected[f'{factor}_score'])
+        assert not history.tradable[0, 3]  # 尚未上市
+        assert not history.tradable[2, 1]  # 调仓日停牌
+        close = price_data['600000.SH'].set_index('date')['close']
+        assert history.returns[1, 0] == pytest.approx(close[rebalance[2]] / close[rebalance[1]] - 1)
+
+    def test_batched_backtest_and_pareto(self):
+        from skills.skill_ai.calibration import (ScoreHistory, WeightCalibrator, backtest_weights,
+                                                 pareto_front, simplex_grid)
+
+        rng = np.random.default_rng(2)
+        periods, n = 12, 30
+        scores = rng.uniform(0, 100, (3, periods, n)).astype(np.float32)
+        returns = rng.normal(0, 0.03, (periods, n))
+        tradable = rng.random((periods, n)) > 0.1
+        returns[~tradable] = 0.
+        weights = simplex_grid(3, 4)
+        assert len(weights) == 15 and np.allclose(weights.sum(axis=1), 1)
+
+        metrics = backtest_weights(weights, scores, returns, tradable, top_n=5, cost=0.002,
+                                   periods_per_year=50, chunk_elements=1000)
+        for k, w in enumerate(weights):
+            held_before, net = set(), []
+            for r in range(periods):
+                composite = np.einsum('f,fn->n', w.astype(np.float32), scores[:, r])
+                held = set(np.argsort(np.where(tradable[r], -composite, np.inf), kind='stable')[:5])
+                traded = 1.0 if r == 0 else 1 - len(held & held_before) / 5
+                net.append(returns[r, list(held)].mean() - 0.002 * traded)
+                held_before = held
+            equity = np.cumprod(1 + np.array(net))
+            assert metrics['total_return'][k] == pytest.approx(equity[-1] - 1)
+            assert metrics['max_drawdown'][k] == pytest.approx(
+                (1 - equity / np.maximum.accumulate(np.maximum(equity, 1))).max())
+
+        empty = backtest_weights(weights, scores[:, :, :0], returns[:, :0], tradable[:, :0], top_n=5,
+                                 cost=0.002, periods_per_year=50)
+        assert (empty['total_return'] == 0).all() and len(empty['turnover']) == len(weights)
+
+        objectives = np.array([[0, 1], [1, 0], [1, 1], [0.5, 0.5]])
+        assert pareto_front(objectives).tolist() == [True, True, False, True]
+
+        history = ScoreHistory(pd.bdate_range('2024-01-01', periods=periods + 1), [str(i) for i in range(n)],
+                               ['pe', 'roe', 'macd'], scores, returns, tradable)
+        calibrator = WeightCalibrator({'factors': ['roe', 'macd'], 'top_n': 5, 'search': 'bayesian',
+                                       'bayesian': {'init': 6, 'iterations': 2, 'batch': 3, 'pool': 50}},
+                                      {'pe': 0.1, 'roe': 0.15, 'macd': 0.15, 'sentiment': 0.05})
+        result = calibrator.calibrate(history)
+        assert len(result['candidates']) == 1 + 6 + 2 * 3
+        assert result['pareto']['pareto'].all()
+        weights = result['best']['weights']
+        assert weights['pe'] == 0.1 and weights['sentiment'] == 0.05
+        assert weights['roe'] + weights['macd'] == pytest.approx(0.3, abs=1e-3)
+
+
+class TestMLScorer:
+    """ML 评分测试"""
+
+    @staticmethod
+    def _price_data(rng, dates, n):
+        price_data = {}
+        for i in range(n):
+            close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates))))
+            price_data[f'{600000 + i}.SH'] = pd.DataFrame({
+                'date': dates, 'close': close, 'high': close * 1.01, 'low': close * 0.99,
+                'volume': rng.uniform(1e6, 1e8, len(dates))})
+        return price_data
+
+    def test_backfill_matches_live_features_and_labels_incrementally(self, tmp_path):
+        from skills.skill_ai import StockScorer
+        from skills.skill_ai.ml_model import FeatureStore, feature_frame
+        from skills.skill_ai.evaluation import close_matrix
+
+        rng = np.random.default_rng(8)
+        dates = pd.bdate_range('2024-01-01', periods=70)
+        price_data = self._price_data(rng, dates, 6)
+        financial_data = {code: {'pe': 10.0 + i, 'roe': 12.0, 'market_cap': 1e10 * (i + 1)}
+                          for i, code in enumerate(price_data)}
+        scorer = StockScorer()
+        store = FeatureStore(str(tmp_path))
+
+        assert store.backfill(scorer, price_data, financial_data, dates[[40, 50, 60]]) == 3
+        assert store.backfill(scorer, price_data, financial_data, dates[[40, 50]]) == 0
+
+        live = scorer.score_stocks({code: df[df['date'] <= dates[50]] for code, df in price_data.items()},
+                                   financial_data, {})
+        expected = feature_frame(live).sort_values('code').reset_index(drop=True)
+        pd.testing.assert_frame_equal(store.load(dates[50]), expected, check_dtype=False)
+
+        close = close_matrix(price_data, list(price_data))
+        assert store.update_training_set(close.iloc[:58], horizon=5) == 12  # 第 60 天的标签尚不可得
+        assert store.update_training_set(close.iloc[:58], horizon=5) == 0
+        assert store.update_training_set(close, horizon=5) == 6
+        training = store.training_set()
+        sample = training[(training['date'] == dates[40]) & (training['code'] == '600000.SH')].iloc[0]
+        assert sample['forward_return'] == pytest.approx(close.iloc[45, 0] / close.iloc[40, 0] - 1)
+        assert training.groupby('date')['label'].max().eq(1.0).all()
+
+    def test_cached_model_drives_hybrid_scores(self, tmp_path):
+        from skills.skill_ai import StockScorer, MLScorer
+        from skills.skill_ai.ml_model import FEATURE_COLUMNS
+
+        rng = np.random.default_rng(9)
+        rows = 2000
+        training = pd.DataFrame(rng.uniform(0, 100, (rows, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+        training.insert(0, 'code', [f'{i:06d}.SH' for i in range(rows)])
+        training.insert(0, 'date', pd.Timestamp('2024-01-01') + pd.to_timedelta(np.arange(rows) // 100, unit='D'))
+        training['forward_return'] = training['momentum_score'] / 1000
+        training['label'] = training['momentum_score'] / 100  # 标签只由动量得分决定
+        config = {'min_samples': 500, 'model': {'max_iter': 50, 'min_samples_leaf': 20}}
+        model = MLScorer(config, str(tmp_path))
+        model.store.feature_dir.mkdir(parents=True)
+        training.to_parquet(model.store.training_path, index=False)
+
+        assert model.train()['samples'] == rows
+        cached = MLScorer(config, str(tmp_path))
+        assert not cached.is_stale()
+        assert MLScorer({**config, 'horizon': 10}, str(tmp_path)).is_stale()  # 参数变化需重新训练
+
+        calls = []
+        predict = cached.predict
+        cached.predict = lambda scores: calls.append(len(scores)) or predict(scores)
+        price_data = self._price_data(rng, pd.bdate_range('2024-01-01', periods=60), 8)
+        scores = StockScorer({'scoring_method': 'hybrid'}, ml_model=cached).score_stocks(price_data, {}, {})
+
+        assert calls == [8]  # 整个股票池一次 predict
+        assert scores['total_score'].to_numpy() == pytest.approx(
+            0.5 * scores['factor_score'] + 0.5 * scores['ai_score'], abs=0.01)
+        # AI 得分是预测值的截面百分位：最高为 100，排序与动量得分一致
+        from skills.skill_ai.factors import rank_pct
+        assert scores['ai_score'].max() == 100
+        assert scores['ai_score'].to_numpy() == pytest.approx(
+            np.round(rank_pct(scores['momentum_score'].to_numpy()) * 100, 2))
+
+        fallback = StockScorer({'scoring_method': 'ai'}, ml_model=MLScorer(config, str(tmp_path / 'empty')))
+        assert 'ai_score' not in fallback.score_stocks(price_data, {}, {}).columns
 
 
 class TestBacktestEngine:
@@ -246,5 +700,907 @@ class TestReportGenerator:
             assert path.endswith('.html')
 
 
+class TestDataStorage:
+    """文件存储测试"""
+    
+    def _price_frame(self, periods: int = 300) -> pd.DataFrame:
+        dates = pd.date_range('2023-01-01', periods=periods, freq='D')
+        return pd.DataFrame({
+            'date': dates,
+            'close': np.arange(periods, dtype=float),
+            'volume': np.full(periods, 1e6)
+        })
+    
+    def test_load_price_data_pushdown(self, tmp_path):
+        from skills.skill_data.storage import DataStorage
+        
+        storage = DataStorage(str(tmp_path))
+        storage.save_price_data('600519.SH', self._price_frame().iloc[::-1])
+        
+        df = storage.load_price_data('600519.SH', start='20231001', end='20231010',
+                                     columns=['date', 'close'])
+        
+        assert list(df.columns) == ['date', 'close']
+        assert len(df) == 10
+        assert df['date'].is_monotonic_increasing
+    
+    def test_load_all_price_data_columns_without_date(self, tmp_path):
+        from skills.skill_data.storage import DataStorage
+        
+        storage = DataStorage(str(tmp_path))
+        storage.save_price_data('600519.SH', self._price_frame())
+        
+        df = storage.load_all_price_data('600519.SH', start='2023-10-27', columns=['close'])
+        
+        assert list(df.columns) == ['close']
+        assert df['close'].tolist() == [299.0]
+    
+    def test_arrow_hot_cache_matches_parquet(self, tmp_path):
+        from skills.skill_data.storage import DataStorage
+        
+        storage = DataStorage(str(tmp_path), {'arrow_hot_cache': True})
+        storage.save_price_data('600519.SH', self._price_frame())
+        
+        assert (tmp_path / 'prices_hot' / '600519.SH.arrow').exists()
+        
+        hot = storage.load_price_data('600519.SH', start='20231001', end='20231010',
+                                      columns=['date', 'close'])
+        cold = DataStorage(str(tmp_path)).load_price_data(
+            '600519.SH', start='20231001', end='20231010', columns=['date', 'close'])
+        
+        pd.testing.assert_frame_equal(hot, cold)
+        # 默认复制，调用方可原地修改
+        hot.loc[hot.index[0], 'close'] = -1.0
+        hot['close'] = hot['close'].where(hot['close'] > 0)
+        hot.fillna({'close': 0.0}, inplace=True)
+        assert hot['close'].iloc[0] == 0.0
+        
+        # arrow_zero_copy：直接引用 mmap 页面，只读
+        zero_copy = DataStorage(str(tmp_path), {'arrow_hot_cache': True, 'arrow_zero_copy': True})
+        view = zero_copy.load_price_data('600519.SH', start='20231001', end='20231010', columns=['date', 'close'])
+        pd.testing.assert_frame_equal(view, cold)
+        with pytest.raises(ValueError, match='read-only'):
+            view.loc[view.index[0], 'close'] = -1.0
+    
+    def test_arrow_hot_cache_serves_merged_history(self, tmp_path, monkeypatch):
+        from skills.skill_data import storage as storage_module
+        from skills.skill_data.storage import DataStorage
+        
+        class Clock(datetime):
+            today = datetime(2024, 1, 2)
+            
+            @classmethod
+            def now(cls, tz=None):
+                return cls.today
+        
+        monkeypatch.setattr(storage_module, 'datetime', Clock)
+        storage = DataStorage(str(tmp_path), {'arrow_hot_cache': True})
+        older = self._price_frame(200)
+        older['close'] += 1000
+        older.to_parquet(tmp_path / 'prices' / '600519.SH_20230101.parquet', index=False)
+        storage.save_price_data('600519.SH', self._price_frame().iloc[100:])
+        cold = DataStorage(str(tmp_path))
+        
+        for start, columns in [(None, None), ('2023-07-01', ['close'])]:
+            pd.testing.assert_frame_equal(storage.load_all_price_data('600519.SH', start=start, columns=columns),
+                                          cold.load_all_price_data('600519.SH', start=start, columns=columns))
+        pd.testing.assert_frame_equal(storage.load_price_data('600519.SH', start='2023-05-01'),
+                                      cold.load_price_data('600519.SH', start='2023-05-01'))
+        assert len(storage.load_all_price_data('600519.SH')) == 300
+        
+        # 热缓存已覆盖之前的快照，次日保存直接在其上追加，不再读取 parquet
+        Clock.today = datetime(2024, 1, 3)
+        monkeypatch.setattr(storage, '_read_price_file', None)
+        storage.save_price_data('600519.SH', self._price_frame(310).iloc[300:])
+        assert len(storage.load_all_price_data('600519.SH')) == 310
+        pd.testing.assert_frame_equal(storage.load_all_price_data('600519.SH'), cold.load_all_price_data('600519.SH'))
+    
+    def test_batch_writes_round_trip(self, tmp_path):
+        from skills.skill_data.storage import DataStorage
+        
+        storage = DataStorage(str(tmp_path))
+        
+        assert storage.save_price_batch({'600519.SH': self._price_frame(), '000858.SZ': pd.DataFrame()}) == 1
+        assert storage.save_financial_batch({'600519.SH': {'pe': 30}}) == 1
+        assert storage.save_news_batch({'600519.SH': [{'title': 'a'}, {'title': 'b'}]}) == 2
+        
+        scores = pd.DataFrame({'code': ['600519.SH', '000858.SZ'], 'total_score': [70.0, 80.0]})
+        assert storage.save_scores_batch(scores) == 2
+        
+        assert storage.list_available_stocks() == ['600519.SH']
+        assert storage.load_financial_data('600519.SH')['pe'] == 30
+        assert len(storage.load_news('600519.SH')) == 2
+        assert [s['code'] for s in storage.load_latest_scores()] == ['000858.SZ', '600519.SH']
+    
+    def test_imports_legacy_json_files(self, tmp_path):
+        import json
+        from skills.skill_data.storage import DataStorage
+        
+        (tmp_path / 'scores').mkdir()
+        (tmp_path / 'scores' / '600519.SH_score.json').write_text(
+            json.dumps({'code': '600519.SH', 'total_score': 66}), encoding='utf-8')
+        
+        storage = DataStorage(str(tmp_path))
+        
+        assert storage.load_latest_scores(limit=1) == [{'code': '600519.SH', 'total_score': 66}]
+
+
+class TestPriceAdjustment:
+    """测试不复权行情 + 复权因子"""
+
+    def test_apply_adjustment(self):
+        from skills.skill_data.adjust import apply_adjustment
+
+        prices = pd.DataFrame({
+            'date': pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05']),
+            'close': [10.0, 10.0, 9.0, 9.0],
+            'volume': [100, 100, 100, 100],
+        })
+        factors = pd.DataFrame({
+            'date': pd.to_datetime(['2023-06-01', '2024-01-04']),
+            'factor': [2.0, 2.2],
+        })
+
+        hfq = apply_adjustment(prices, factors, 'hfq')
+        qfq = apply_adjustment(prices, factors, 'qfq')
+
+        assert hfq['close'].tolist() == pytest.approx([20.0, 20.0, 19.8, 19.8])
+        assert qfq['close'].tolist() == pytest.approx([10 * 2 / 2.2, 10 * 2 / 2.2, 9.0, 9.0])
+        assert qfq['volume'].tolist() == [100, 100, 100, 100]
+        assert prices['close'].tolist() == [10.0, 10.0, 9.0, 9.0]
+
+    def test_factor_update_without_rewriting_prices(self, tmp_path):
+        from skills.skill_data.storage import DataStorage
+
+        storage = DataStorage(str(tmp_path))
+        raw = pd.DataFrame({
+            'date': pd.to_datetime(['2024-01-02', '2024-01-03']),
+            'close': [10.0, 9.0],
+        })
+        storage.save_price_data('600519.SH', raw)
+        storage.save_adjust_factors({'600519.SH': pd.DataFrame({'date': ['2024-01-02'], 'factor': [1.0]})})
+        assert storage.load_adjusted_price_data('600519.SH')['close'].tolist() == [10.0, 9.0]
+
+        # 除权除息只更新因子表，行情快照不变
+        storage.save_adjust_factors({'600519.SH': pd.DataFrame({
+            'date': ['2024-01-02', '2024-01-03'], 'factor': [1.0, 1.25]
+        })})
+        assert storage.load_adjusted_price_data('600519.SH')['close'].tolist() == pytest.approx([8.0, 9.0])
+        assert storage.load_adjusted_price_data('600519.SH', mode='hfq', columns=['close'])['close'].tolist() == \
+            pytest.approx([10.0, 11.25])
+        assert storage.load_all_price_data('600519.SH')['close'].tolist() == [10.0, 9.0]
+
+    def test_raw_sync_fetches_only_missing_tail(self, tmp_path):
+        from types import SimpleNamespace
+        import loguru
+        from core.engine import QuantEngine
+        from skills.skill_data.fetcher import StockDataFetcher
+        from skills.skill_data.storage import DataStorage
+
+        storage = DataStorage(str(tmp_path))
+        dates = pd.bdate_range('2024-01-01', periods=5)
+        storage.save_price_data('600519.SH', pd.DataFrame({'date': dates[:3], 'close': [10.0, 10.0, 10.5]}))
+
+        calls = []
+
+        def fetch_price_data(codes, start_date=None, adjust='qfq'):
+            calls.append((list(codes), start_date, adjust))
+            if start_date is None:
+                return {c: pd.DataFrame({'date': dates, 'close': np.full(5, 20.0)}) for c in codes}
+            return {c: pd.DataFrame({'date': dates[2:], 'close': [11.0, 5.5, 5.5]}) for c in codes}
+
+        fetcher = StockDataFetcher()
+        fetcher.fetch_price_data = fetch_price_data
+        # 000001.SZ 取不到复权因子
+        fetcher.fetch_adjust_factors = lambda codes: {
+            c: pd.DataFrame({'date': [dates[0], dates[3]], 'factor': [1.0, 2.0]}) for c in codes if c != '000001.SZ'
+        }
+        engine = SimpleNamespace(storage=storage, fetcher=fetcher, logger=loguru.logger)
+        engine._adjusted_prices = lambda *args: QuantEngine._adjusted_prices(engine, *args)
+        result = QuantEngine._sync_raw_prices(engine, ['600519.SH', '000858.SZ', '000001.SZ'])
+
+        assert sorted(calls) == [(['000858.SZ', '000001.SZ'], None, ''), (['600519.SH'], '20240103', '')]
+        assert storage.load_all_price_data('600519.SH')['close'].tolist() == [10.0, 10.0, 11.0, 5.5, 5.5]
+        assert result['600519.SH']['close'].tolist() == pytest.approx([5.0, 5.0, 5.5, 5.5, 5.5])
+        assert len(result['000858.SZ']) == 5
+        # 前复权后计算技术指标，列与 adjusted 模式一致；没有复权因子的股票跳过
+        expected = fetcher.calculate_technical_indicators(result['600519.SH'][['date', 'close']])
+        assert set(expected.columns) <= set(result['600519.SH'].columns)
+        assert '000001.SZ' not in result
+
+class TestTradingCalendar:
+    """测试交易日历"""
+
+    def _calendar(self, tmp_path):
+        from skills.skill_data.trading_calendar import TradingCalendar
+
+        # 2024-02-09 ~ 2024-02-18 春节休市
+        dates = pd.bdate_range('2024-02-01', '2024-02-29')
+        dates = dates[(dates < '2024-02-09') | (dates > '2024-02-18')]
+        return TradingCalendar(str(tmp_path), dates=dates)
+
+    def test_queries(self, tmp_path):
+        from datetime import datetime
+
+        calendar = self._calendar(tmp_path)
+
+        assert calendar.is_trading_day('2024-02-08')
+        assert not calendar.is_trading_day('2024-02-12')
+        assert not calendar.is_trading_day('2024-02-24')
+        assert calendar.previous_trading_day('2024-02-18') == pd.Timestamp('2024-02-08')
+        assert calendar.next_trading_day('2024-02-08') == pd.Timestamp('2024-02-19')
+        assert calendar.trading_days_between('2024-02-07', '2024-02-20') == 3
+        assert list(calendar.aligned_index('2024-02-08', '2024-02-19')) == [
+            pd.Timestamp('2024-02-08'), pd.Timestamp('2024-02-19')]
+
+        # 收盘前只要求到上一交易日
+        assert calendar.missing_since('2024-02-08', now=datetime(2024, 2, 19, 9, 0)) == 0
+        assert calendar.missing_since('2024-02-08', now=datetime(2024, 2, 19, 16, 0)) == 1
+        assert calendar.missing_since('2024-02-08', now=datetime(2024, 2, 21, 9, 0)) == 2
+
+    def test_backtest_uses_calendar(self, tmp_path):
+        from skills.skill_risk.backtest import BacktestEngine
+
+        calendar = self._calendar(tmp_path)
+        dates = pd.to_datetime(['2024-02-05', '2024-02-06', '2024-02-08', '2024-02-19'])
+        price_data = {'600519.SH': pd.DataFrame({'date': dates, 'close': [10.0, 10.5, 10.2, 10.8]})}
+
+        trading_dates = BacktestEngine(calendar=calendar)._get_trading_dates(
+            price_data, pd.Timestamp('2024-02-01'), pd.Timestamp('2024-02-29'))
+
+        # 停牌日 02-07 由日历补齐，范围限定在行情覆盖区间内
+        assert trading_dates == list(calendar.aligned_index('2024-02-05', '2024-02-19'))
+        assert pd.Timestamp('2024-02-07') in trading_dates
+
+
+class TestIndexUniverse:
+    """测试指数成分股票池"""
+
+    def test_refresh_on_rebalance_and_point_in_time(self, tmp_path):
+        from datetime import date
+        from types import SimpleNamespace
+        from skills.skill_data.universe import IndexUniverse
+
+        members = {'000300.SH': ['600519.SH', '000858.SZ']}
+        calls = []
+
+        def fetch_index_constituents(index_code, date=None):
+            calls.append(index_code)
+            return pd.DataFrame({'code': members[index_code], 'date': pd.Timestamp('2024-06-17')})
+
+        fetcher = SimpleNamespace(
+            fetch_index_constituents=fetch_index_constituents,
+            get_stock_info_map=lambda: {'600519.SH': '贵州茅台', '000858.SZ': '五粮液', '601318.SH': '中国平安'},
+        )
+        universe = IndexUniverse(str(tmp_path), fetcher=fetcher, config={'rebalance_grace_days': 0})
+
+        # 2024 年 6 月调整于 06-14（第二个星期五）之后的 06-17 生效
+        assert universe.last_rebalance('000300.SH', date(2024, 7, 1)) == date(2024, 6, 17)
+        assert universe.refresh('000300.SH', today=date(2024, 7, 1))
+        assert not universe.refresh('000300.SH', today=date(2024, 11, 1))
+        assert calls == ['000300.SH']
+
+        # 12 月调整后重新拉取，新快照从生效日起生效，旧快照保留
+        members['000300.SH'] = ['600519.SH', '601318.SH']
+        assert universe.refresh('000300.SH', today=date(2024, 12, 20))
+        assert universe.members('000300.SH', as_of='2024-12-13') == ['000858.SZ', '600519.SH']
+        assert universe.members('000300.SH', as_of='2024-12-16') == ['600519.SH', '601318.SH']
+        assert universe.members('000300.SH', as_of='2024-01-02') == []
+
+        # 缓存落盘，新实例无需重新拉取；综合指数取对应交易所的全部股票
+        reloaded = IndexUniverse(str(tmp_path), fetcher=fetcher, config={'rebalance_grace_days': 0})
+        assert not reloaded.needs_refresh('000300.SH', date(2025, 1, 10))
+        assert reloaded.refresh('000001.SH', today=date(2025, 1, 10))
+        # 综合指数默认不展开，需显式 include_composite
+        assert reloaded.resolve(['000300.SH', '000001.SH'], as_of='2025-01-10') == ['600519.SH', '601318.SH']
+        reloaded.include_composite = True
+        assert reloaded.resolve(['000001.SH'], as_of='2025-01-10') == ['600519.SH', '601318.SH']
+
+
+class TestStreamingPipeline:
+    """测试分块流式每日分析"""
+
+    def _engine(self, tmp_path, price_data):
+        from types import SimpleNamespace
+        from skills.skill_ai.scorer import StockScorer
+        from skills.skill_ai.analyzer import StrategyAnalyzer
+        from skills.skill_ai.factors import FactorModel
+        from skills.skill_data.storage import DataStorage
+
+        seen = []
+        engine = SimpleNamespace(
+            storage=DataStorage(str(tmp_path)),
+            scorer=StockScorer(),
+            analyzer=StrategyAnalyzer(),
+            factor_model=FactorModel(data_dir=str(tmp_path)),
+            fetcher=SimpleNamespace(fetch_financial_data=lambda codes: {c: {'pe': 15} for c in codes}),
+            news_fetcher=SimpleNamespace(fetch_news=lambda codes: {}),
+            _load_previous_scores=lambda codes: None,
+        )
+        engine._sync_prices = lambda codes: seen.append(list(codes)) or {c: price_data[c] for c in codes}
+        return engine, seen
+
+    def _prices(self):
+        rng = np.random.default_rng(2)
+        price_data = {}
+        for i in range(7):
+            close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, 60)))
+            price_data[f'60000{i}.SH'] = pd.DataFrame({
+                'code': f'60000{i}.SH', 'close': close, 'high': close * 1.01,
+                'low': close * 0.99, 'volume': np.full(60, 1e7),
+            })
+        return price_data
+
+    def test_chunked_ranking_matches_full_scoring(self, tmp_path):
+        from core.pipeline import StreamingDailyPipeline
+        from skills.skill_ai.scorer import StockScorer
+
+        price_data = self._prices()
+        engine, seen = self._engine(tmp_path, price_data)
+
+        streamed = StreamingDailyPipeline(engine, {'chunk_size': 3, 'memory_limit_mb': 0}).run(list(price_data))
+
+        assert [len(chunk) for chunk in seen] == [3, 3, 1]
+        assert streamed['stats']['chunks'] == 3
+        assert len(streamed['stocks']) == 7
+        full = StockScorer().score_stocks(price_data, {c: {'pe': 15} for c in price_data}, {})
+        assert streamed['scores']['code'].tolist() == full['code'].tolist()
+        assert streamed['scores']['rank'].tolist() == list(range(1, 8))
+        pd.testing.assert_frame_equal(
+            streamed['exposures'],
+            engine.factor_model.calculate_exposures(price_data, {c: {'pe': 15} for c in price_data}))
+
+    def test_memory_limit_shrinks_chunks_then_continues(self, tmp_path):
+        from core.pipeline import StreamingDailyPipeline, frames_mb
+
+        price_data = self._prices()
+        engine, seen = self._engine(tmp_path, price_data)
+        # 上限小于两只股票的行情大小，块大小降到最小后继续，不中止
+        limit = frames_mb({'a': price_data['600000.SH']}) * 1.5
+        pipeline = StreamingDailyPipeline(engine, {'chunk_size': 4, 'min_chunk_size': 2, 'memory_limit_mb': limit})
+
+        result = pipeline.run(list(price_data))
+        assert [len(chunk) for chunk in seen] == [4, 2, 1]
+        assert len(result['scores']) == 7
+        assert result['stats']['chunk_size'] == 2
+        assert result['stats']['peak_chunk_mb'] > limit
+
+
+class TestStorageMaintenance:
+    """测试存储维护"""
+
+    def test_compaction_and_retention(self, tmp_path):
+        from datetime import timedelta
+        from skills.skill_data.storage import DataStorage
+        from skills.skill_ops.maintenance import StorageMaintenance
+
+        storage = DataStorage(str(tmp_path / "data"))
+        dates = pd.bdate_range('2024-01-01', periods=10)
+        old = pd.DataFrame({'date': dates[:6], 'close': np.arange(6, dtype=float)})
+        new = pd.DataFrame({'date': dates[3:], 'close': np.arange(3, 10, dtype=float) + 100})
+        old.to_parquet(storage.price_dir / "600519.SH_20240108.parquet", index=False)
+        new.to_parquet(storage.price_dir / "600519.SH_20240115.parquet", index=False)
+        storage.save_adjust_factors({"600519.SH": pd.DataFrame({'date': dates[:1], 'factor': [1.0]}),
+                                     "000001.SZ": pd.DataFrame({'date': dates[:1], 'factor': [1.0]})})
+        expected = storage.load_all_price_data("600519.SH")
+        # 前复权快照（没有复权因子）不合并；全部为空的快照跳过
+        old.to_parquet(storage.price_dir / "000858.SZ_20240108.parquet", index=False)
+        new.to_parquet(storage.price_dir / "000858.SZ_20240115.parquet", index=False)
+        for day in ('20240108', '20240115'):
+            pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'), 'close': pd.Series(dtype=float)}).to_parquet(
+                storage.price_dir / f"000001.SZ_{day}.parquet", index=False)
+
+        report_dir = tmp_path / "reports"
+        report_dir.mkdir()
+        stale = report_dir / "daily_report_20200101.html"
+        stale.write_text("old")
+        fresh = report_dir / "daily_report_today.html"
+        fresh.write_text("new")
+        notes = report_dir / "notes.txt"
+        notes.write_text("keep")
+        past = (datetime.now() - timedelta(days=200)).timestamp()
+        os.utime(stale, (past, past))
+        os.utime(notes, (past, past))
+
+        storage.save_news("600519.SH", [{'title': 'x'}])
+        maintenance = StorageMaintenance(storage, str(tmp_path / "data"), str(report_dir))
+        result = maintenance.run()
+
+        assert result['actions']['compact_prices'] == {'codes': 1, 'files_removed': 1, 'rows_removed': 3}
+        assert sorted(f.name for f in storage.price_dir.glob("*.parquet")) == [
+            "000001.SZ_20240108.parquet", "000001.SZ_20240115.parquet",
+            "000858.SZ_20240108.parquet", "000858.SZ_20240115.parquet", "600519.SH_20240115.parquet"]
+        pd.testing.assert_frame_equal(storage.load_all_price_data("600519.SH"), expected)
+        assert not stale.exists() and fresh.exists() and notes.exists()
+        assert result['actions']['news_removed'] == 0
+        assert result['after']['行情快照'][0] == 5
+        assert '合计' in maintenance.format_summary(result)
+
+class TestCachedStorage:
+    """存储读缓存测试"""
+    
+    def test_hit_miss_and_invalidate_on_write(self, tmp_path):
+        from skills.skill_data.storage import DataStorage
+        from skills.skill_data.storage_cache import CachedStorage
+        
+        storage = CachedStorage(DataStorage(str(tmp_path)))
+        storage.save_financial_data('600519.SH', {'pe': 30})
+        
+        assert storage.load_financial_data('600519.SH')['pe'] == 30
+        assert storage.load_financial_data('600519.SH')['pe'] == 30
+        assert storage.cache_stats()['hits'] == 1
+        assert storage.cache_stats()['misses'] == 1
+        
+        storage.save_financial_data('600519.SH', {'pe': 25})
+        
+        assert storage.load_financial_data('600519.SH')['pe'] == 25
+        assert storage.cache_stats()['misses'] == 2
+        
+        # 空结果不缓存，列表参数不会让调用失败
+        assert storage.load_financial_data('000001.SZ') is None
+        storage.storage.save_financial_data('000001.SZ', {'pe': 12})
+        assert storage.load_financial_data('000001.SZ')['pe'] == 12
+        storage.storage.save_price_data('600519.SH', pd.DataFrame({'date': pd.date_range('2024-01-01', periods=3),
+                                                                   'close': 1.0}))
+        for _ in range(2):
+            assert list(storage.load_price_data('600519.SH', None, None, None, ['close']).columns) == ['close']
+    
+    def test_evicts_least_recently_used_by_bytes(self, tmp_path):
+        from skills.skill_data.storage import DataStorage
+        from skills.skill_data.storage_cache import CachedStorage, _estimate_size
+        
+        backend = DataStorage(str(tmp_path))
+        df = pd.DataFrame({'date': pd.date_range('2023-01-01', periods=50), 'close': 1.0})
+        for code in ['A', 'B', 'C']:
+            backend.save_price_data(code, df)
+        
+        entry_size = _estimate_size(backend.load_price_data('A'))
+        storage = CachedStorage(backend, max_bytes=entry_size * 2)
+        
+        storage.load_price_data('A')
+        storage.load_price_data('B')
+        storage.load_price_data('A')
+        storage.load_price_data('C')
+        
+        stats = storage.cache_stats()
+        assert stats['evictions'] == 1
+        assert stats['bytes'] <= entry_size * 2
+        
+        storage.load_price_data('A')
+        assert storage.cache_stats()['hits'] == 2
+
+class TestMongoDecode:
+    """测试 Mongo K 线读取与解码"""
+
+    def test_find_price_frame_keeps_integer_dtypes(self, monkeypatch):
+        import builtins
+        from skills.skill_data.mongo_storage import MongoDBStorage
+
+        docs = [{'date': datetime(2024, 1, i + 1), 'close': float(i), 'volume': 100 * i} for i in range(5)]
+
+        class Cursor(list):
+            def sort(self, key, direction):
+                return self
+
+            def limit(self, n):
+                return Cursor(self[:n])
+
+        real_import = builtins.__import__
+
+        def no_arrow(name, *args, **kwargs):
+            if name.startswith('pymongoarrow'):
+                raise ImportError(name)
+            return real_import(name, *args, **kwargs)
+
+        monkeypatch.setattr(builtins, '__import__', no_arrow)
+        storage = MongoDBStorage(config={})
+        storage.db = {'stock_prices': type('Collection', (), {'find': lambda self, q, p: Cursor(docs)})()}
+
+        df = storage._find_price_frame({'stock_code': 'A'}, {'_id': 0}, limit=3)
+        assert list(df.columns) == ['date', 'close', 'volume']
+        assert df['volume'].dtype == np.int64
+        assert df['volume'].tolist() == [0, 100, 200]
+        assert storage.load_price_data('A', columns=['close']).columns.tolist() == ['close']
+
+        storage.db = {'stock_prices': type('Collection', (), {'find': lambda self, q, p: Cursor()})()}
+        assert storage._find_price_frame({}, {}).empty
+
+    def test_price_upserts_write_only_new_or_changed_bars(self):
+        from skills.skill_data.mongo_storage import MongoDBStorage
+
+        stored = [{'date': datetime(2024, 1, i), 'close': 10.0 + i, 'volume': 100 * i, 'pe': np.nan}
+                  for i in (2, 3, 4)]
+        queries = []
+
+        class Collection:
+            def find(self, query, projection):
+                queries.append(query)
+                dates = query['date']
+                return [dict(doc) for doc in stored if dates['$gte'] <= doc['date'] <= dates['$lte']]
+
+        storage = MongoDBStorage(config={})
+        storage.db = {'stock_prices': Collection()}
+        df = pd.DataFrame({'date': pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05']),
+                           'close': [12.0, 13.5, 14.0, 15.0], 'volume': [200, 300, 400, 500],
+                           'pe': [np.nan] * 4})
+        saved_at = datetime(2024, 1, 6)
+        operations = storage._price_upserts('A', df, saved_at)
+
+        # 01-02、01-04 与库中相同（NaN 视为相等），只写变化的 01-03 和新增的 01-05
+        assert [op._filter['date'] for op in operations] == [pd.Timestamp('2024-01-03'), pd.Timestamp('2024-01-05')]
+        assert all(op._upsert for op in operations)
+        assert operations[0]._doc['$set']['close'] == 13.5
+        assert operations[0]._doc['$set']['stock_code'] == 'A'
+        assert operations[0]._doc['$set']['saved_at'] == saved_at
+        assert queries == [{'stock_code': 'A', 'date': {'$gte': pd.Timestamp('2024-01-02'),
+                                                        '$lte': pd.Timestamp('2024-01-05')}}]
+        assert storage._price_upserts('A', df.iloc[[0, 2]], saved_at) == []
+
+    def test_bucket_upserts_merge_and_skip_unchanged_years(self):
+        from skills.skill_data.mongo_storage import MongoDBStorage
+
+        stored = [{'year': 2023, 'dates': [datetime(2023, 12, 28), datetime(2023, 12, 29)],
+                   'columns': {'close': [9.0, 9.5], 'volume': [100.0, 150.0]}}]
+
+        class Collection:
+            def find(self, query, projection):
+                assert query['stock_code'] == 'A'
+                return [dict(doc) for doc in stored if doc['year'] in query['year']['$in']]
+
+        storage = MongoDBStorage(config={'price_layout': 'bucket'})
+        storage.db = {'stock_price_buckets': Collection()}
+        saved_at = datetime(2024, 1, 4)
+
+        # 2023 桶内容不变，只为新的 2024 桶生成 upsert
+        df = pd.DataFrame({'date': pd.to_datetime(['2023-12-29', '2024-01-02', '2024-01-03']),
+                           'close': [9.5, 10.0, 11.0], 'volume': [150.0, 200.0, 300.0]})
+        operations = storage._bucket_upserts('A', df, saved_at)
+        assert [op._filter for op in operations] == [{'stock_code': 'A', 'year': 2024}]
+        bucket = operations[0]._doc['$set']
+        assert bucket['columns'] == {'close': [10.0, 11.0], 'volume': [200.0, 300.0]}
+        assert bucket['saved_at'] == saved_at
+
+        # 修改已有 K 线：与库中分桶合并后整桶重写
+        df = pd.DataFrame({'date': pd.to_datetime(['2023-12-29']), 'close': [9.6], 'volume': [150.0]})
+        operations = storage._bucket_upserts('A', df, saved_at)
+        assert [op._filter['year'] for op in operations] == [2023]
+        merged = operations[0]._doc['$set']
+        assert merged['dates'] == [datetime(2023, 12, 28), datetime(2023, 12, 29)]
+        assert merged['columns']['close'] == [9.0, 9.6]
+
+        assert storage._bucket_upserts('A', pd.DataFrame({
+            'date': pd.to_datetime(['2023-12-28']), 'close': [9.0], 'volume': [100.0]}), saved_at) == []
+
+    def test_bucket_query_and_expand(self):
+        from skills.skill_data.mongo_storage import bucket_query, buckets_to_prices
+
+        query, projection = bucket_query('A', start='2023-06-01', end='2024-03-01', columns=['date', 'close'])
+        assert query == {'stock_code': 'A', 'year': {'$gte': 2023, '$lte': 2024}}
+        assert projection == {'_id': 0, 'dates': 1, 'columns.close': 1}
+        assert bucket_query('A') == ({'stock_code': 'A'}, {'_id': 0, 'dates': 1, 'columns': 1})
+
+        buckets = [
+            {'dates': [datetime(2023, 5, 31), datetime(2023, 12, 29)], 'columns': {'close': [8.0, 9.0]}},
+            # 该年缺 volume 列，展开为 NaN
+            {'dates': [datetime(2024, 1, 2), datetime(2024, 3, 1), datetime(2024, 3, 4)],
+             'columns': {'close': [10.0, 11.0, 12.0]}},
+        ]
+        buckets[0]['columns']['volume'] = [1.0, 2.0]
+        df = buckets_to_prices(buckets, start='2023-06-01', end='2024-03-01')
+        assert df['date'].tolist() == list(pd.to_datetime(['2023-12-29', '2024-01-02', '2024-03-01']))
+        assert df['close'].tolist() == [9.0, 10.0, 11.0]
+        assert df['volume'].iloc[0] == 2.0 and df['volume'].iloc[1:].isna().all()
+
+        assert buckets_to_prices(buckets, columns=['close'], limit=2)['close'].tolist() == [8.0, 9.0]
+        assert buckets_to_prices([]).empty
+
+    def test_price_layout_switch_is_detected_and_migrated(self):
+        from types import SimpleNamespace
+        from skills.skill_data.mongo_storage import MongoDBStorage
+
+        def matches(doc, query):
+            for key, cond in query.items():
+                value = doc.get(key)
+                if isinstance(cond, dict):
+                    if '$in' in cond and value not in cond['$in']:
+                        return False
+                    if '$gte' in cond and not value >= cond['$gte']:
+                        return False
+                    if '$lte' in cond and not value <= cond['$lte']:
+                        return False
+                elif value != cond:
+                    return False
+            return True
+
+        def project(doc, projection):
+            if projection and 0 in projection.values():
+                return {k: v for k, v in doc.items() if projection.get(k, 1)}
+            return {k: v for k, v in doc.items() if not projection or k in projection}
+
+        class Cursor(list):
+            def sort(self, key, direction):
+                return Cursor(sorted(self, key=lambda d: d[key], reverse=direction < 0))
+
+            def limit(self, n):
+                return Cursor(self[:n])
+
+        class Collection:
+            def __init__(self, name):
+                self.name, self.docs = name, []
+
+            def find(self, query, projection=None):
+                return Cursor(project(d, projection) for d in self.docs if matches(d, query))
+
+            def find_one(self, query, projection=None):
+                return next(iter(self.find(query, projection)), None)
+
+            def distinct(self, field):
+                return list({d[field] for d in self.docs})
+
+            def delete_many(self, query):
+                self.docs = [d for d in self.docs if not matches(d, query)]
+
+            def bulk_write(self, operations, ordered=True):
+                for op in operations:
+                    doc = self.find_one(op._filter)
+                    if doc is None:
+                        self.docs.append({**op._filter, **op._doc['$set']})
+                    else:
+                        next(d for d in self.docs if matches(d, op._filter)).update(op._doc['$set'])
+
+        db = {'stock_prices': Collection('stock_prices'), 'stock_price_buckets': Collection('stock_price_buckets')}
+        bars = MongoDBStorage(config={'price_layout': 'bar'})
+        bars.db = db
+        df = pd.DataFrame({'date': pd.to_datetime(['2023-12-29', '2024-01-02', '2024-01-03']),
+                           'close': [9.5, 10.0, 11.0], 'volume': [150.0, 200.0, 300.0]})
+        bars.save_price_batch({'A': df, 'B': df.assign(close=df['close'] * 2)})
+
+        buckets = MongoDBStorage(config={'price_layout': 'bucket'})
+        buckets.db = db
+        errors = []
+        buckets.logger = SimpleNamespace(error=errors.append, info=lambda message: None)
+        buckets._check_price_layout()
+        assert len(errors) == 1 and 'stock_prices' in errors[0]
+        assert buckets.load_price_data('A').empty
+        assert buckets.pending_layout_migration() == ['A', 'B']
+
+        assert buckets.migrate_price_layout() == {'codes': 2, 'documents_written': 4}
+        assert db['stock_prices'].docs == []
+        pd.testing.assert_frame_equal(buckets.load_price_data('A'), df, check_dtype=False)
+        assert buckets.load_price_data('B')['close'].tolist() == [19.0, 20.0, 22.0]
+        errors.clear()
+        buckets._check_price_layout()
+        assert errors == [] and buckets.migrate_price_layout() == {'codes': 0, 'documents_written': 0}
+
+        # 切回逐根布局同样可以迁移
+        assert bars.migrate_price_layout() == {'codes': 2, 'documents_written': 6}
+        restored = bars.load_price_data('A').drop(columns=['stock_code'])
+        pd.testing.assert_frame_equal(restored, df, check_dtype=False)
+
+    def test_async_storage_reads_buckets(self):
+        import asyncio
+        from skills.skill_data.async_mongo_storage import AsyncMongoDBStorage
+
+        buckets = [
+            {'stock_code': 'A', 'year': 2023, 'dates': [datetime(2023, 12, 29)],
+             'columns': {'close': [9.0], 'volume': [100.0]}},
+            {'stock_code': 'A', 'year': 2024, 'dates': [datetime(2024, 1, 2), datetime(2024, 1, 3)],
+             'columns': {'close': [10.0, 11.0], 'volume': [200.0, 300.0]}},
+        ]
+
+        class Cursor:
+            def __init__(self, docs):
+                self.docs = docs
+
+            def sort(self, key, direction):
+                self.docs = sorted(self.docs, key=lambda d: d[key], reverse=direction < 0)
+                return self
+
+            async def to_list(self, length=None):
+                return self.docs
+
+        class Collection:
+            def __init__(self):
+                self.queries = []
+
+            def find(self, query, projection):
+                self.queries.append((query, projection))
+                years = query.get('year', {})
+                return Cursor([b for b in buckets if years.get('$gte', 0) <= b['year'] <= years.get('$lte', 9999)])
+
+        collection = Collection()
+        storage = AsyncMongoDBStorage({'stock_price_buckets': collection}, {'price_layout': 'bucket'})
+        df = asyncio.run(storage.load_price_data('A', start='2023-12-30', columns=['close']))
+
+        assert collection.queries[0][0] == {'stock_code': 'A', 'year': {'$gte': 2023}}
+        assert 'columns.close' in collection.queries[0][1]
+        assert list(df.columns) == ['close']
+        assert df['close'].tolist() == [10.0, 11.0]
+
+    def test_ensure_indexes_declares_news_ttl(self):
+        from skills.skill_data.mongo_storage import MongoDBStorage
+
+        created = {}
+
+        class Collection:
+            def __init__(self, name):
+                self.name = name
+
+            def create_indexes(self, indexes):
+                created.setdefault(self.name, []).extend(index.document for index in indexes)
+                return [index.document['name'] for index in indexes]
+
+        class Database(dict):
+            def __missing__(self, name):
+                return Collection(name)
+
+        storage = MongoDBStorage(config={'news_ttl_days': 7})
+        storage.db = Database()
+        names = storage.ensure_indexes()
+
+        ttl = next(index for index in created['stock_news'] if index['name'] == 'saved_at_ttl')
+        assert ttl['expireAfterSeconds'] == 7 * 86400
+        assert dict(ttl['key']) == {'saved_at': 1}
+        assert names['stock_prices'] == ['stock_code_date_unique']
+        assert next(i for i in created['stock_scores'] if i['name'] == 'code_unique')['unique']
+
+        # news_ttl_days: 0 不建 TTL 索引
+        created.clear()
+        storage.config['news_ttl_days'] = 0
+        storage.ensure_indexes()
+        assert [index['name'] for index in created['stock_news']] == ['stock_code_publish_date']
+
+    def test_connect_skips_indexes_quickly_when_mongo_down(self):
+        import time
+        from skills.skill_data.mongo_storage import MongoDBStorage
+
+        storage = MongoDBStorage("mongodb://localhost:1/aiqrh",
+                                 config={'pool': {'server_selection_timeout_ms': 10000}})
+        storage.ensure_indexes = lambda: pytest.fail("MongoDB 不可用时不应创建索引")
+        start = time.perf_counter()
+        storage.connect()
+        assert time.perf_counter() - start < 3
+        assert storage.db is not None
+
+
+class TestMongoConnectionManager:
+    """测试共享 MongoDB 连接池"""
+
+    def test_shared_client_and_pool_options(self, monkeypatch):
+        pytest.importorskip("pymongo")
+        from skills.skill_data.mongo_client import MongoConnectionManager, pool_options
+
+        monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "20")
+        options = pool_options({'min_pool_size': 2})
+        assert options['max_pool_size'] == 20
+        assert options['min_pool_size'] == 2
+
+        manager = MongoConnectionManager()
+        try:
+            api_client = manager.get_client("mongodb://localhost:27017/aiqrh")
+            engine_client = manager.get_client("mongodb://localhost:27017")
+            assert api_client is engine_client
+            assert api_client.options.pool_options.max_pool_size == 20
+
+            # 之后的调用要求不同参数：复用原池，只警告一次
+            from types import SimpleNamespace
+            warnings = []
+            manager.logger = SimpleNamespace(warning=warnings.append, info=lambda message: None)
+            for _ in range(2):
+                assert manager.get_client("mongodb://localhost:27017", {'max_pool_size': 100}) is api_client
+            assert manager.get_client("mongodb://localhost:27017", {'max_pool_size': 20}) is api_client
+            assert len(warnings) == 1 and 'max_pool_size=100' in warnings[0]
+
+            stats = manager.pool_stats()
+            assert list(stats) == ["localhost:27017"]
+            assert stats["localhost:27017"]["wait_ms_avg"] == 0.0
+        finally:
+            manager.close_all()
+
+
+class TestAnalyticalStorage:
+    """测试分析型存储的 SQL 筛选"""
+
+    def test_screen_matches_pandas_momentum(self, tmp_path):
+        from skills.skill_data.analytics import AnalyticalStorage
+
+        storage = AnalyticalStorage(str(tmp_path), {'analytics_engine': 'sqlite'})
+        dates = pd.bdate_range('2024-01-01', periods=30)
+        frames = {
+            f"60000{i}.SH": pd.DataFrame({'date': dates, 'close': 10 + np.arange(30) * (i + 1) * 0.1})
+            for i in range(4)
+        }
+        storage.save_price_batch(frames)
+        storage.save_financial_batch({code: {'roe': 10.0 + i * 5} for i, code in enumerate(frames)})
+
+        result = storage.screen([('roe', '>', 12), 'momentum_pct>=0.5'], momentum_window=20)
+
+        assert list(result['code']) == ['600003.SH', '600002.SH']
+        expected = frames['600003.SH']['close'].iloc[-1] / frames['600003.SH']['close'].iloc[-21] - 1
+        assert result['momentum'].iloc[0] == pytest.approx(expected)
+
+        counts = storage.query("SELECT code, COUNT(*) AS n FROM prices GROUP BY code ORDER BY code")
+        assert counts['n'].tolist() == [30] * 4
+
+    def test_screen_uses_forward_adjusted_closes(self, tmp_path):
+        from skills.skill_data.analytics import AnalyticalStorage
+
+        storage = AnalyticalStorage(str(tmp_path), {'analytics_engine': 'sqlite'})
+        dates = pd.bdate_range('2024-01-01', periods=30)
+        # 第 20 根 K 线 10 送 10，不复权价腰斩
+        raw = np.linspace(10, 13, 30)
+        raw[20:] /= 2
+        storage.save_price_batch({
+            '600000.SH': pd.DataFrame({'date': dates, 'close': raw}),
+            '600001.SH': pd.DataFrame({'date': dates, 'close': np.linspace(10, 11, 30)}),
+        })
+        storage.save_adjust_factors({'600000.SH': pd.DataFrame({'date': [dates[0], dates[20]], 'factor': [1.0, 2.0]})})
+
+        result = storage.screen(momentum_window=20).set_index('code')
+        adjusted = storage.load_adjusted_price_data('600000.SH')['close']
+
+        assert result.loc['600000.SH', 'momentum'] == pytest.approx(adjusted.iloc[-1] / adjusted.iloc[-21] - 1)
+        assert result.loc['600000.SH', 'momentum'] > 0
+        assert result.loc['600001.SH', 'momentum'] == pytest.approx(11 / np.linspace(10, 11, 30)[-21] - 1)
+
+    def test_compaction_resyncs_sqlite_mirror(self, tmp_path):
+        from skills.skill_data.analytics import AnalyticalStorage
+
+        storage = AnalyticalStorage(str(tmp_path), {'analytics_engine': 'sqlite'})
+        dates = pd.bdate_range('2024-01-01', periods=10)
+        pd.DataFrame({'date': dates[:6], 'close': np.arange(6, dtype=float)}).to_parquet(
+            storage.price_dir / "600519.SH_20240108.parquet", index=False)
+        pd.DataFrame({'date': dates[3:], 'close': np.arange(3, 10, dtype=float) + 100}).to_parquet(
+            storage.price_dir / "600519.SH_20240115.parquet", index=False)
+        storage.save_adjust_factors({"600519.SH": pd.DataFrame({'date': dates[:1], 'factor': [1.0]})})
+        storage.refresh()
+
+        storage.compact_prices()
+        sources = storage.query("SELECT file FROM price_sources")
+        prices = storage.query("SELECT close FROM prices ORDER BY date")
+
+        assert sources['file'].tolist() == ["600519.SH_20240115.parquet"]
+        assert prices['close'].tolist() == storage.load_all_price_data("600519.SH")['close'].tolist()
+
+        # 快照被原地重写为更短的内容时，旧行不会残留
+        pd.DataFrame({'date': dates[8:], 'close': [1.0, 2.0]}).to_parquet(
+            storage.price_dir / "600519.SH_20240115.parquet", index=False)
+        storage.refresh()
+        assert storage.query("SELECT close FROM prices ORDER BY date")['close'].tolist() == [1.0, 2.0]
+
+    def test_query_syncs_new_snapshots_incrementally(self, tmp_path):
+        from skills.skill_data.analytics import AnalyticalStorage
+
+        storage = AnalyticalStorage(str(tmp_path), {'analytics_engine': 'sqlite'})
+        dates = pd.bdate_range('2024-01-01', periods=35)
+        close = np.arange(35, dtype=float)
+        pd.DataFrame({'date': dates[:30], 'close': close[:30]}).to_parquet(
+            storage.price_dir / "600519.SH_20240111.parquet", index=False)
+        assert storage.query("SELECT COUNT(*) AS n FROM prices")['n'].iloc[0] == 30
+
+        written = []
+        sync = storage._sync_code
+        storage._sync_code = lambda *args: written.append(sync(*args)) or written[-1]
+
+        # 长驻进程中其他进程写入的新快照，下一次查询即可见，重叠且未变的 K 线不重写
+        newer = close[25:].copy()
+        newer[0] = 99.0
+        pd.DataFrame({'date': dates[25:], 'close': newer}).to_parquet(
+            storage.price_dir / "600519.SH_20240118.parquet", index=False)
+        prices = storage.query("SELECT close FROM prices ORDER BY date")['close'].tolist()
+
+        assert written == [6]
+        assert prices == [*close[:25], 99.0, *close[26:]]
+        storage.query("SELECT 1")
+        assert written == [6, 0]
+
+    def test_screen_rejects_unknown_column(self, tmp_path):
+        from skills.skill_data.analytics import AnalyticalStorage
+
+        storage = AnalyticalStorage(str(tmp_path), {'analytics_engine': 'sqlite'})
+        with pytest.raises(ValueError):
+            storage.screen([('close; DROP TABLE prices', '>', 0)])
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])